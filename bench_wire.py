@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from utils import ingest, wire, schema
+from utils.supabase import page_params
+
+# ✅ 전송 포맷별 디코딩 처리량 벤치마크 (JSON → Arrow vs CSV → Arrow)
+#   python bench_wire.py                       # 합성 페이로드로 디코딩만 측정
+#   python bench_wire.py --url http://localhost:3000 --live   # 로컬 PostgREST에서 받아 전송 + 디코딩 측정
+COLUMNS = [
+    "id", "spend.authorizedAt", "spend.status", "spend.amount", "spend.userId", "spend.userEmail",
+    "spend.merchantName", "spend.merchantCountry", "spend.merchantCategory",
+]
+
+
+def synthetic(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    users = rng.integers(0, 5000, rows)
+    ts = pd.Timestamp("2025-01-01", tz="UTC") + pd.to_timedelta(np.sort(rng.integers(0, 180 * 86400, rows)), unit="s")
+    return pd.DataFrame({
+        "id": [f"tx{i:08d}" for i in range(rows)],
+        "spend.authorizedAt": ts.strftime("%Y-%m-%d %H:%M:%S+00"),
+        "spend.status": rng.choice(["COMPLETED", "Pending", "reversed", "declined"], rows),
+        "spend.amount": rng.integers(-5000, 50000, rows),
+        "spend.userId": [f"user-{u}" for u in users],
+        "spend.userEmail": [f"user-{u}@example.com" for u in users],
+        "spend.merchantName": rng.choice([f"Merchant {i}" for i in range(500)], rows),
+        "spend.merchantCountry": rng.choice(["US", "KR", "GB", "FR", "DE", "JP"], rows),
+        "spend.merchantCategory": rng.choice([f"category {i}" for i in range(40)], rows),
+    })
+
+
+def decode_json(payload, columns):
+    return ingest.page_to_table(json.loads(payload), columns)
+
+
+def decode_csv(payload, columns):
+    return ingest.csv_to_table(payload, columns)
+
+
+def timed(fn, payload, columns, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        table = fn(payload, columns)
+        best = min(best, time.perf_counter() - start)
+    return table.num_rows, best
+
+
+def report(name, payload, rows, seconds):
+    mb = len(payload) / 1e6
+    print(f"{name:5s} {mb:8.1f} MB  {seconds * 1000:8.1f} ms  {rows / seconds:12,.0f} rows/s  {mb / seconds:8.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PostgREST wire format decode benchmark")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--url", help="PostgREST endpoint (default: POSTGREST_URL / SUPABASE_URL)")
+    parser.add_argument("--live", action="store_true", help="fetch one page per format from PostgREST")
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ["POSTGREST_URL"] = args.url
+
+    if args.live:
+        columns = schema.projection() or COLUMNS
+        params = page_params(batch_size=args.rows, columns=schema.select_clause(columns))
+        payloads = {}
+        for name, accept in (("json", "application/json"), ("csv", "text/csv")):
+            start = time.perf_counter()
+            payloads[name] = wire.get("transactions", params, accept=accept)
+            print(f"fetch {name}: {time.perf_counter() - start:.2f}s ({len(payloads[name]) / 1e6:.1f} MB)")
+    else:
+        columns = COLUMNS
+        frame = synthetic(args.rows)
+        payloads = {
+            "json": json.dumps(frame.to_dict("records")).encode(),
+            "csv": frame.to_csv(index=False).encode(),
+        }
+        del frame
+
+    for name, fn in (("json", decode_json), ("csv", decode_csv)):
+        rows, seconds = timed(fn, payloads[name], columns, args.repeat)
+        report(name, payloads[name], rows, seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import argparse
+import glob
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from check_pushdown import STATUSES, compare, same
+from utils import cube, pushdown, user_index
+from utils.preprocess import preprocess
+
+# ✅ 집계 마이그레이션 검증 (PostgREST / Supabase 없이 재현 가능)
+# 빈 Postgres에 검증용 DB를 만들고 합성 거래(잘못된 시각 · 금액, 빈 차원 포함)를 넣은 뒤
+# supabase/migrations/*.sql 을 순서대로 적용하고, utils/pushdown.py가 호출하는 RPC를 SQL로 직접 불러
+# 원본 거래로 만든 DailyCube와 비교
+#   python check_migration.py --dsn postgresql://postgres@localhost:5432/postgres
+#   python check_migration.py            # DSN이 없으면 pgserver 패키지로 임시 Postgres 실행
+# 필요: pip install "psycopg[binary]" (DSN 없이 실행하려면 pgserver도)
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "supabase", "migrations")
+DATABASE = "dashboard_migration_check"
+COLUMNS = [
+    "id", "spend.authorizedAt", "spend.status", "spend.amount", "spend.userId",
+    "spend.merchantName", "spend.merchantCountry", "spend.merchantCategory",
+]
+
+
+# 여러 시각 표기 + 파싱할 수 없는 값, 숫자가 아닌 금액, 비어 있는 차원 / 유저 / 상태를 섞은 거래
+def synthetic(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp("2025-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 120 * 86400, rows), unit="s")
+    formats = rng.integers(0, 4, rows)
+    stamps = np.select(
+        [formats == 0, formats == 1, formats == 2],
+        [ts.strftime("%Y-%m-%dT%H:%M:%S+00:00"), ts.strftime("%Y-%m-%d %H:%M:%S+00"), ts.strftime("%Y-%m-%dT%H:%M:%SZ")],
+        ts.tz_convert("Asia/Seoul").strftime("%Y-%m-%dT%H:%M:%S+09:00"),
+    ).astype(object)
+    stamps[rng.random(rows) < 0.01] = "2025-02-30 10:00:00"
+    stamps[rng.random(rows) < 0.01] = "not a date"
+    stamps[rng.random(rows) < 0.01] = None
+
+    def sometimes_null(values, share=0.05):
+        values = np.asarray(values, dtype=object)
+        values[rng.random(rows) < share] = None
+        return values
+
+    amounts = rng.integers(-5000, 50000, rows).astype(str).astype(object)
+    amounts[rng.random(rows) < 0.01] = "n/a"
+    users = rng.integers(0, 800, rows)
+    return pd.DataFrame({
+        "id": [f"tx{i:08d}" for i in range(rows)],
+        "spend.authorizedAt": stamps,
+        "spend.status": sometimes_null(rng.choice(["COMPLETED", "Pending", "reversed", " declined "], rows), 0.01),
+        "spend.amount": sometimes_null(amounts, 0.01),
+        "spend.userId": sometimes_null([f"user-{u}" for u in users], 0.01),
+        "spend.merchantName": sometimes_null(rng.choice([f"Merchant {i}" for i in range(60)], rows)),
+        "spend.merchantCountry": sometimes_null(rng.choice(["US", "KR", "GB", "FR", "DE", "JP"], rows)),
+        "spend.merchantCategory": sometimes_null(rng.choice([f"category {i}" for i in range(12)], rows)),
+    })
+
+
+def connect(dsn):
+    import psycopg
+    from psycopg.types.string import StrDumperUnknown
+
+    with psycopg.connect(dsn, autocommit=True) as admin:
+        admin.execute(f"drop database if exists {DATABASE}")
+        admin.execute(f"create database {DATABASE}")
+    conn = psycopg.connect(psycopg.conninfo.make_conninfo(dsn, dbname=DATABASE), autocommit=True)
+    # PostgREST처럼 인자를 타입 없는 리터럴로 넘겨 함수 시그니처로 해석되게 함 (예: '{completed,pending}' → text[])
+    conn.adapters.register_dumper(str, StrDumperUnknown)
+    return conn
+
+
+def load(conn, raw):
+    conn.execute("create table public.transactions ("
+                 + ", ".join(f'"{c}" text' + (" primary key" if c == "id" else "") for c in COLUMNS) + ")")
+    with conn.cursor().copy(f"copy public.transactions ({', '.join(f'{chr(34)}{c}{chr(34)}' for c in COLUMNS)}) from stdin") as copy:
+        for row in raw[COLUMNS].astype(object).itertuples(index=False):
+            copy.write_row([None if pd.isna(v) else v for v in row])
+
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS, "*.sql"))):
+        print(f"apply {os.path.relpath(path)}")
+        conn.execute(open(path).read())
+
+
+# GET /rpc/{name}?k=v 와 같은 호출을 SQL로 (select name(k => v, ...))
+def sql_call(conn):
+    from psycopg import sql
+
+    def call(name, params=None):
+        params = list(params or [])
+        args = sql.SQL(", ").join(sql.SQL("{} => %s").format(sql.Identifier(k)) for k, _ in params)
+        query = sql.SQL("select public.{}({})").format(sql.Identifier(name), args)
+        return conn.execute(query, [v for _, v in params]).fetchone()[0]
+
+    return call
+
+
+def compare_merchants(df, merchants):
+    active = df[df["spend.status"].isin(STATUSES) & df["spend.merchantName"].notna()]
+    spend = active.groupby(["month", "spend.merchantName"], observed=True)["spend.amount"].sum()
+    spend.index = pd.MultiIndex.from_arrays([spend.index.get_level_values(0),
+                                             spend.index.get_level_values(1).astype(str)])
+    server = merchants.set_index(["month", "merchant"])["spend_cents"]
+    per_month = spend.groupby(level=0).size().clip(upper=10)
+    return [
+        same("monthly merchants spend", spend.reindex(server.index), server),
+        same("monthly merchants per month", per_month, merchants.groupby("month").size()),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the dashboard migrations to a scratch Postgres database "
+                                                 "and compare the aggregate RPCs with the client cube")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"),
+                        help="Postgres connection string with permission to create databases (default: DATABASE_URL)")
+    parser.add_argument("--rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    server_process = None
+    if not args.dsn:
+        import pgserver
+        server_process = pgserver.get_server(tempfile.mkdtemp(prefix="dashboard-pg-"), cleanup_mode="stop")
+        args.dsn = server_process.get_uri()
+
+    raw = synthetic(args.rows)
+    conn = connect(args.dsn)
+    try:
+        load(conn, raw)
+        pushdown.call = sql_call(conn)
+
+        df = preprocess(raw.copy())
+        client = cube.build(df)
+        server = cube.build_server(fallback=lambda: client)
+        print(f"{len(raw):,} transactions ({len(df):,} with a valid time) → {server.rows_fetched:,} aggregate rows")
+
+        checks = [compare(client, server, user_index.build_full(df))]
+        checks.append(same("unique users where country=US (fallback)",
+                           client.unique_users(by="week", where={"country": "US"}),
+                           server.unique_users(by="week", where={"country": "US"})))
+        checks += compare_merchants(df, pushdown.monthly_merchants())
+    finally:
+        conn.close()
+        if server_process is not None:
+            server_process.cleanup()
+
+    raise SystemExit(0 if all(checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
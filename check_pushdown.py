@@ -0,0 +1,94 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from utils import cube, pushdown, user_index, wire
+
+# ✅ 집계 pushdown 검증: Postgres 뷰 / RPC 결과가 원본 거래로 만든 큐브와 같은지 + 전송량 비교
+# supabase/migrations/*_dashboard_aggregates.sql 을 적용한 PostgREST에서 실행
+#   python check_pushdown.py --url http://localhost:3000
+# (PostgREST 없이 마이그레이션만 검증하려면 check_migration.py)
+STATUSES = ["completed", "pending"]
+
+
+def transfer(fn):
+    wire.metrics.reset()
+    start = time.perf_counter()
+    value = fn()
+    net = wire.stats()
+    return value, net["requests"], net["bytes"], time.perf_counter() - start
+
+
+# 인덱스는 값만 비교 (클라이언트는 카테고리형, 서버는 문자열 / 정수)
+def plain(values):
+    values = pd.Series(values).astype("float64")
+    values.index = pd.Index(values.index.tolist())
+    return values.sort_index()
+
+
+def same(name, client, server):
+    client, server = plain(client), plain(server)
+    ok = client.index.equals(server.index) and np.allclose(client.to_numpy(), server.to_numpy())
+    print(f"{'ok  ' if ok else 'DIFF'} {name}")
+    if not ok:
+        diff = pd.concat({"client": client, "server": server}, axis=1)
+        print(diff[diff["client"] != diff["server"]].head(10).to_string())
+    return ok
+
+
+def compare(client, server, new_users):
+    checks = []
+    for by in (["day", "status"], ["month", "country"], ["month", "category"], ["hour"]):
+        source = "hourly" if by == ["hour"] else "facts"
+        left = client.totals(by=by, source=source)
+        right = server.totals(by=by, source=source)
+        for col in ("spend_cents", "tx_count"):
+            checks.append(same(f"totals {by} {col}", left[col], right[col]))
+
+    checks.append(same("unique users", [client.unique_users(statuses=STATUSES)],
+                       [server.unique_users(statuses=STATUSES)]))
+    for by in ("day", "week", "month", ["month", "category"], "country"):
+        checks.append(same(f"unique users by {by}", client.unique_users(by=by, statuses=STATUSES),
+                           server.unique_users(by=by, statuses=STATUSES)))
+
+    lo, hi = int(client.facts["day"].min()), int(client.facts["day"].max())
+    days = (lo + (hi - lo) // 3, hi - (hi - lo) // 3)
+    checks.append(same(f"unique users by week in days {days}", client.unique_users(by="week", statuses=STATUSES, days=days),
+                       server.unique_users(by="week", statuses=STATUSES, days=days)))
+
+    latest_week = int(client.facts["week"].max())
+    checks.append(same(f"week {latest_week} activity", list(client.week_activity(latest_week)),
+                       list(server.week_activity(latest_week))))
+
+    for grain in ("day", "week", "month"):
+        checks.append(same(f"new users by {grain}", new_users[f"first_{grain}"].value_counts(),
+                           server.new_users(grain)))
+    return all(checks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare server-side dashboard aggregates with the client cube")
+    parser.add_argument("--url", help="PostgREST endpoint (default: POSTGREST_URL / SUPABASE_URL)")
+    args = parser.parse_args()
+    from utils.supabase import load_data
+
+    if args.url:
+        os.environ["POSTGREST_URL"] = args.url
+
+    server, requests, nbytes, seconds = transfer(cube.build_server)
+    merchants, *_ = transfer(pushdown.monthly_merchants)
+    print(f"server: {requests:,} requests  {nbytes / 1e6:8.2f} MB  {seconds:6.2f}s  "
+          f"{server.rows_fetched:,} aggregate rows")
+
+    df, requests, nbytes, seconds = transfer(load_data)
+    print(f"client: {requests:,} requests  {nbytes / 1e6:8.2f} MB  {seconds:6.2f}s  {len(df):,} transactions")
+
+    client = cube.build(df)
+    ok = compare(client, server, user_index.build_full(df))
+    print(f"monthly merchants: {len(merchants):,} rows from {pushdown.MERCHANTS_RPC}")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import numpy as np
+import pandas as pd
+from utils import risk
+from utils.preprocess import preprocess
+
+# ✅ 리스크 증분 상태 검증: 합성 동기화(룩백으로 다시 받은 행 + 상태 / 금액이 바뀐 행 + 새 거래 +
+# 과거 시각의 늦게 들어온 거래)를 여러 번 적용한 update() 결과가 같은 df로 만든 init_state()와 같은지
+# (인덱스 이름 / 컬럼 / 타입 / 값) + 갱신된 상태로 화면용 리포트를 만들 수 있는지 확인
+#   python check_risk_state.py --rows 20000 --syncs 8
+STATUSES = ["completed", "pending", "reversed", "declined"]
+
+
+def synthetic(rng, rows, start, span, first_id, users=200):
+    return pd.DataFrame({
+        "id": np.arange(first_id, first_id + rows).astype(str),
+        "spend.authorizedAt": start + pd.to_timedelta(rng.integers(0, span, rows), unit="s"),
+        "spend.status": rng.choice(STATUSES, rows, p=[0.5, 0.2, 0.2, 0.1]),
+        "spend.amount": rng.choice([100, -100, 500, -500, 2500, 1000, 0, 99999], rows),
+        "spend.userId": rng.choice([f"user-{i}" for i in range(users)] + [None], rows),
+    })
+
+
+def prepare(raw):
+    raw = raw.sort_values("spend.authorizedAt", kind="stable").assign(**{
+        "spend.amount": raw["spend.amount"].astype(str),
+        "spend.authorizedAt": raw["spend.authorizedAt"].dt.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+    })
+    return preprocess(raw)
+
+
+# 행 순서만 무시하고 비교 (인덱스 이름 / 컬럼 순서 / 타입까지 같아야 함)
+def same_frame(name, updated, full):
+    try:
+        if updated.index.names != full.index.names:
+            raise AssertionError(f"index names {updated.index.names} != {full.index.names}")
+        pd.testing.assert_frame_equal(updated.sort_index(), full.sort_index(), check_categorical=False)
+    except AssertionError as e:
+        print(f"DIFF {name}: {e}")
+        return False
+    print(f"ok   {name}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare incrementally updated risk state with a full rebuild")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--syncs", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    start = pd.Timestamp("2025-04-01", tz="UTC")
+    raw = synthetic(rng, args.rows, start, 60 * 86400, 0)
+    state = risk.init_state(prepare(raw))
+    next_id = args.rows
+
+    checks = []
+    for step in range(args.syncs):
+        # 최근 7일을 다시 받고 그 중 일부는 상태 / 금액 변경, 그 뒤에 새 거래 (가끔 과거 시각 거래도)
+        end = raw["spend.authorizedAt"].max()
+        lookback = raw[raw["spend.authorizedAt"] >= end - pd.Timedelta(days=7)].copy()
+        lookback.loc[rng.random(len(lookback)) < 0.1, "spend.status"] = "reversed"
+        flipped = rng.random(len(lookback)) < 0.03
+        lookback.loc[flipped, "spend.amount"] = -lookback.loc[flipped, "spend.amount"]
+        fresh = synthetic(rng, args.rows // 20, end + pd.Timedelta(seconds=1), 2 * 86400, next_id)
+        next_id += len(fresh)
+        if step % 3 == 0:
+            late = synthetic(rng, 10, end - pd.Timedelta(days=3), 86400, next_id)
+            next_id += len(late)
+            fresh = pd.concat([fresh, late], ignore_index=True)
+
+        delta = pd.concat([lookback, fresh], ignore_index=True)
+        raw = pd.concat([raw[~raw["id"].isin(delta["id"])], delta], ignore_index=True)
+        df = prepare(raw)
+        state = risk.update(state, df, delta["id"].tolist())
+        full = risk.init_state(df)
+        for name in risk.RiskState.FRAMES:
+            checks.append(same_frame(f"sync {step} {name}", getattr(state, name), getattr(full, name)))
+
+    # 갱신된 상태로 만든 리포트가 규칙 발동 유저를 조회할 수 있는지 (summary 인덱스 이름 → hits 컬럼)
+    report = risk.report(state, df)
+    print(f"report: {len(report.scores):,} flagged users, {len(report.velocity_users()):,} velocity users")
+    raise SystemExit(0 if all(checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,42 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
-
-def render(df_total):
+from utils import schema, charts, cube, user_index
+from utils.preprocess import day_to_date, week_label
+from utils.downsample import plot_series
+
+# ✅ 이 탭이 사용하는 원본 컬럼 (load_data select 프로젝션에 반영)
+COLUMNS = schema.register("analytics", [
+    "spend.amount",
+    "spend.status",
+    "spend.authorizedAt",
+    "spend.userId"
+])
+
+# ✅ 다른 탭을 보는 동안 백그라운드에서 미리 계산할 데이터
+def prefetch(bundle):
+    cube.get(bundle)
+    user_index.new_users(bundle, "day")
+
+def render(bundle):
     st.header("📈 Analytics Overview")
 
-    df = df_total.copy()
-
-    # ✅ 날짜 전처리
-    df["spend.authorizedAt"] = pd.to_datetime(df["spend.authorizedAt"], errors="coerce")
-    df["date"] = df["spend.authorizedAt"].dt.date
-    df["week"] = pd.to_datetime(df["date"]).dt.to_period("W").astype(str)
+    # ✅ 완료 + 대기 거래 기준 (일별 큐브에서 조회)
+    c = cube.get(bundle)
+    statuses = ["completed", "pending"]
 
     # ✅ KPI: 최상단 카드
-    total_spend = df["spend.amount_usd"].sum()
-    total_tx = len(df)
-    total_users = df["spend.userEmail"].nunique()
+    totals = c.totals(statuses=statuses)
+    total_spend = totals["spend_usd"]
+    total_tx = int(totals["tx_count"])
+    total_users = c.unique_users(statuses=statuses)
 
     col1, col2, col3 = st.columns(3)
     col1.metric("🔹 Total Spend", f"${total_spend:,.2f}")
     col2.metric("🔹 Total Transactions", f"{total_tx:,}")
     col3.metric("🔹 Unique Users", f"{total_users:,}")
+    if c.distinct_note():
+        st.caption(c.distinct_note())
 
     st.divider()
 
@@ -39,22 +54,15 @@ def render(df_total):
     # ✅ 📆 Daily Data Section
     st.subheader("📆 Daily Data")
 
-    # 누락 제거
-    df = df.dropna(subset=["spend.userEmail", "date"])
-
-    daily_stats = df.groupby("date").agg(
-        total_spend=("spend.amount_usd", "sum"),
-        tx_count=("spend.amount_usd", "count"),
-        unique_users=("spend.userEmail", "nunique")
-    ).reset_index()
+    daily_stats = c.totals(by="day", statuses=statuses)[["spend_usd", "tx_count"]] \
+        .rename(columns={"spend_usd": "total_spend"})
+    daily_stats["unique_users"] = c.unique_users(by="day", statuses=statuses)
 
-    # 신규 유저 추출
-    try:
-        user_min_date = df.groupby("spend.userEmail")["date"].min().reset_index()
-        new_user_daily = user_min_date["date"].value_counts().sort_index().rename_axis("date").reset_index(name="new_users")
-        daily_stats = pd.merge(daily_stats, new_user_daily, on="date", how="left").fillna(0)
-    except Exception as e:
-        daily_stats["new_users"] = 0
+    # 신규 유저 추출 (유저 인덱스의 첫 거래일)
+    new_user_daily = user_index.new_users(bundle, "day")
+    daily_stats["new_users"] = new_user_daily.reindex(daily_stats.index, fill_value=0)
+    daily_stats = daily_stats.reset_index()
+    daily_stats["date"] = day_to_date(daily_stats["day"])
 
     daily_stats["avg_spend_per_user"] = daily_stats["total_spend"] / daily_stats["unique_users"]
     daily_stats["avg_tx_per_user"] = daily_stats["tx_count"] / daily_stats["unique_users"]
@@ -65,57 +73,65 @@ def render(df_total):
     with col1:
         st.subheader("📊 Daily Active Users (DAU)")
         dau = daily_stats.set_index("date")["unique_users"]
-        fig, ax = plt.subplots(figsize=(7, 3))
-        dau.tail(30).plot(ax=ax, marker='o', color='royalblue')
-        ax.set_title("DAU (Past 30 Days)")
-        ax.set_ylabel("Users")
-        ax.tick_params(axis='x', rotation=30)
-        ax.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig)
+        def draw_dau():
+            fig, ax = plt.subplots(figsize=(7, 3))
+            dau.tail(30).plot(ax=ax, marker='o', color='royalblue')
+            ax.set_title("DAU (Past 30 Days)")
+            ax.set_ylabel("Users")
+            ax.tick_params(axis='x', rotation=30)
+            ax.grid(True, linestyle='--', alpha=0.4)
+            return fig
+        charts.show("analytics.dau", bundle, draw_dau)
 
     with col2:
         st.subheader("🧑‍💼 Daily New Users")
-        fig2, ax2 = plt.subplots(figsize=(7, 3))
-        ax2.plot(daily_stats["date"], daily_stats["new_users"], marker='o', color='mediumseagreen')
-        ax2.set_title("New Users per Day")
-        ax2.set_ylabel("Users")
-        ax2.tick_params(axis='x', rotation=30)
-        ax2.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig2)
+        def draw_daily_new_users():
+            fig2, ax2 = plt.subplots(figsize=(7, 3))
+            plot_series(ax2, daily_stats["date"], daily_stats["new_users"], marker='o', color='mediumseagreen')
+            ax2.set_title("New Users per Day")
+            ax2.set_ylabel("Users")
+            ax2.tick_params(axis='x', rotation=30)
+            ax2.grid(True, linestyle='--', alpha=0.4)
+            return fig2
+        charts.show("analytics.daily_new_users", bundle, draw_daily_new_users)
 
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("💰 Daily Total Spend")
-        fig3, ax3 = plt.subplots(figsize=(7, 3))
-        ax3.plot(daily_stats["date"], daily_stats["total_spend"], marker='o', color='blue')
-        ax3.set_title("Daily Spend")
-        ax3.set_ylabel("USD")
-        ax3.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-        ax3.tick_params(axis='x', rotation=30)
-        ax3.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig3)
+        def draw_daily_spend():
+            fig3, ax3 = plt.subplots(figsize=(7, 3))
+            plot_series(ax3, daily_stats["date"], daily_stats["total_spend"], marker='o', color='blue')
+            ax3.set_title("Daily Spend")
+            ax3.set_ylabel("USD")
+            ax3.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+            ax3.tick_params(axis='x', rotation=30)
+            ax3.grid(True, linestyle='--', alpha=0.4)
+            return fig3
+        charts.show("analytics.daily_spend", bundle, draw_daily_spend)
 
     with col2:
         st.subheader("🧾 Daily Transactions")
-        fig4, ax4 = plt.subplots(figsize=(7, 3))
-        ax4.plot(daily_stats["date"], daily_stats["tx_count"], marker='o', color='orange')
-        ax4.set_title("Transaction Count")
-        ax4.set_ylabel("Tx Count")
-        ax4.tick_params(axis='x', rotation=30)
-        ax4.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig4)
+        def draw_daily_tx():
+            fig4, ax4 = plt.subplots(figsize=(7, 3))
+            plot_series(ax4, daily_stats["date"], daily_stats["tx_count"], marker='o', color='orange')
+            ax4.set_title("Transaction Count")
+            ax4.set_ylabel("Tx Count")
+            ax4.tick_params(axis='x', rotation=30)
+            ax4.grid(True, linestyle='--', alpha=0.4)
+            return fig4
+        charts.show("analytics.daily_tx", bundle, draw_daily_tx)
 
     st.divider()
 
     # ✅ 📅 Weekly Summary Section
     st.subheader("📅 Weekly Data")
 
-    weekly = df.groupby("week").agg(
-        user_count=("spend.userEmail", "nunique"),
-        total_tx=("spend.amount_usd", "count"),
-        total_spend=("spend.amount_usd", "sum")
-    ).reset_index()
+    weekly = c.totals(by="week", statuses=statuses)[["spend_usd", "tx_count"]] \
+        .rename(columns={"spend_usd": "total_spend", "tx_count": "total_tx"})
+    weekly["user_count"] = c.unique_users(by="week", statuses=statuses)
+    weekly = weekly.reset_index()
+    weekly["week"] = week_label(weekly["week"])
 
     weekly["avg_spend_per_user"] = weekly["total_spend"] / weekly["user_count"]
     weekly["avg_spend_per_tx"] = weekly["total_spend"] / weekly["total_tx"]
@@ -124,40 +140,48 @@ def render(df_total):
 
     with col1:
         st.subheader("👥 Weekly Unique Users")
-        fig5, ax5 = plt.subplots(figsize=(7, 3))
-        ax5.plot(weekly["week"], weekly["user_count"], marker='o')
-        ax5.set_title("Weekly Unique Users")
-        ax5.set_ylabel("Users")
-        ax5.tick_params(axis='x', rotation=30)
-        ax5.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig5)
+        def draw_weekly_users():
+            fig5, ax5 = plt.subplots(figsize=(7, 3))
+            ax5.plot(weekly["week"], weekly["user_count"], marker='o')
+            ax5.set_title("Weekly Unique Users")
+            ax5.set_ylabel("Users")
+            ax5.tick_params(axis='x', rotation=30)
+            ax5.grid(True, linestyle='--', alpha=0.4)
+            return fig5
+        charts.show("analytics.weekly_users", bundle, draw_weekly_users)
 
         st.subheader("🧾 Weekly Transactions")
-        fig6, ax6 = plt.subplots(figsize=(7, 3))
-        ax6.plot(weekly["week"], weekly["total_tx"], marker='o', color='orange')
-        ax6.set_title("Weekly Transactions")
-        ax6.set_ylabel("Tx Count")
-        ax6.tick_params(axis='x', rotation=30)
-        ax6.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig6)
+        def draw_weekly_tx():
+            fig6, ax6 = plt.subplots(figsize=(7, 3))
+            ax6.plot(weekly["week"], weekly["total_tx"], marker='o', color='orange')
+            ax6.set_title("Weekly Transactions")
+            ax6.set_ylabel("Tx Count")
+            ax6.tick_params(axis='x', rotation=30)
+            ax6.grid(True, linestyle='--', alpha=0.4)
+            return fig6
+        charts.show("analytics.weekly_tx", bundle, draw_weekly_tx)
 
     with col2:
         st.subheader("💳 Weekly Avg Spend per Unique User")
-        fig7, ax7 = plt.subplots(figsize=(7, 3))
-        ax7.plot(weekly["week"], weekly["avg_spend_per_user"], marker='o', color='green')
-        ax7.set_title("Weekly Avg/User")
-        ax7.set_ylabel("USD")
-        ax7.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-        ax7.tick_params(axis='x', rotation=30)
-        ax7.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig7)
+        def draw_weekly_avg_user():
+            fig7, ax7 = plt.subplots(figsize=(7, 3))
+            ax7.plot(weekly["week"], weekly["avg_spend_per_user"], marker='o', color='green')
+            ax7.set_title("Weekly Avg/User")
+            ax7.set_ylabel("USD")
+            ax7.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+            ax7.tick_params(axis='x', rotation=30)
+            ax7.grid(True, linestyle='--', alpha=0.4)
+            return fig7
+        charts.show("analytics.weekly_avg_user", bundle, draw_weekly_avg_user)
 
         st.subheader("💸 Weekly Avg Spend per Tx")
-        fig8, ax8 = plt.subplots(figsize=(7, 3))
-        ax8.plot(weekly["week"], weekly["avg_spend_per_tx"], marker='o', color='seagreen')
-        ax8.set_title("Weekly Avg/Tx")
-        ax8.set_ylabel("USD")
-        ax8.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-        ax8.tick_params(axis='x', rotation=30)
-        ax8.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig8)
+        def draw_weekly_avg_tx():
+            fig8, ax8 = plt.subplots(figsize=(7, 3))
+            ax8.plot(weekly["week"], weekly["avg_spend_per_tx"], marker='o', color='seagreen')
+            ax8.set_title("Weekly Avg/Tx")
+            ax8.set_ylabel("USD")
+            ax8.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+            ax8.tick_params(axis='x', rotation=30)
+            ax8.grid(True, linestyle='--', alpha=0.4)
+            return fig8
+        charts.show("analytics.weekly_avg_tx", bundle, draw_weekly_avg_tx)
@@ -2,55 +2,57 @@ import streamlit as st
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import pandas as pd
-import pycountry
 import plotly.express as px
+from utils import schema, charts, cube, countries
 
-def render(df_completed, df_pending):
-    st.header("🌍 Country-Based Analysis")
+# ✅ 이 탭이 사용하는 원본 컬럼 (load_data select 프로젝션에 반영)
+COLUMNS = schema.register("country", [
+    "spend.amount",
+    "spend.status",
+    "spend.merchantCountry"
+])
 
-    # ✅ 국가코드 → 국가명 / ISO3 변환 함수
-    def get_country_name(code):
-        try:
-            return pycountry.countries.get(alpha_2=code).name
-        except:
-            return code
+# ✅ 다른 탭을 보는 동안 백그라운드에서 미리 계산할 데이터
+def prefetch(bundle):
+    cube.get(bundle)
 
-    def get_iso3(code):
-        try:
-            return pycountry.countries.get(alpha_2=code).alpha_3
-        except:
-            return None
+def render(bundle):
+    st.header("🌍 Country-Based Analysis")
 
     # ✅ 국가별 지출 합계
-    spend_completed = df_completed.groupby("spend.merchantCountry")["spend.amount_usd"].sum()
-    spend_pending = df_pending.groupby("spend.merchantCountry")["spend.amount_usd"].sum()
+    c = cube.get(bundle)
+    spend_completed = c.totals(by="country", statuses=["completed"])["spend_usd"]
+    spend_pending = c.totals(by="country", statuses=["pending"])["spend_usd"]
 
     country_df = pd.DataFrame({
         "Completed": spend_completed,
         "Pending": spend_pending
     }).fillna(0)
 
-    country_df.index = country_df.index.map(get_country_name)
+    country_df.index = countries.names(country_df.index)
     country_df["Total"] = country_df["Completed"] + country_df["Pending"]
     top10_df = country_df.sort_values("Total", ascending=False).head(10)[["Completed", "Pending"]]
 
     # ✅ 상위 10개 국가 스택형 바차트
     st.subheader("📊 Top 10 Countries by Spend")
-    fig, ax = plt.subplots(figsize=(10, 4))
-    top10_df.plot(kind="bar", stacked=True, color=["green", "orange"], ax=ax)
-    ax.set_title("Top 10 Countries by Total Spend")
-    ax.set_ylabel("Spend (USD)")
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-    ax.set_xticklabels(ax.get_xticklabels(), rotation=45)
-    ax.grid(True, linestyle='--', alpha=0.3)
-    st.pyplot(fig)
+    def draw_top10_spend():
+        fig, ax = plt.subplots(figsize=(10, 4))
+        top10_df.plot(kind="bar", stacked=True, color=["green", "orange"], ax=ax)
+        ax.set_title("Top 10 Countries by Total Spend")
+        ax.set_ylabel("Spend (USD)")
+        ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+        ax.set_xticklabels(ax.get_xticklabels(), rotation=45)
+        ax.grid(True, linestyle='--', alpha=0.3)
+        return fig
+    charts.show("country.top10_spend", bundle, draw_top10_spend)
 
     # ✅ Choropleth 지도 시각화
     st.subheader("🗺️ Global Distribution of Completed Transactions")
-    country_counts = df_completed["spend.merchantCountry"].value_counts().reset_index()
+    country_counts = c.totals(by="country", statuses=["completed"])["tx_count"].sort_values(ascending=False)
+    country_counts = country_counts[country_counts > 0].reset_index()
     country_counts.columns = ["country_code", "appeared"]
-    country_counts["iso3"] = country_counts["country_code"].apply(get_iso3)
-    country_counts["country_name"] = country_counts["country_code"].apply(get_country_name)
+    country_counts["iso3"] = countries.iso3(country_counts["country_code"])
+    country_counts["country_name"] = countries.names(country_counts["country_code"])
     map_df = country_counts.dropna(subset=["iso3"])
 
     fig_map = px.choropleth(
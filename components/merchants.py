@@ -1,31 +1,31 @@
 import streamlit as st
-import pandas as pd
-import pycountry
-from supabase import create_client
-import os
-
-# Supabase 연결
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+from utils import schema, countries, users, topk
+
+# ✅ 이 탭이 사용하는 원본 컬럼 (load_data select 프로젝션에 반영)
+COLUMNS = schema.register("merchants", [
+    "spend.amount",
+    "spend.status",
+    "spend.userId",
+    "spend.userEmail",
+    "spend.merchantName",
+    "spend.merchantCountry"
+])
 
 ADMIN_PASSWORD = st.secrets["admin"]["password"]
 
-# ✅ 국가코드 → 국가명
-def get_country_name(code):
-    try:
-        return pycountry.countries.get(alpha_2=code.upper()).name
-    except:
-        return code
+# ✅ 다른 탭을 보는 동안 백그라운드에서 미리 가져올 데이터
+def prefetch(bundle):
+    users.get(bundle)
 
-def render(df_completed):
+def render(bundle):
     st.header("🏪 Top Merchants & Users")
+    df_completed = bundle.df_completed
 
     pw_input = st.text_input("Enter the admin password to view full user IDs", type="password")
 
     unique_users = df_completed["spend.userId"].unique()
     anon_map = {uid: f"User {i+1:03d}" for i, uid in enumerate(unique_users)}
-    df_completed["anon_user_id"] = df_completed["spend.userId"].map(anon_map)
+    df_completed = df_completed.assign(anon_user_id=df_completed["spend.userId"].map(anon_map))
 
     user_col = "spend.userId" if pw_input == ADMIN_PASSWORD else "anon_user_id"
     if pw_input == ADMIN_PASSWORD:
@@ -33,35 +33,28 @@ def render(df_completed):
     else:
         st.info("🕶️ Showing anonymized user IDs")
 
-    # ✅ 유저 테이블에서 countryCode 가져오기
-    users_data = supabase.table("users").select("id, address").execute().data
-    users_df = pd.DataFrame(users_data)
-    users_df["country_code"] = users_df["address"].apply(
-        lambda x: x.get("countryCode") if isinstance(x, dict) and "countryCode" in x else None
-    )
-    users_df["user_country"] = users_df["country_code"].apply(get_country_name)
-
-    df_completed = df_completed.merge(
-        users_df[["id", "user_country"]],
-        left_on="spend.userId",
-        right_on="id",
-        how="left"
+    # ✅ 유저 국가 (데이터 버전당 한 번 조회된 유저 차원에서 카테고리 코드로 매핑)
+    df_completed = df_completed.assign(
+        user_country=users.country_of(users.get(bundle), df_completed["spend.userId"])
     )
 
-    # ✅ 각 유저가 가장 많이 지출한 2개 국가 계산
-    user_country_spend = df_completed.groupby(["spend.userId", "spend.merchantCountry"])["spend.amount_usd"].sum().reset_index()
-    user_country_spend["rank"] = user_country_spend.groupby("spend.userId")["spend.amount_usd"].rank(method="first", ascending=False)
-    top2_countries = user_country_spend[user_country_spend["rank"] <= 2].sort_values(["spend.userId", "rank"])
+    # ✅ Top 20 유저 (유저별 합계 한 번 → 부분 선택, 금액은 정수 cents로 합산)
+    user_spend = topk.grouped(df_completed, "spend.userId", sums={"spend.amount": "spend.amount"})
+    top_users = topk.top(user_spend, "spend.amount", 20).reset_index()
+    top_users["spend.amount_usd"] = top_users["spend.amount"] / 100
 
-    # ✅ 국가 코드 → 이름으로 변환
-    top2_countries["country_name"] = top2_countries["spend.merchantCountry"].apply(get_country_name)
+    # ✅ 각 유저가 가장 많이 지출한 2개 국가 (유저별 Top-K, 상위 20명만 이름 변환)
+    user_country_spend = topk.grouped(
+        df_completed[df_completed["spend.userId"].isin(top_users["spend.userId"])],
+        ["spend.userId", "spend.merchantCountry"], sums={"spend.amount": "spend.amount"}
+    ).reset_index()
+    top2_countries = topk.top_per_group(user_country_spend, "spend.userId", "spend.amount", 2)
+    top2_countries["country_name"] = countries.names(top2_countries["spend.merchantCountry"])
 
     # ✅ Top 2 국가 병합
-    country_list = top2_countries.groupby("spend.userId")["country_name"].apply(lambda x: ", ".join(x)).reset_index()
+    country_list = top2_countries.groupby("spend.userId", observed=True)["country_name"].agg(", ".join).reset_index()
     country_list.columns = ["spend.userId", "top_countries_spent"]
 
-    # ✅ Top 20 유저 집계
-    top_users = df_completed.groupby("spend.userId")["spend.amount_usd"].sum().sort_values(ascending=False).head(20).reset_index()
     top_users = top_users.merge(
         df_completed[["spend.userId", "anon_user_id", "user_country"]].drop_duplicates("spend.userId"),
         on="spend.userId", how="left"
@@ -74,20 +67,21 @@ def render(df_completed):
     st.subheader("🔝 Top 20 Users by Total Spend")
     st.dataframe(top_users)
 
-    # ✅ Top 10 Merchants by Spend
-    top_merchants_by_spend = df_completed.groupby("spend.merchantName")["spend.amount_usd"] \
-        .sum().sort_values(ascending=False).head(10).reset_index()
-    top_merchants_by_spend.columns = ["Merchant", "Total Spend (USD)"]
+    # ✅ 가맹점별 지출 / 거래 수 / 고유 유저 수를 한 번에 집계 → 지표별 Top 10
+    merchant_stats = topk.grouped(
+        df_completed, "spend.merchantName",
+        sums={"Total Spend (USD)": "spend.amount"},
+        distinct={"Unique User Count": "spend.userEmail"},
+        count="Transaction Count",
+    )
+    merchant_stats["Total Spend (USD)"] /= 100
 
-    # ✅ Top 10 Merchants by Transaction Count
-    top_merchants_by_count = df_completed["spend.merchantName"] \
-        .value_counts().head(10).reset_index()
-    top_merchants_by_count.columns = ["Merchant", "Transaction Count"]
+    def top_merchants(metric):
+        return topk.top(merchant_stats[[metric]], metric, 10).rename_axis("Merchant").reset_index()
 
-    # ✅ Top 10 Merchants by Unique Users
-    top_merchants_by_users = df_completed.groupby("spend.merchantName")["spend.userEmail"] \
-        .nunique().sort_values(ascending=False).head(10).reset_index()
-    top_merchants_by_users.columns = ["Merchant", "Unique User Count"]
+    top_merchants_by_spend = top_merchants("Total Spend (USD)")
+    top_merchants_by_count = top_merchants("Transaction Count")
+    top_merchants_by_users = top_merchants("Unique User Count")
 
     col1, col2 = st.columns(2)
     with col1:
@@ -1,54 +1,64 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
-import pycountry
-
-def render(df):
+from utils import schema, charts, monthly, countries, cube
+from utils.preprocess import day_to_date, month_label
+
+# ✅ 이 탭이 사용하는 원본 컬럼 (load_data select 프로젝션에 반영)
+COLUMNS = schema.register("monthly_report", [
+    "spend.amount",
+    "spend.status",
+    "spend.authorizedAt",
+    "spend.userId",
+    "spend.merchantName",
+    "spend.merchantCountry",
+    "spend.merchantCategory"
+])
+
+# ✅ 다른 탭을 보는 동안 백그라운드에서 미리 계산할 데이터
+def prefetch(bundle):
+    monthly.get(bundle)
+
+def render(bundle):
     st.header("📅 Monthly Report")
 
-    # ✅ 날짜 전처리 및 NaT 제거
-    df["spend.authorizedAt"] = pd.to_datetime(df["spend.authorizedAt"], errors="coerce")
-    df = df[df["spend.authorizedAt"].notna()]
+    # ✅ 월별 인덱스 (데이터 버전당 한 번 생성 → 월 전환은 조회만)
+    index = monthly.get(bundle)
+    available_months = index.months()
 
-    # ✅ 월 파싱
-    df["month"] = df["spend.authorizedAt"].dt.to_period("M").astype(str)
-    available_months = sorted(df["month"].unique(), reverse=True)
+    def fmt_month(m):
+        return month_label([m])[0]
 
-    # ✅ 월 선택
-    selected_month = st.selectbox("📆 Select Month", available_months)
+    # ✅ 월 선택 + 비교 월 선택 (기본값: 직전 월)
+    col1, col2 = st.columns(2)
+    selected_month = col1.selectbox("📆 Select Month", available_months, format_func=fmt_month)
     selected_idx = available_months.index(selected_month)
-    prev_month = available_months[selected_idx + 1] if selected_idx + 1 < len(available_months) else None
-
-    # ✅ 월 데이터 필터링
-    df_month = df[df["month"] == selected_month]
-    df_prev = df[df["month"] == prev_month] if prev_month else pd.DataFrame()
-
-    # ✅ KPI 계산 함수
-    def calc_kpi(d):
-        if d.empty:
-            return {"total_spend": 0, "tx_count": 0, "unique_users": 0}
-        return {
-            "total_spend": d["spend.amount_usd"].sum(),
-            "tx_count": d["spend.amount_usd"].count(),
-            "unique_users": d["spend.userEmail"].nunique()
-        }
-
-    kpi = calc_kpi(df_month)
-    prev_kpi = calc_kpi(df_prev)
-
-    def delta(current, prev):
-        if prev == 0:
+    compare_options = [m for m in available_months if m != selected_month]
+    default_compare = available_months[selected_idx + 1] if selected_idx + 1 < len(available_months) else None
+    compare_month = col2.selectbox(
+        "↔️ Compare with", [None] + compare_options,
+        index=([None] + compare_options).index(default_compare),
+        format_func=lambda m: "—" if m is None else fmt_month(m)
+    )
+
+    kpi = index.kpi(selected_month)
+    deltas = index.delta(selected_month, compare_month)
+
+    def delta(key):
+        change = deltas[key]
+        if change is None:
             return "N/A"
-        change = (current - prev) / prev * 100
         sign = "🔺" if change >= 0 else "🔻"
         return f"{sign} {change:.1f}%"
 
     # ✅ KPI 카드
     col1, col2, col3 = st.columns(3)
-    col1.metric("💰 Total Spend", f"${kpi['total_spend']:,.2f}", delta(kpi['total_spend'], prev_kpi['total_spend']))
-    col2.metric("🧾 Transactions", f"{kpi['tx_count']:,}", delta(kpi['tx_count'], prev_kpi['tx_count']))
-    col3.metric("👥 Unique Users", f"{kpi['unique_users']:,}", delta(kpi['unique_users'], prev_kpi['unique_users']))
+    col1.metric("💰 Total Spend", f"${kpi['total_spend']:,.2f}", delta("total_spend"))
+    col2.metric("🧾 Transactions", f"{kpi['tx_count']:,}", delta("tx_count"))
+    col3.metric("👥 Unique Users", f"{kpi['unique_users']:,}", delta("unique_users"))
+    note = cube.get(bundle).distinct_note()
+    if note:
+        st.caption(note)
 
     # ✅ 평균 계산
     avg_tx = kpi["total_spend"] / kpi["tx_count"] if kpi["tx_count"] else 0
@@ -62,103 +72,94 @@ def render(df):
 
     # ✅ 일자별 지표
     st.markdown("### 📈 Daily Spend & Tx")
-    df_month["date"] = df_month["spend.authorizedAt"].dt.date
-    daily = df_month.groupby("date").agg(
-        spend=("spend.amount_usd", "sum"),
-        txs=("spend.amount_usd", "count"),
-        users=("spend.userEmail", "nunique")
-    ).reset_index()
+    daily = index.daily_for(selected_month).reset_index()
+    daily["date"] = day_to_date(daily["day"])
 
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("📅 Daily Spend")
-        fig, ax = plt.subplots(figsize=(7,3))
-        ax.plot(daily["date"], daily["spend"], marker='o', color='seagreen')
-        ax.set_ylabel("USD")
-        ax.grid(True, linestyle="--", alpha=0.4)
-        st.pyplot(fig)
+        def draw_daily_spend():
+            fig, ax = plt.subplots(figsize=(7,3))
+            ax.plot(daily["date"], daily["spend"], marker='o', color='seagreen')
+            ax.set_ylabel("USD")
+            ax.grid(True, linestyle="--", alpha=0.4)
+            return fig
+        charts.show("monthly_report.daily_spend", bundle, draw_daily_spend, params=selected_month)
 
     with col2:
         st.subheader("📅 Daily Transactions")
-        fig2, ax2 = plt.subplots(figsize=(7,3))
-        ax2.plot(daily["date"], daily["txs"], marker='o', color='orange')
-        ax2.set_ylabel("Count")
-        ax2.grid(True, linestyle="--", alpha=0.4)
-        st.pyplot(fig2)
+        def draw_daily_tx():
+            fig2, ax2 = plt.subplots(figsize=(7,3))
+            ax2.plot(daily["date"], daily["txs"], marker='o', color='orange')
+            ax2.set_ylabel("Count")
+            ax2.grid(True, linestyle="--", alpha=0.4)
+            return fig2
+        charts.show("monthly_report.daily_tx", bundle, draw_daily_tx, params=selected_month)
 
     # ✅ 신규 유저 계산
-    df_all = df.copy()
-    df_all["first_month"] = df_all["spend.authorizedAt"].dt.to_period("M").astype(str)
-    user_first_month = df_all.groupby("spend.userEmail")["first_month"].min().reset_index()
-    new_users = user_first_month[user_first_month["first_month"] == selected_month]
     st.subheader("📊 Monthly New Users")
-    st.metric("New Users in Month", len(new_users))
+    st.metric("New Users in Month", kpi["new_users"])
 
     st.divider()
 
     # ✅ Top Merchants
     st.markdown("### 🏪 Top Merchants")
-    top_merchants = df_month.groupby("spend.merchantName").agg(
-        total_spend=("spend.amount_usd", "sum"),
-        tx_count=("spend.amount_usd", "count"),
-        user_count=("spend.userEmail", "nunique")
-    ).sort_values("total_spend", ascending=False).head(10).reset_index()
+    top_merchants = index.merchants_for(selected_month)
     st.dataframe(top_merchants)
 
     # ✅ 국가별 집계
     st.markdown("### 🌍 Spend by Country")
 
-    def get_country_name(code):
-        try:
-            return pycountry.countries.get(alpha_2=code).name
-        except:
-            return code
-
-    df_month["country_name"] = df_month["spend.merchantCountry"].apply(get_country_name)
-    country = df_month.groupby("country_name")["spend.amount_usd"].sum().sort_values(ascending=False).head(10)
+    country = index.countries_for(selected_month).copy()
+    country.index = countries.names(country.index)
+    country = country.groupby(level=0, observed=True).sum().sort_values(ascending=False).head(10)
 
-    fig3, ax3 = plt.subplots(figsize=(10, 3))
-    country.plot(kind="bar", ax=ax3, color='royalblue')
-    ax3.set_ylabel("USD")
-    ax3.set_title("Top 10 Countries by Spend")
-    ax3.tick_params(axis='x', rotation=45)
-    ax3.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-    st.pyplot(fig3)
+    def draw_top_countries():
+        fig3, ax3 = plt.subplots(figsize=(10, 3))
+        country.plot(kind="bar", ax=ax3, color='royalblue')
+        ax3.set_ylabel("USD")
+        ax3.set_title("Top 10 Countries by Spend")
+        ax3.tick_params(axis='x', rotation=45)
+        ax3.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+        return fig3
+    charts.show("monthly_report.top_countries", bundle, draw_top_countries, params=selected_month)
 
     st.divider()
 
     # ✅ Spend by Merchant Category
     st.markdown("### 🧾 Spend by Merchant Category")
 
-    cat_df = df_month.groupby("spend.merchantCategory").agg(
-        total_spend=("spend.amount_usd", "sum"),
-        tx_count=("spend.amount_usd", "count"),
-        user_count=("spend.userEmail", "nunique")
-    ).sort_values("total_spend", ascending=False).head(10).reset_index()
+    cat_df = index.categories_for(selected_month)
 
     st.dataframe(cat_df)
 
-    fig4, ax4 = plt.subplots(figsize=(10, 4))
-    ax4.bar(cat_df["spend.merchantCategory"], cat_df["total_spend"], color="darkgreen")
-    ax4.set_title("Top 10 Merchant Categories by Spend")
-    ax4.set_ylabel("USD")
-    ax4.set_xlabel("Category")
-    ax4.tick_params(axis="x", rotation=45)
-    ax4.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-    st.pyplot(fig4)
-
-    fig5, ax5 = plt.subplots(figsize=(10, 4))
-    ax5.bar(cat_df["spend.merchantCategory"], cat_df["tx_count"], color="orange")
-    ax5.set_title("Top 10 Merchant Categories by Transaction Count")
-    ax5.set_ylabel("Transactions")
-    ax5.set_xlabel("Category")
-    ax5.tick_params(axis="x", rotation=45)
-    st.pyplot(fig5)
-
-    fig6, ax6 = plt.subplots(figsize=(10, 4))
-    ax6.bar(cat_df["spend.merchantCategory"], cat_df["user_count"], color="royalblue")
-    ax6.set_title("Top 10 Merchant Categories by Unique Users")
-    ax6.set_ylabel("Users")
-    ax6.set_xlabel("Category")
-    ax6.tick_params(axis="x", rotation=45)
-    st.pyplot(fig6)
+    def draw_category_spend():
+        fig4, ax4 = plt.subplots(figsize=(10, 4))
+        ax4.bar(cat_df["spend.merchantCategory"].astype(str), cat_df["total_spend"], color="darkgreen")
+        ax4.set_title("Top 10 Merchant Categories by Spend")
+        ax4.set_ylabel("USD")
+        ax4.set_xlabel("Category")
+        ax4.tick_params(axis="x", rotation=45)
+        ax4.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+        return fig4
+    charts.show("monthly_report.category_spend", bundle, draw_category_spend, params=selected_month)
+
+    def draw_category_tx():
+        fig5, ax5 = plt.subplots(figsize=(10, 4))
+        ax5.bar(cat_df["spend.merchantCategory"].astype(str), cat_df["tx_count"], color="orange")
+        ax5.set_title("Top 10 Merchant Categories by Transaction Count")
+        ax5.set_ylabel("Transactions")
+        ax5.set_xlabel("Category")
+        ax5.tick_params(axis="x", rotation=45)
+        return fig5
+    charts.show("monthly_report.category_tx", bundle, draw_category_tx, params=selected_month)
+
+    def draw_category_users():
+        fig6, ax6 = plt.subplots(figsize=(10, 4))
+        ax6.bar(cat_df["spend.merchantCategory"].astype(str), cat_df["user_count"], color="royalblue")
+        ax6.set_title("Top 10 Merchant Categories by Unique Users")
+        ax6.set_ylabel("Users")
+        ax6.set_xlabel("Category")
+        ax6.tick_params(axis="x", rotation=45)
+        return fig6
+    charts.show("monthly_report.category_users", bundle, draw_category_users, params=selected_month)
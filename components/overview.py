@@ -1,65 +1,96 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
-import pandas as pd
+from utils import schema, charts, cube, user_index
+from utils.preprocess import week_label, memory_report
 
-def render(df, df_completed, df_pending):
-    df_total = pd.concat([df_completed, df_pending], ignore_index=True)
+# ✅ 이 탭이 사용하는 원본 컬럼 (load_data select 프로젝션에 반영)
+COLUMNS = schema.register("overview", [
+    "spend.amount",
+    "spend.status",
+    "spend.authorizedAt",
+    "spend.userId",
+    "spend.merchantCountry"
+])
+
+# ✅ 다른 탭을 보는 동안 백그라운드에서 미리 계산할 데이터
+def prefetch(bundle):
+    cube.get(bundle)
+    user_index.new_users(bundle, "week")
+
+def render(bundle):
+    c = cube.get(bundle)
+    total_statuses = ["completed", "pending"]
 
     st.header("📊 Summary Statistics")
-    st.markdown(f"🔄 **Raw rows loaded from Supabase:** `{len(df):,}` rows")
+    if c.server:
+        # pushdown 모드: 원본 거래 대신 Postgres 집계 행만 받음
+        st.markdown(
+            f"🔄 **Aggregated rows loaded from Postgres:** `{c.rows_fetched:,}` rows "
+            f"for `{bundle.version[1]:,}` transactions"
+        )
+    else:
+        st.markdown(f"🔄 **Raw rows loaded from Supabase:** `{len(bundle.df):,}` rows")
+        with st.expander("🧠 Memory usage per column"):
+            report = bundle.derived("memory_report", lambda b: memory_report(b.df))
+            st.caption(f"Total: {report['memory_mb'].sum():,.1f} MB")
+            st.dataframe(report.style.format({"memory_mb": "{:,.2f}"}))
 
-    # ✅ 핵심 요약 지표
+    # ✅ 핵심 요약 지표 (일별 큐브에서 조회)
+    totals = c.totals(statuses=total_statuses)
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Transactions", len(df_total))
-    col2.metric("Total Volume (USD)", f"${df_total['spend.amount_usd'].sum():,.2f}")
-    col3.metric("Unique Users", df_total["spend.userId"].nunique())
+    col1.metric("Total Transactions", int(totals["tx_count"]))
+    col2.metric("Total Volume (USD)", f"${totals['spend_usd']:,.2f}")
+    col3.metric("Unique Users", c.unique_users(statuses=total_statuses))
+    if c.distinct_note():
+        st.caption(c.distinct_note())
 
     # ✅ 고급 지표 계산
-    weekly_tx = df.groupby(["spend.userEmail", "week"]).size().reset_index(name="tx_count")
-    latest_week = df["week"].max()
-    latest_week_df = weekly_tx[weekly_tx["week"] == latest_week]
-
-    recurring_users = latest_week_df[latest_week_df["tx_count"] >= 2]["spend.userEmail"].nunique()
-    total_users = latest_week_df["spend.userEmail"].nunique()
+    latest_week = c.facts["week"].max()
+    total_users, recurring_users = c.week_activity(latest_week, min_tx=2)
     recurring_pct = (recurring_users / total_users) * 100 if total_users else 0
 
-    country_counts = df["spend.merchantCountry"].value_counts()
+    country_counts = c.totals(by="country")["tx_count"].sort_values(ascending=False)
     top3_concentration = (country_counts.head(3).sum() / country_counts.sum()) * 100 if not country_counts.empty else 0
 
     col1, col2 = st.columns(2)
     col1.metric("Recurring Users % (Last Week)", f"{recurring_pct:.1f}%")
     col2.metric("Top 3 Country Concentration", f"{top3_concentration:.1f}%")
 
-    # ✅ 주간 신규 사용자 수
-    user_min_week = df.groupby("spend.userEmail")["week"].min()
-    weekly_new_users = user_min_week.value_counts().sort_index()
+    # ✅ 주간 신규 사용자 수 (유저 인덱스의 첫 거래 주)
+    weekly_new_users = user_index.new_users(bundle, "week").sort_index()
+    weekly_new_users.index = week_label(weekly_new_users.index)
 
     # ✅ 주간 총 지출
-    weekly_spend = df.groupby("week")["spend.amount_usd"].sum().sort_index()
+    weekly_spend = c.totals(by="week")["spend_usd"]
+    weekly_spend.index = week_label(weekly_spend.index)
 
     # ✅ 2열 배치로 주간 추세 시각화
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("📅 Weekly New Users")
-        fig, ax = plt.subplots(figsize=(6, 3))
-        weekly_new_users.plot(ax=ax, marker='o', color='steelblue')
-        ax.set_title("Weekly New Users")
-        ax.set_xlabel("Week")
-        ax.set_ylabel("Users")
-        ax.tick_params(axis='x', labelrotation=30, labelsize=8)
-        ax.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig)
+        def draw_weekly_new_users():
+            fig, ax = plt.subplots(figsize=(6, 3))
+            weekly_new_users.plot(ax=ax, marker='o', color='steelblue')
+            ax.set_title("Weekly New Users")
+            ax.set_xlabel("Week")
+            ax.set_ylabel("Users")
+            ax.tick_params(axis='x', labelrotation=30, labelsize=8)
+            ax.grid(True, linestyle='--', alpha=0.4)
+            return fig
+        charts.show("overview.weekly_new_users", bundle, draw_weekly_new_users)
 
     with col2:
         st.subheader("💸 Weekly Spend (USD)")
-        fig2, ax2 = plt.subplots(figsize=(6, 3))
-        weekly_spend.plot(ax=ax2, marker='o', color='green')
-        ax2.set_title("Weekly Spend")
-        ax2.set_xlabel("Week")
-        ax2.set_ylabel("USD")
-        ax2.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-        ax2.tick_params(axis='x', labelrotation=30, labelsize=8)
-        ax2.grid(True, linestyle='--', alpha=0.4)
-        st.pyplot(fig2)
+        def draw_weekly_spend():
+            fig2, ax2 = plt.subplots(figsize=(6, 3))
+            weekly_spend.plot(ax=ax2, marker='o', color='green')
+            ax2.set_title("Weekly Spend")
+            ax2.set_xlabel("Week")
+            ax2.set_ylabel("USD")
+            ax2.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+            ax2.tick_params(axis='x', labelrotation=30, labelsize=8)
+            ax2.grid(True, linestyle='--', alpha=0.4)
+            return fig2
+        charts.show("overview.weekly_spend", bundle, draw_weekly_spend)
@@ -2,51 +2,70 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from utils import schema, charts, user_index, retention
+from utils.preprocess import day_of_date
 
-def render(df_completed):
-    st.header("🧑 User Retention (Cohort Analysis)")
+# ✅ 이 탭이 사용하는 원본 컬럼 (load_data select 프로젝션에 반영)
+COLUMNS = schema.register("retention", [
+    "spend.status",
+    "spend.authorizedAt",
+    "spend.userId"
+])
 
-    # ✅ 날짜 처리
-    df_cohort = df_completed.copy()
-    df_cohort["authorized_date"] = pd.to_datetime(df_cohort["spend.authorizedAt"]).dt.normalize()
+# ✅ 다른 탭을 보는 동안 백그라운드에서 미리 계산할 데이터
+def prefetch(bundle):
+    user_index.get(bundle)
 
-    # ✅ Cohort 기준일 = 사용자 첫 거래일
-    df_cohort["cohort_day0"] = df_cohort.groupby("spend.userEmail")["authorized_date"].transform("min")
+GRAINS = {"Daily": "day", "Weekly": "week", "Monthly": "month"}
+GRAIN_LABELS = {"day": "Day", "week": "Week", "month": "Month"}
 
-    # ✅ Day 기준 차이 계산
-    df_cohort["cohort_day"] = (df_cohort["authorized_date"] - df_cohort["cohort_day0"]).dt.days
-    df_cohort["cohort_day0_str"] = df_cohort["cohort_day0"].dt.strftime("%Y-%m-%d")
+def render(bundle):
+    st.header("🧑 User Retention (Cohort Analysis)")
+    df_completed = bundle.df_completed
 
-    # ✅ 리텐션 분석 대상 기간 필터링
-    df_cohort = df_cohort[df_cohort["cohort_day0"] >= pd.to_datetime("2025-04-15").tz_localize("UTC")]
+    # ✅ 코호트 단위 / 시작일 / 최대 기간 설정
+    col1, col2, col3 = st.columns(3)
+    grain = GRAINS[col1.selectbox("Cohort granularity", list(GRAINS))]
+    start_date = col2.date_input("Cohort start date", value=pd.Timestamp("2025-04-15").date())
+    horizon = col3.number_input(
+        f"Max {GRAIN_LABELS[grain].lower()}s after first transaction",
+        min_value=1, max_value=365, value=retention.DEFAULT_HORIZON[grain], key=f"horizon_{grain}"
+    )
 
-    # ✅ Pivot Table 생성 (Day 0 대비 N일 후에 재방문한 유저 수)
-    retention_table = df_cohort.pivot_table(
-        index="cohort_day0_str",
-        columns="cohort_day",
-        values="spend.userEmail",
-        aggfunc="nunique"
+    # ✅ Cohort 기준일 = 사용자 첫 완료 거래일 (유저 인덱스 조회)
+    users = df_completed["spend.userId"]
+    first_days = user_index.lookup(user_index.get(bundle), "first_completed_day", users)
+
+    # ✅ cohort × offset 고유 유저 행렬 (정수 키 sort + unique 한 번)
+    retention_table = retention.cohort_matrix(
+        users.cat.codes.to_numpy(), df_completed["day"].to_numpy(), first_days,
+        grain=grain, start_day=day_of_date(start_date), horizon=horizon
     )
+    if retention_table.empty:
+        st.info("No cohorts in the selected range.")
+        return
 
     # ✅ 백분율로 변환
-    retention_pct = retention_table.divide(retention_table[0], axis=0) * 100
+    retention_pct = retention.retention_pct(retention_table)
 
     # ✅ 히트맵 시각화
     st.subheader("📊 Cohort Retention Heatmap")
-    plt.figure(figsize=(14, 6))
-    sns.heatmap(
-        retention_pct,
-        annot=True,
-        fmt=".1f",
-        cmap="YlGnBu",
-        linewidths=0.5,
-        linecolor="gray",
-        cbar=True,
-        annot_kws={"size": 8}
-    )
-    plt.title("User Retention by Cohort (Completed Only)", fontsize=14, weight="bold")
-    plt.xlabel("Day Since First Transaction")
-    plt.ylabel("Cohort Start Date")
-    plt.xticks(rotation=0)
-    plt.tight_layout()
-    st.pyplot(plt.gcf())
+    def draw_heatmap():
+        fig = plt.figure(figsize=(14, 6))
+        sns.heatmap(
+            retention_pct,
+            annot=True,
+            fmt=".1f",
+            cmap="YlGnBu",
+            linewidths=0.5,
+            linecolor="gray",
+            cbar=True,
+            annot_kws={"size": 8}
+        )
+        plt.title("User Retention by Cohort (Completed Only)", fontsize=14, weight="bold")
+        plt.xlabel(f"{GRAIN_LABELS[grain]} Since First Transaction")
+        plt.ylabel("Cohort Start")
+        plt.xticks(rotation=0)
+        plt.tight_layout()
+        return fig
+    charts.show("retention.heatmap", bundle, draw_heatmap, params=(grain, start_date, horizon))
@@ -2,145 +2,171 @@ import streamlit as st
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import pandas as pd
-
-def render(df, df_total):
+from utils import schema, charts, cube
+from utils.preprocess import day_to_date, period_labels
+from utils.downsample import grain_for, plot_series
+
+# ✅ 이 탭이 사용하는 원본 컬럼 (load_data select 프로젝션에 반영)
+COLUMNS = schema.register("time_analysis", [
+    "spend.amount",
+    "spend.status",
+    "spend.authorizedAt"
+])
+
+# ✅ 다른 탭을 보는 동안 백그라운드에서 미리 계산할 데이터
+def prefetch(bundle):
+    cube.get(bundle)
+
+def render(bundle):
     st.header("⏱ Time-based Analysis")
 
-    # 거래 상태별 필터링
-    df_completed = df_total[df_total["spend.status"] == "completed"]
-    df_pending = df_total[df_total["spend.status"] == "pending"]
-    df_all = df.copy()
+    # ✅ 일별 / 시간대별 큐브에서 조회
+    c = cube.get(bundle)
     status_order = ["completed", "pending", "reversed", "declined"]
 
+    # ✅ 막대 차트는 일 수가 예산을 넘으면 주 / 월 단위로 rollup
+    n_days = c.facts["day"].nunique()
+    grain = grain_for(n_days)
+
+    # ✅ (기간, status) 집계 → 상태 순서 고정 + 기간 라벨
+    def by_period_status(grouped, grain=grain):
+        table = grouped.unstack(fill_value=0)
+        table.columns = table.columns.astype(str)
+        table = table.reindex(columns=status_order, fill_value=0)
+        table.index = period_labels(table.index, grain).rename("date_utc")
+        return table
+
+    def rollup_caption():
+        if grain != "day":
+            st.caption(f"ℹ️ {n_days:,} days of history → bars are aggregated per {grain}")
+
     # ✅ 시간대별 소비 합계
     st.subheader("⏰ Hourly Spend (UTC)")
-    hourly_spend_completed = df_completed.groupby("hour_utc")["spend.amount_usd"].sum()
-    hourly_spend_pending = df_pending.groupby("hour_utc")["spend.amount_usd"].sum()
+    hourly_spend_completed = c.totals(by="hour", statuses=["completed"], source="hourly")["spend_usd"]
+    hourly_spend_pending = c.totals(by="hour", statuses=["pending"], source="hourly")["spend_usd"]
 
     hourly_df = pd.DataFrame({
         "Completed": hourly_spend_completed,
         "Pending": hourly_spend_pending
     }).fillna(0)
 
-    fig, ax = plt.subplots(figsize=(10, 4))
-    hourly_df.plot(kind="bar", stacked=True, color=["green", "orange"], ax=ax)
-    ax.set_title("Hourly Spend by Status")
-    ax.set_xlabel("Hour (UTC)")
-    ax.set_ylabel("Total Spend (USD)")
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-    ax.grid(True, linestyle="--", alpha=0.4)
-    st.pyplot(fig)
+    def draw_hourly_spend():
+        fig, ax = plt.subplots(figsize=(10, 4))
+        hourly_df.plot(kind="bar", stacked=True, color=["green", "orange"], ax=ax)
+        ax.set_title("Hourly Spend by Status")
+        ax.set_xlabel("Hour (UTC)")
+        ax.set_ylabel("Total Spend (USD)")
+        ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+        ax.grid(True, linestyle="--", alpha=0.4)
+        return fig
+    charts.show("time_analysis.hourly_spend", bundle, draw_hourly_spend)
 
     # ✅ 일자별 거래 수 및 금액
     st.subheader("📅 Daily Transaction Count & Volume")
-    daily_stats = df_completed.groupby("date_utc").agg(
-        tx_count=("spend.amount_usd", "count"),
-        total_volume_usd=("spend.amount_usd", "sum")
-    ).reset_index()
-
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 6), sharex=True)
-    ax1.plot(daily_stats["date_utc"], daily_stats["tx_count"], marker='o', color='steelblue')
-    ax1.set_ylabel("Transactions")
-    ax1.grid(True, linestyle="--", alpha=0.5)
-
-    ax2.plot(daily_stats["date_utc"], daily_stats["total_volume_usd"], marker='o', color='green')
-    ax2.set_ylabel("Volume (USD)")
-    ax2.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-    ax2.grid(True, linestyle="--", alpha=0.5)
-
-    plt.xticks(rotation=45)
-    fig.tight_layout()
-    st.pyplot(fig)
+    daily_stats = c.totals(by="day", statuses=["completed"])[["tx_count", "spend_usd"]] \
+        .rename(columns={"spend_usd": "total_volume_usd"}).reset_index()
+    daily_stats["date_utc"] = day_to_date(daily_stats["day"])
+
+    def draw_daily_count_volume():
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 6), sharex=True)
+        plot_series(ax1, daily_stats["date_utc"], daily_stats["tx_count"], marker='o', color='steelblue')
+        ax1.set_ylabel("Transactions")
+        ax1.grid(True, linestyle="--", alpha=0.5)
+
+        plot_series(ax2, daily_stats["date_utc"], daily_stats["total_volume_usd"], marker='o', color='green')
+        ax2.set_ylabel("Volume (USD)")
+        ax2.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+        ax2.grid(True, linestyle="--", alpha=0.5)
+
+        plt.xticks(rotation=45)
+        fig.tight_layout()
+        return fig
+    charts.show("time_analysis.daily_count_volume", bundle, draw_daily_count_volume)
 
     # ✅ 일자별 거래 상태별 금액 (stacked bar)
     st.subheader("📊 Daily Spend by Status (UTC)")
-    daily_status_spend = df_all.groupby(["date_utc", "spend.status"])["spend.amount_usd"].sum().unstack(fill_value=0)
-    for status in status_order:
-        if status not in daily_status_spend.columns:
-            daily_status_spend[status] = 0
-    daily_status_spend = daily_status_spend[status_order]
-
-    fig, ax = plt.subplots(figsize=(10, 5))
-    daily_status_spend.plot(kind="bar", stacked=True, ax=ax, color=["green", "orange", "gray", "red"])
-    ax.set_title("Daily Spend by Status")
-    ax.set_xlabel("Date (UTC)")
-    ax.set_ylabel("Spend (USD)")
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-    ax.tick_params(axis='x', rotation=45)
-    ax.grid(True, linestyle='--', alpha=0.4)
-    st.pyplot(fig)
+    daily_status_spend = by_period_status(
+        c.totals(by=[grain, "status"])["spend_usd"]
+    )
+    rollup_caption()
+
+    def draw_daily_status_spend():
+        fig, ax = plt.subplots(figsize=(10, 5))
+        daily_status_spend.plot(kind="bar", stacked=True, ax=ax, color=["green", "orange", "gray", "red"])
+        ax.set_title("Daily Spend by Status")
+        ax.set_xlabel("Date (UTC)")
+        ax.set_ylabel("Spend (USD)")
+        ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+        ax.tick_params(axis='x', rotation=45)
+        ax.grid(True, linestyle='--', alpha=0.4)
+        return fig
+    charts.show("time_analysis.daily_status_spend", bundle, draw_daily_status_spend, params=grain)
 
     # ✅ 일자별 상태별 거래 수 집계 및 그래프 준비
-    daily_status_count = df_all.groupby(["date_utc", "spend.status"]).size().unstack(fill_value=0)
-    for status in status_order:
-        if status not in daily_status_count.columns:
-            daily_status_count[status] = 0
-    daily_status_count = daily_status_count[status_order].reset_index()
+    daily_status_count = by_period_status(
+        c.totals(by=[grain, "status"])["tx_count"]
+    ).reset_index()
 
     # ✅ 일자별 상태별 거래 수 시각화 (그래프)
     st.subheader("📊 Daily Transaction Count by Status (UTC)")
-    fig, ax = plt.subplots(figsize=(10, 5))
-    daily_status_count.set_index("date_utc").plot(kind="bar", stacked=True, ax=ax,
-                                                  color=["green", "orange", "gray", "red"])
-    ax.set_title("Daily Transaction Count by Status")
-    ax.set_xlabel("Date (UTC)")
-    ax.set_ylabel("Transaction Count")
-    ax.tick_params(axis='x', rotation=45)
-    ax.grid(True, linestyle='--', alpha=0.4)
-    st.pyplot(fig)
+    def draw_daily_status_count():
+        fig, ax = plt.subplots(figsize=(10, 5))
+        daily_status_count.set_index("date_utc").plot(kind="bar", stacked=True, ax=ax,
+                                                      color=["green", "orange", "gray", "red"])
+        ax.set_title("Daily Transaction Count by Status")
+        ax.set_xlabel("Date (UTC)")
+        ax.set_ylabel("Transaction Count")
+        ax.tick_params(axis='x', rotation=45)
+        ax.grid(True, linestyle='--', alpha=0.4)
+        return fig
+    charts.show("time_analysis.daily_status_count", bundle, draw_daily_status_count, params=grain)
 
     # ✅ 음수 포함된 Spend 그래프 (기준선 포함)
     st.subheader("📊 Daily Spend by Status (UTC, incl. negatives)")
-    fig, ax = plt.subplots(figsize=(12, 6))
-    daily_status_spend[["completed", "pending", "reversed", "declined"]].plot(
-        kind="bar", stacked=False, ax=ax, color=["green", "orange", "gray", "red"]
-    )
-    ax.axhline(0, color='black', linewidth=1)
-    ax.set_title("Daily Spend by Status (incl. negatives, not stacked)")
-    ax.set_ylabel("Spend (USD)")
-    ax.set_xlabel("Date (UTC)")
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-    ax.tick_params(axis='x', rotation=45)
-    ax.grid(True, linestyle='--', alpha=0.4)
-    st.pyplot(fig)
+    def draw_daily_status_spend_signed():
+        fig, ax = plt.subplots(figsize=(12, 6))
+        daily_status_spend[["completed", "pending", "reversed", "declined"]].plot(
+            kind="bar", stacked=False, ax=ax, color=["green", "orange", "gray", "red"]
+        )
+        ax.axhline(0, color='black', linewidth=1)
+        ax.set_title("Daily Spend by Status (incl. negatives, not stacked)")
+        ax.set_ylabel("Spend (USD)")
+        ax.set_xlabel("Date (UTC)")
+        ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+        ax.tick_params(axis='x', rotation=45)
+        ax.grid(True, linestyle='--', alpha=0.4)
+        return fig
+    charts.show("time_analysis.daily_status_spend_signed", bundle, draw_daily_status_spend_signed, params=grain)
 
 
         # ✅ 상태별 음수 Spend만 누적한 그래프
     st.subheader("📉 Daily Negative Spend by Status (Only Negative Amounts)")
 
-    # 음수만 필터링
-    df_negative = df_all[df_all["spend.amount_usd"] < 0]
-
-    # 일자별 상태별 음수 금액 합계
-    daily_negative_spend = (
-        df_negative.groupby(["date_utc", "spend.status"])["spend.amount_usd"]
-        .sum()
-        .unstack(fill_value=0)
+    # 음수 금액만 따로 합산된 큐브 지표 사용
+    daily_negative_spend = by_period_status(
+        c.totals(by=[grain, "status"])["neg_spend_usd"]
     )
 
-    # 시각화 대상 상태 순서 고정
-    for status in status_order:
-        if status not in daily_negative_spend.columns:
-            daily_negative_spend[status] = 0
-    daily_negative_spend = daily_negative_spend[status_order]
-
     # 음수 누적 막대 시각화
-    fig, ax = plt.subplots(figsize=(10, 5))
-    daily_negative_spend.plot(kind="bar", stacked=True, ax=ax,
-                              color=["green", "orange", "gray", "red"])
-    ax.axhline(0, color='black', linewidth=1)
-    ax.set_title("Daily Negative Spend by Status")
-    ax.set_xlabel("Date (UTC)")
-    ax.set_ylabel("Negative Spend (USD)")
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-    ax.tick_params(axis='x', rotation=45)
-    ax.grid(True, linestyle='--', alpha=0.4)
-    st.pyplot(fig)
+    def draw_daily_negative_spend():
+        fig, ax = plt.subplots(figsize=(10, 5))
+        daily_negative_spend.plot(kind="bar", stacked=True, ax=ax,
+                                  color=["green", "orange", "gray", "red"])
+        ax.axhline(0, color='black', linewidth=1)
+        ax.set_title("Daily Negative Spend by Status")
+        ax.set_xlabel("Date (UTC)")
+        ax.set_ylabel("Negative Spend (USD)")
+        ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+        ax.tick_params(axis='x', rotation=45)
+        ax.grid(True, linestyle='--', alpha=0.4)
+        return fig
+    charts.show("time_analysis.daily_negative_spend", bundle, draw_daily_negative_spend, params=grain)
 
     # ✅ 거래 상태별 일자별 건수 테이블 출력
     st.subheader("📋 Daily Transaction Count by Status (Table)")
-    st.dataframe(daily_status_count.style.format(precision=0), use_container_width=True)
+    daily_status_table = by_period_status(c.totals(by=["day", "status"])["tx_count"], "day").reset_index()
+    st.dataframe(daily_status_table.style.format(precision=0), use_container_width=True)
 
     # ✅ 상태 확인용
     st.write("🔍 Unique spend.status values in df_all:")
-    st.write(df_all["spend.status"].dropna().unique())
+    st.write(c.facts["status"].dropna().unique())
@@ -3,41 +3,17 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import seaborn as sns
-import pycountry
 import plotly.express as px
-from supabase import create_client
 import math
 import numpy as np
-import os
+from utils.supabase import fetch_all_rows  # ✅ keyset 페이징 fetcher 공유
+from utils import countries
 
 st.set_page_config(layout="wide")
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# ✅ 모든 데이터 페이징 방식으로 수집
-def fetch_all_rows(batch_size=5000, max_pages=20):
-    all_data = []
-    offset = 0
-    for _ in range(max_pages):
-        res = (
-            supabase.table("transactions")
-            .select("*")
-            .order('"spend.authorizedAt"', desc=False)
-            .range(offset, offset + batch_size - 1)
-            .execute()
-        )
-        batch = res.data
-        if not batch:
-            break
-        all_data.extend(batch)
-        offset += batch_size
-    return pd.DataFrame(all_data)
-
 @st.cache_data(ttl=300)
 def load_data():
-    df = fetch_all_rows(batch_size=5000, max_pages=50)  # 최대 250,000건 수집
+    df = fetch_all_rows(batch_size=5000)  # 정확한 행 수만큼 전부 수집
 
     df["spend.status"] = df["spend.status"].astype(str).str.lower()
 
@@ -95,7 +71,7 @@ with tab1:
     st.subheader("📈 Advanced Summary")
 
     df["week"] = pd.to_datetime(df["date_utc"]).dt.to_period("W").astype(str)
-    weekly_tx_count = df.groupby(["spend.userEmail", "week"]).size().reset_index(name="tx_count")
+    weekly_tx_count = df.groupby(["spend.userEmail", "week"], observed=True).size().reset_index(name="tx_count")
 
     # 가장 최근 주만 추출
     latest_week = df["week"].max()
@@ -119,11 +95,11 @@ with tab1:
     df["week"] = pd.to_datetime(df["date_utc"]).dt.to_period("W").astype(str)
 
     # 주간 신규 사용자 수 계산
-    user_min_week = df.groupby("spend.userEmail")["week"].min()
+    user_min_week = df.groupby("spend.userEmail", observed=True)["week"].min()
     weekly_new_users = user_min_week.value_counts().sort_index()
 
     # 💸 주간 총 지출
-    weekly_spend = df.groupby("week")["spend.amount_usd"].sum().sort_index()
+    weekly_spend = df.groupby("week", observed=True)["spend.amount_usd"].sum().sort_index()
 
     col1, col2 = st.columns(2)
 
@@ -155,8 +131,8 @@ with tab2:
     st.header("⏱ Time-based Analysis")
 
     st.subheader("Hourly Spend (UTC)")
-    hourly_spend_completed = df_completed.groupby("hour_utc")["spend.amount_usd"].sum()
-    hourly_spend_pending = df_pending.groupby("hour_utc")["spend.amount_usd"].sum()
+    hourly_spend_completed = df_completed.groupby("hour_utc", observed=True)["spend.amount_usd"].sum()
+    hourly_spend_pending = df_pending.groupby("hour_utc", observed=True)["spend.amount_usd"].sum()
     hourly_df = pd.DataFrame({
         "Completed": hourly_spend_completed,
         "Pending": hourly_spend_pending
@@ -171,7 +147,7 @@ with tab2:
     st.pyplot(fig)
 
     st.subheader("Daily Transaction Count & Volume")
-    daily_stats = df_completed.groupby("date_utc").agg(
+    daily_stats = df_completed.groupby("date_utc", observed=True).agg(
         tx_count=("spend.amount_usd", "count"),
         total_volume_usd=("spend.amount_usd", "sum")
     ).reset_index()
@@ -195,25 +171,13 @@ with tab2:
 with tab3:
     st.header("🌍 Country-Based Analysis")
 
-    def get_country_name(code):
-        try:
-            return pycountry.countries.get(alpha_2=code).name
-        except:
-            return code
-
-    def get_iso3(code):
-        try:
-            return pycountry.countries.get(alpha_2=code).alpha_3
-        except:
-            return None
-
-    country_spend_completed = df_completed.groupby("spend.merchantCountry")["spend.amount_usd"].sum()
-    country_spend_pending = df_pending.groupby("spend.merchantCountry")["spend.amount_usd"].sum()
+    country_spend_completed = df_completed.groupby("spend.merchantCountry", observed=True)["spend.amount_usd"].sum()
+    country_spend_pending = df_pending.groupby("spend.merchantCountry", observed=True)["spend.amount_usd"].sum()
     country_df = pd.DataFrame({
         "Completed": country_spend_completed,
         "Pending": country_spend_pending
     }).fillna(0)
-    country_df.index = country_df.index.map(get_country_name)
+    country_df.index = countries.names(country_df.index)
     country_df["Total"] = country_df["Completed"] + country_df["Pending"]
     top10_df = country_df.sort_values("Total", ascending=False).head(10)[["Completed", "Pending"]]
 
@@ -226,10 +190,11 @@ with tab3:
     st.pyplot(fig)
 
     st.subheader("🌐 Completed Transactions by Country (Map)")
-    country_counts = df_completed["spend.merchantCountry"].value_counts().reset_index()
+    country_counts = df_completed["spend.merchantCountry"].value_counts()
+    country_counts = country_counts[country_counts > 0].reset_index()  # 카테고리형이면 0건 국가도 포함되므로 제외
     country_counts.columns = ["country_code", "appeared"]
-    country_counts["iso3"] = country_counts["country_code"].apply(get_iso3)
-    country_counts["country_name"] = country_counts["country_code"].apply(get_country_name)
+    country_counts["iso3"] = countries.iso3(country_counts["country_code"])
+    country_counts["country_name"] = countries.names(country_counts["country_code"])
     country_flag_df = country_counts.dropna(subset=["iso3"])
 
     fig = px.choropleth(
@@ -250,7 +215,7 @@ with tab4:
     st.header("🧑 User Retention (Cohort Analysis)")
     df_cohort = df_completed.copy()
     df_cohort["authorized_date"] = pd.to_datetime(df_cohort["spend.authorizedAt"]).dt.normalize()
-    df_cohort["cohort_day0"] = df_cohort.groupby("spend.userEmail")["authorized_date"].transform("min")
+    df_cohort["cohort_day0"] = df_cohort.groupby("spend.userEmail", observed=True)["authorized_date"].transform("min")
     df_cohort["cohort_day"] = (df_cohort["authorized_date"] - df_cohort["cohort_day0"]).dt.days
     df_cohort["cohort_day0_str"] = df_cohort["cohort_day0"].dt.strftime("%Y-%m-%d")
     df_cohort = df_cohort[df_cohort["cohort_day0"] >= pd.to_datetime("2025-04-15").tz_localize("UTC")]
@@ -259,7 +224,8 @@ with tab4:
         index="cohort_day0_str",
         columns="cohort_day",
         values="spend.userEmail",
-        aggfunc="nunique"
+        aggfunc="nunique",
+        observed=True
     )
     retention_pct = retention_table.divide(retention_table[0], axis=0) * 100
 
@@ -285,11 +251,11 @@ with tab4:
 with tab5:
     st.header("🏪 Top Merchants & Users")
 
-    top_users = df_completed.groupby("spend.userEmail")["spend.amount_usd"] \
+    top_users = df_completed.groupby("spend.userEmail", observed=True)["spend.amount_usd"] \
         .sum().sort_values(ascending=False).head(20).reset_index()
     top_users.columns = ["User Email", "Total Spend (USD)"]
 
-    top_merchants_by_spend = df_completed.groupby("spend.merchantName")["spend.amount_usd"] \
+    top_merchants_by_spend = df_completed.groupby("spend.merchantName", observed=True)["spend.amount_usd"] \
         .sum().sort_values(ascending=False).head(10).reset_index()
     top_merchants_by_spend.columns = ["Merchant", "Total Spend (USD)"]
 
@@ -297,7 +263,7 @@ with tab5:
         .value_counts().head(10).reset_index()
     top_merchants_by_count.columns = ["Merchant", "Transaction Count"]
 
-    top_merchants_by_users = df_completed.groupby("spend.merchantName")["spend.userEmail"] \
+    top_merchants_by_users = df_completed.groupby("spend.merchantName", observed=True)["spend.userEmail"] \
         .nunique().sort_values(ascending=False).head(10).reset_index()
     top_merchants_by_users.columns = ["Merchant", "Unique User Count"]
 
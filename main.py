@@ -1,6 +1,7 @@
 import streamlit as st
-import pandas as pd
-from utils.supabase import load_data
+from utils.cache import data_cache
+from utils.charts import chart_cache
+from utils import wire
 from components import (
     overview,
     time_analysis,
@@ -8,44 +9,57 @@ from components import (
     retention,
     merchants,
     analytics,
-    monthly_report  # ✅ 월별 리포트 추가
+    monthly_report,  # ✅ 월별 리포트 추가
+    risk_analysis
 )
 
-# ✅ 데이터 로드 (Supabase에서 전처리 포함)
-df = load_data()
-df_completed = df[df["spend.status"] == "completed"]
-df_pending = df[df["spend.status"] == "pending"]
-df_total = pd.concat([df_completed, df_pending], ignore_index=True)
+# ✅ 데이터 로드 (프로세스 전역 캐시 — 모든 세션이 같은 버전을 공유)
+if st.sidebar.button("🔄 Refresh data"):
+    data_cache.invalidate(block=True)
 
-# ✅ 탭 구성
-tabs = st.tabs([
-    "✅ Overview",
-    "⏱ Time Analysis",
-    "🌍 Country",
-    "🧑 Retention",
-    "🏪 Merchants & Users",
-    "📈 Analytics",
-    "📅 Monthly Report"  
-])
+bundle = data_cache.get()
 
-# ✅ 탭별 렌더링
-with tabs[0]:
-    overview.render(df, df_completed, df_pending)
+st.sidebar.caption(f"📦 Data version: `{bundle.version[0]}` · `{bundle.version[1]:,}` rows")
+if data_cache.refreshing:
+    st.sidebar.caption("⏳ Loading a newer version in the background…")
 
-with tabs[1]:
-    time_analysis.render(df, df_total)
+# ✅ 화면 구성 (st.tabs는 모든 탭을 매번 실행하므로 선택된 화면만 렌더링)
+VIEWS = {
+    "✅ Overview": overview,
+    "⏱ Time Analysis": time_analysis,
+    "🌍 Country": country,
+    "🧑 Retention": retention,
+    "🏪 Merchants & Users": merchants,
+    "📈 Analytics": analytics,
+    "📅 Monthly Report": monthly_report,
+    "🛑 Risk": risk_analysis,
+}
 
-with tabs[2]:
-    country.render(df_completed, df_pending)
+selected = st.radio("View", list(VIEWS), horizontal=True, key="view", label_visibility="collapsed")
 
-with tabs[3]:
-    retention.render(df_completed)
+# ✅ 선택되지 않은 화면의 데이터는 백그라운드에서 미리 계산 (선택 사항)
+if st.sidebar.toggle("⚡ Prefetch other views", value=False):
+    for label, view in VIEWS.items():
+        if label != selected and hasattr(view, "prefetch"):
+            bundle.prefetch(view.__name__, view.prefetch)
 
-with tabs[4]:
-    merchants.render(df_completed)
+# ✅ 선택된 화면만 렌더링
+VIEWS[selected].render(bundle)
 
-with tabs[5]: 
-    analytics.render(df_total)
+# ✅ 캐시 메모리 사용량
+with st.sidebar.expander("🧠 Cache memory"):
+    chart_stats = chart_cache.stats()
+    st.caption(f"Data: {data_cache.nbytes / 1024 ** 2:,.1f} MB")
+    st.caption(
+        f"Charts: {chart_stats['charts']} images · {chart_stats['memory_mb']:,.1f} MB "
+        f"(hits {chart_stats['hits']}, misses {chart_stats['misses']})"
+    )
 
-with tabs[6]: 
-    monthly_report.render(df_total)  
+# ✅ 네트워크 지표 (공유 HTTP 풀의 요청별 지연 / 전송량)
+with st.sidebar.expander("📡 Network"):
+    net = wire.stats()
+    st.caption(
+        f"Requests: {net['requests']:,} (retries {net['retries']:,}, failures {net['failures']:,}) · "
+        f"{net['bytes'] / 1024 ** 2:,.1f} MB"
+    )
+    st.caption(f"Latency p50 {net['p50_ms']:,.0f} ms · p95 {net['p95_ms']:,.0f} ms · {net['mb_per_s']:,.1f} MB/s")
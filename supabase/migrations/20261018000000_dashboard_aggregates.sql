@@ -0,0 +1,222 @@
+-- ✅ 대시보드 집계 pushdown (DASHBOARD_AGGREGATE_MODE=server, utils/pushdown.py)
+-- 원본 거래 대신 일 × 차원 단위로 집계된 행만 PostgREST로 내려보냄
+--
+-- 기간 키는 utils/preprocess.py와 같은 정의 (UTC):
+--   day   = 1970-01-01 이후 일 수
+--   week  = floor((day + 3) / 7)   (월요일 시작)
+--   month = year * 12 + (month - 1)
+-- 금액은 정수 센트 (숫자가 아니면 0), 시각을 알 수 없는 행은 제외 — preprocess와 동일
+--
+-- 뷰는 security_invoker로 만들어 transactions 테이블의 RLS가 그대로 적용됨 (Postgres 15+)
+
+-- 시각 문자열 → timestamptz (시간대가 없으면 UTC로 간주, 형식이 다르거나 없는 날짜 · 시각이면 null)
+-- 캐스트 전에 각 필드 범위를 확인해 '2025-02-30' 같은 값이 예외로 뷰 전체를 중단시키지 않도록 함
+-- (plpgsql: 계획이 세션 안에서 캐시되어 FROM 절 있는 SQL 함수처럼 행마다 다시 계획하지 않음)
+create or replace function public.dashboard_timestamptz(value text)
+returns timestamptz
+language plpgsql
+stable
+as $$
+declare
+  p text[] := regexp_match(
+    value,
+    '^\s*(\d{4})-(\d{2})-(\d{2})([ T](\d{2}):(\d{2})(:(\d{2})(\.\d+)?)?)?\s*(Z|([+-])(\d{2}):?(\d{2})?)?\s*$'
+  );
+begin
+  if p is null
+     or p[1]::integer = 0
+     or p[2]::integer not between 1 and 12
+     or p[3]::integer not between 1 and
+        extract(day from make_date(p[1]::integer, p[2]::integer, 1) + interval '1 month' - interval '1 day')
+     or coalesce(p[5]::integer, 0) > 23 or coalesce(p[6]::integer, 0) > 59 or coalesce(p[8]::integer, 0) > 59
+     or coalesce(p[12]::integer, 0) > 15 or coalesce(p[13]::integer, 0) > 59 then
+    return null;
+  end if;
+  if p[10] is not null then
+    return value::timestamptz;
+  end if;
+  return value::timestamp at time zone 'UTC';
+end
+$$;
+
+-- 금액 문자열 → 정수 센트 (숫자가 아니거나 bigint 범위를 넘으면 0)
+create or replace function public.dashboard_cents(value text)
+returns bigint
+language sql
+immutable
+as $$
+  select case
+    when length(value) <= 64 and value ~ '^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d{1,3})?\s*$' then
+      case when abs(value::numeric) < 9e18 then round(value::numeric)::bigint else 0 end
+    else 0
+  end
+$$;
+
+-- 정규화된 거래 (상태는 소문자, 기간 키 포함)
+create or replace view public.dashboard_transactions
+with (security_invoker = true)
+as
+select
+  t.id,
+  lower(trim(t."spend.status"::text)) as status,
+  t."spend.merchantCountry"::text as country,
+  t."spend.merchantCategory"::text as category,
+  t."spend.merchantName"::text as merchant,
+  t."spend.userId"::text as user_id,
+  public.dashboard_cents(t."spend.amount"::text) as spend_cents,
+  k.day,
+  floor((k.day + 3) / 7.0)::integer as week,
+  (extract(year from k.utc)::integer * 12 + extract(month from k.utc)::integer - 1) as month,
+  extract(hour from k.utc)::integer as hour
+from public.transactions t
+cross join lateral (
+  select public.dashboard_timestamptz(t."spend.authorizedAt"::text) at time zone 'UTC' as utc
+) a
+cross join lateral (
+  select a.utc, (a.utc::date - date '1970-01-01') as day
+) k
+where a.utc is not null;
+
+-- day × status × country × category 합계 (utils/cube.py DailyCube.facts)
+create or replace view public.dashboard_daily_facts
+with (security_invoker = true)
+as
+select
+  day, status, country, category,
+  sum(spend_cents)::bigint as spend_cents,
+  sum(least(spend_cents, 0))::bigint as neg_spend_cents,
+  count(*)::bigint as tx_count
+from public.dashboard_transactions
+group by day, status, country, category;
+
+-- day × status × hour 합계 (DailyCube.hourly)
+create or replace view public.dashboard_hourly_facts
+with (security_invoker = true)
+as
+select
+  day, status, hour,
+  sum(spend_cents)::bigint as spend_cents,
+  count(*)::bigint as tx_count
+from public.dashboard_transactions
+group by day, status, hour;
+
+-- 일별 신규 유저 수: 완료 + 대기 거래 기준 첫 거래일 (utils/user_index.py)
+create or replace view public.dashboard_new_users
+with (security_invoker = true)
+as
+select first_day as day, count(*)::bigint as new_users
+from (
+  select user_id, min(day) as first_day
+  from public.dashboard_transactions
+  where status in ('completed', 'pending') and user_id is not null
+  group by user_id
+) u
+group by first_day;
+
+-- 월별 지출 상위 10개 가맹점 (utils/monthly.py TOP_N, 완료 + 대기 거래)
+create or replace view public.dashboard_monthly_merchants
+with (security_invoker = true)
+as
+select month, merchant, spend_cents, tx_count, user_count, rank
+from (
+  select
+    month, merchant, spend_cents, tx_count, user_count,
+    row_number() over (partition by month order by spend_cents desc, merchant) as rank
+  from (
+    select
+      month, merchant,
+      sum(spend_cents)::bigint as spend_cents,
+      count(*)::bigint as tx_count,
+      count(distinct user_id)::bigint as user_count
+    from public.dashboard_transactions
+    where status in ('completed', 'pending') and merchant is not null
+    group by month, merchant
+  ) m
+) r
+where rank <= 10;
+
+-- ✅ 집계 결과 전체를 JSON 배열 한 개로 반환하는 RPC (utils/pushdown.py는 이 함수들만 호출)
+-- 뷰를 limit/offset으로 페이징하면 페이지마다 전체 거래 집계를 다시 실행하므로 집계 한 번 = 요청 한 번으로 받음
+-- (스칼라 json 반환이라 PostgREST 최대 행 수 제한도 받지 않음, 함수는 security invoker라 RLS 그대로 적용)
+create or replace function public.dashboard_daily_facts_json()
+returns json
+language sql
+stable
+as $$
+  select coalesce(json_agg(f order by f.day, f.status, f.country, f.category), '[]'::json)
+  from public.dashboard_daily_facts f
+$$;
+
+create or replace function public.dashboard_hourly_facts_json()
+returns json
+language sql
+stable
+as $$
+  select coalesce(json_agg(f order by f.day, f.status, f.hour), '[]'::json)
+  from public.dashboard_hourly_facts f
+$$;
+
+create or replace function public.dashboard_new_users_json()
+returns json
+language sql
+stable
+as $$
+  select coalesce(json_agg(n order by n.day), '[]'::json)
+  from public.dashboard_new_users n
+$$;
+
+create or replace function public.dashboard_monthly_merchants_json()
+returns json
+language sql
+stable
+as $$
+  select coalesce(json_agg(m order by m.month, m.rank), '[]'::json)
+  from public.dashboard_monthly_merchants m
+$$;
+
+-- 고유 유저 수: p_grain('all' / 'day' / 'week' / 'month') × 차원 하나(선택: 'status' / 'country' / 'category')
+-- p_from_day / p_to_day: 일 키 구간 (양끝 포함, 선택)
+-- 고유 수는 더할 수 없으므로 화면이 요청하는 그레인별로 서버에서 직접 셈
+create or replace function public.dashboard_unique_users(
+  p_grain text default 'all',
+  p_statuses text[] default null,
+  p_dimension text default null,
+  p_from_day integer default null,
+  p_to_day integer default null
+)
+returns json
+language sql
+stable
+as $$
+  select coalesce(json_agg(u order by u.period, u.dimension), '[]'::json)
+  from (
+    select
+      case p_grain when 'day' then day when 'week' then week when 'month' then month else 0 end as period,
+      case p_dimension when 'status' then status when 'country' then country when 'category' then category end as dimension,
+      count(distinct user_id)::bigint as users
+    from public.dashboard_transactions
+    where (p_statuses is null or status = any(p_statuses))
+      and (p_from_day is null or day >= p_from_day)
+      and (p_to_day is null or day <= p_to_day)
+      and user_id is not null
+    group by 1, 2
+  ) u
+$$;
+
+-- 한 주의 활성 유저 수 / 그 중 p_min_tx건 이상 거래한 유저 수 (Overview의 Recurring Users %)
+create or replace function public.dashboard_week_activity(p_week integer, p_min_tx integer default 2)
+returns json
+language sql
+stable
+as $$
+  select json_build_object(
+    'users', count(*),
+    'recurring_users', count(*) filter (where tx_count >= p_min_tx)
+  )
+  from (
+    select user_id, count(*) as tx_count
+    from public.dashboard_transactions
+    where week = p_week and user_id is not null
+    group by user_id
+  ) u
+$$;
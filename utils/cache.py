@@ -0,0 +1,272 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils.supabase import fetch_version, load_data, discard_checkpoints
+from utils.loader import load_frames
+
+# ✅ 프로세스 전역 데이터 캐시
+# Streamlit은 위젯 조작마다 main.py를 다시 실행하지만 이 모듈은 프로세스당 한 번만 import 되므로
+# 모든 세션이 같은 DataCache를 공유한다.
+
+CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "300"))                    # 버전 확인 주기 (초)
+CACHE_MAX_BYTES = int(os.getenv("DASHBOARD_CACHE_MAX_MB", "2048")) * 1024 ** 2  # 보관할 버전들의 메모리 상한
+
+# 다음 버전이 bundle.previous()로 이어 받아 증분 갱신하는 파생 데이터 (나머지는 이전 버전과 함께 해제)
+INCREMENTAL = ["users", "user_index", "risk_state"]
+
+
+# ✅ 파생 데이터의 메모리 크기
+# DataFrame / Series / 배열은 직접 재고, 튜플 · dict · 파생 객체(DailyCube, MonthlyIndex, RiskReport 등)는
+# 안에 든 값을 따라가며 합산 (같은 객체는 한 번만)
+def object_bytes(obj, seen=None):
+    seen = set() if seen is None else seen
+    if obj is None or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sum(object_bytes(v, seen) for v in obj)
+    if isinstance(obj, dict):
+        return sum(object_bytes(v, seen) for v in obj.values())
+    nbytes = getattr(obj, "nbytes", None)      # pyarrow Table 등
+    if isinstance(nbytes, int):
+        return nbytes
+    if hasattr(obj, "__dict__") and not isinstance(obj, type):
+        return sum(object_bytes(v, seen) for v in vars(obj).values())
+    return 0
+
+
+class DataBundle:
+    """한 데이터 버전의 원본 df와 상태별 슬라이스, 버전별 파생 데이터.
+    df 없이 rows(원본을 받아오는 함수)만 주면 원본은 처음 접근할 때 한 번만 수집 (pushdown 모드)."""
+
+    def __init__(self, df, version, previous=None, frames=None, rows=None):
+        self.version = version
+        self.loaded_at = time.time()
+
+        # 로더가 트랜잭션과 함께 받아 온 다른 테이블 (예: users) — 같은 이름의 파생 데이터로 바로 사용
+        self._derived = {name: frame for name, frame in (frames or {}).items() if frame is not None}
+
+        # 이전 버전의 증분 상태 (INCREMENTAL만, 빌더가 한 번 꺼내 쓰면 해제 — nbytes에 포함)
+        self._previous = {
+            name: previous.peek(name) for name in INCREMENTAL
+            if previous is not None and previous.peek(name) is not None and name not in self._derived
+        }
+        self._locks = {}
+        self._prefetching = set()
+        self._lock = threading.Lock()
+        self._rows_lock = threading.Lock()
+        self._rows = rows
+        self._df = None
+        self._base_bytes = 0
+        if df is not None:
+            self._set_df(df)
+
+    def _set_df(self, df):
+        self._df_completed = df[df["spend.status"] == "completed"]
+        self._df_pending = df[df["spend.status"] == "pending"]
+        self._df_total = pd.concat([self._df_completed, self._df_pending], ignore_index=True)
+        self._base_bytes = sum(object_bytes(d) for d in (df, self._df_completed, self._df_pending, self._df_total))
+        self._df = df
+
+    # ✅ 원본 거래 (없으면 지금 한 번만 수집 — 동시에 요청해도 한 세션만 받음)
+    @property
+    def df(self):
+        if self._df is None:
+            with self._rows_lock:
+                if self._df is None:
+                    self._set_df(self._rows())
+        return self._df
+
+    @property
+    def loaded(self):
+        return self._df is not None
+
+    @property
+    def df_completed(self):
+        self.df
+        return self._df_completed
+
+    @property
+    def df_pending(self):
+        self.df
+        return self._df_pending
+
+    @property
+    def df_total(self):
+        self.df
+        return self._df_total
+
+    # 증분 동기화로 새로 받은 / 바뀐 행의 id (전체 로드면 None)
+    @property
+    def delta_ids(self):
+        return self.df.attrs.get("delta_ids")
+
+    # ✅ 버전당 한 번만 계산되는 파생 데이터 (같은 이름을 동시에 요청하면 한 세션만 계산)
+    def derived(self, name, builder):
+        if name in self._derived:
+            return self._derived[name]
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+        return self._derived[name]
+
+    # ✅ 이전 버전에서 만든 같은 이름의 파생 데이터 (없으면 None) — 한 번만 꺼낼 수 있음
+    # 꺼낸 뒤에는 이 번들이 더 이상 들고 있지 않으므로 빌더가 끝나면 이전 상태는 해제됨
+    def previous(self, name):
+        return self._previous.pop(name, None)
+
+    # ✅ 이미 계산된 파생 데이터 (없으면 None, 계산하지 않음)
+    def peek(self, name):
+        return self._derived.get(name)
+
+    # ✅ 백그라운드 스레드에서 미리 계산 (이름당 한 번만 시작)
+    def prefetch(self, name, builder):
+        key = f"prefetch:{name}"
+        with self._lock:
+            if key in self._prefetching or key in self._derived:
+                return
+            self._prefetching.add(key)
+        threading.Thread(target=self.derived, args=(key, builder), daemon=True).start()
+
+    @property
+    def nbytes(self):
+        return self._base_bytes + object_bytes([list(self._derived.values()), list(self._previous.values())])
+
+
+class DataCache:
+    def __init__(self, loader, probe, rows=None, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.loader = loader    # (previous=현재 번들) -> {"transactions": df, 다른 테이블: frame}
+        self.probe = probe      # () -> 데이터 버전 (최대 워터마크, 행 수)
+        self.rows = rows        # () -> 원본 df (로더가 transactions를 주지 않았을 때 필요해지면 호출)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self._versions = OrderedDict()
+        self._current = None
+        self._checked_at = 0.0
+        self._refresh_thread = None
+        self._refresh_started = 0.0     # 마지막으로 성공한 새 버전 로드가 시작된 시각 (monotonic)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.last_error = None
+
+    # ✅ 현재 버전 반환 (오래됐으면 백그라운드에서 새 버전을 받는 동안 기존 데이터를 그대로 제공)
+    def get(self):
+        current = self._current
+        if current is None:
+            return self._load_blocking()
+
+        if time.time() - self._checked_at > self.ttl:
+            self._start_refresh()
+        return current
+
+    # ✅ 명시적 무효화 (block=True 면 새 버전을 받을 때까지 대기)
+    # 이전에 실패한 수집의 체크포인트는 버리고 처음부터 다시 받음
+    def invalidate(self, block=False):
+        discard_checkpoints()
+        self._checked_at = 0.0
+        if block or self._current is None:
+            self._refresh(force=True)
+        else:
+            self._start_refresh(force=True)
+
+    def _load_blocking(self):
+        with self._load_lock:
+            if self._current is None:
+                self._refresh(force=True)
+            return self._current
+
+    def _start_refresh(self, force=False):
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_safely, kwargs={"force": force}, daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _refresh_safely(self, force=False):
+        try:
+            self._refresh(force=force)
+            self.last_error = None
+        except Exception as e:
+            # 새 버전을 못 받아도 기존 데이터는 계속 제공
+            self.last_error = e
+            self._checked_at = time.time()
+
+    # ✅ 갱신은 한 번에 하나만 (백그라운드 TTL 갱신 / Refresh 버튼 / 다른 세션이 동시에 증분 동기화하면
+    # 같은 스냅샷 임시 파일을 덮어씀). 기다리는 동안 요청 이후에 시작된 로드가 끝났으면 그 결과를 그대로 사용
+    def _refresh(self, force=False):
+        requested_at = time.monotonic()
+        with self._refresh_lock:
+            current = self._current
+            if current is not None and self._refresh_started > requested_at:
+                return current
+            return self._refresh_locked(force)
+
+    def _refresh_locked(self, force):
+        started = time.monotonic()
+        version = self.probe()
+        self._checked_at = time.time()
+
+        current = self._current
+        if not force and current is not None and current.version == version:
+            return current
+
+        if not force and version in self._versions:
+            bundle = self._versions[version]
+        else:
+            frames = self.loader(previous=current)
+            bundle = DataBundle(frames.pop("transactions", None), version, previous=current, frames=frames, rows=self.rows)
+            self._refresh_started = started
+
+        with self._lock:
+            self._versions[version] = bundle
+            self._versions.move_to_end(version)
+            self._current = bundle
+            self._evict()
+        return bundle
+
+    # ✅ 메모리 상한을 넘으면 오래된 버전부터 제거 (현재 버전은 유지)
+    def _evict(self):
+        while len(self._versions) > 1 and self.nbytes > self.max_bytes:
+            oldest = next(iter(self._versions))
+            if self._versions[oldest] is self._current:
+                break
+            self._versions.pop(oldest)
+
+    @property
+    def nbytes(self):
+        return sum(b.nbytes for b in self._versions.values())
+
+    @property
+    def refreshing(self):
+        return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def stats(self):
+        return pd.DataFrame([
+            {
+                "version": str(v),
+                "current": b is self._current,
+                "rows": len(b.df) if b.loaded else 0,
+                "loaded_at": pd.Timestamp(b.loaded_at, unit="s", tz="UTC"),
+                "memory_mb": b.nbytes / 1024 ** 2,
+            }
+            for v, b in self._versions.items()
+        ])
+
+
+data_cache = DataCache(loader=load_frames, probe=fetch_version, rows=load_data)
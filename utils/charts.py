@@ -0,0 +1,81 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+import matplotlib.pyplot as plt
+import streamlit as st
+
+# ✅ 렌더링된 차트(PNG) 캐시
+# 키 = (차트 id, 데이터 버전, 번들 로드 시각, 파라미터) → 같은 번들/파라미터면 matplotlib을 다시 그리지 않음
+# (강제 새로고침은 버전(최대 워터마크, 행 수)이 같아도 상태가 바뀐 새 번들을 만들므로 로드 시각까지 키에 포함)
+CHART_CACHE_MAX_BYTES = int(os.getenv("DASHBOARD_CHART_CACHE_MB", "256")) * 1024 ** 2
+CHART_DPI = 200
+
+
+class ChartCache:
+    def __init__(self, max_bytes=CHART_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, draw):
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+
+        png = render_png(draw)
+
+        with self._lock:
+            self.misses += 1
+            self._images[key] = png
+            self._images.move_to_end(key)
+            # 상한을 넘으면 가장 오래 안 쓴 차트부터 제거
+            while len(self._images) > 1 and self.nbytes > self.max_bytes:
+                self._images.popitem(last=False)
+        return png
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+
+    @property
+    def nbytes(self):
+        return sum(len(png) for png in self._images.values())
+
+    def stats(self):
+        return {
+            "charts": len(self._images),
+            "memory_mb": self.nbytes / 1024 ** 2,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# pyplot의 figure 목록은 프로세스 전역이라 세션 스레드들이 동시에 그리면 서로의 figure를 건드림
+# → 렌더링은 한 번에 하나씩 (결과는 캐시되므로 대기는 캐시 미스 때만)
+_render_lock = threading.Lock()
+
+
+# ✅ draw()가 만든 figure를 PNG로 저장하고 바로 닫음 (세션이 길어져도 figure가 쌓이지 않도록)
+# draw()가 figure를 만든 뒤 예외를 내도 닫히도록 draw() 자체를 try 안에서 호출
+def render_png(draw):
+    with _render_lock:
+        try:
+            fig = draw()
+            buf = io.BytesIO()
+            fig.savefig(buf, format="png", dpi=CHART_DPI, bbox_inches="tight")
+            return buf.getvalue()
+        finally:
+            plt.close("all")
+
+
+chart_cache = ChartCache()
+
+
+def show(chart_id, bundle, draw, params=None):
+    key = (chart_id, bundle.version, bundle.loaded_at, repr(params))
+    st.image(chart_cache.get_or_render(key, draw), use_container_width=True)
@@ -0,0 +1,81 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# ✅ 국가 차원 테이블: ISO2 → (국가명, ISO3, 지역)
+# pycountry는 처음 조회할 때 한 번만 import / 테이블 생성 (앱 시작 시간에 영향 없음)
+# 변환은 고유 코드 단위로만 수행 → 카테고리형 컬럼이면 국가 수만큼만 조회
+
+# UN 지리 구분 기준 대륙 (pycountry에는 지역 정보가 없음)
+REGIONS = {
+    "Africa": (
+        "DZ AO BJ BW BF BI CV CM CF TD KM CG CD CI DJ EG GQ ER SZ ET GA GM GH GN GW KE LS LR LY MG "
+        "MW ML MR MU YT MA MZ NA NE NG RE RW SH ST SN SC SL SO ZA SS SD TZ TG TN UG EH ZM ZW IO TF"
+    ),
+    "Americas": (
+        "AI AG AR AW BS BB BZ BM BO BQ BV BR CA KY CL CO CR CU CW DM DO EC SV FK GF GL GD GP GT GY "
+        "HT HN JM MQ MX MS NI PA PY PE PR BL KN LC MF PM VC SX GS SR TT TC US UM UY VE VG VI"
+    ),
+    "Asia": (
+        "AF AM AZ BH BD BT BN KH CN CY GE HK IN ID IR IQ IL JP JO KZ KW KG LA LB MO MY MV MN MM NP "
+        "KP OM PK PS PH QA SA SG KR LK SY TW TJ TH TL TR TM AE UZ VN YE"
+    ),
+    "Europe": (
+        "AX AL AD AT BY BE BA BG HR CZ DK EE FO FI FR DE GI GR GG VA HU IS IE IM IT JE LV LI LT LU "
+        "MT MD MC ME NL MK NO PL PT RO RU SM RS SK SI ES SJ SE CH UA GB"
+    ),
+    "Oceania": "AS AU CX CC CK FJ PF GU HM KI MH FM NR NC NZ NU NF MP PW PG PN WS SB TK TO TV VU WF",
+    "Antarctica": "AQ",
+}
+UNKNOWN_REGION = "Other"
+
+_table = None
+_lock = threading.Lock()
+
+
+def table():
+    global _table
+    if _table is None:
+        with _lock:
+            if _table is None:
+                import pycountry
+                region_of = {code: region for region, codes in REGIONS.items() for code in codes.split()}
+                rows = [(c.alpha_2, c.name, c.alpha_3) for c in pycountry.countries]
+                t = pd.DataFrame(rows, columns=["iso2", "name", "iso3"]).set_index("iso2")
+                t["region"] = t.index.map(region_of).fillna(UNKNOWN_REGION)
+                _table = t
+    return _table
+
+
+def _resolve(values, field, default):
+    # 고유 코드만 정규화(공백 제거 · 대문자)해서 테이블에 조인하고 코드 배열로 펼침
+    codes, uniques = pd.factorize(values)
+    keys = pd.Index(uniques).astype(str).str.strip().str.upper()
+    resolved = table()[field].reindex(keys).to_numpy(dtype=object)
+    missing = pd.isna(resolved)
+    if default == "code":
+        resolved[missing] = np.asarray(uniques, dtype=object)[missing]
+    else:
+        resolved[missing] = default
+
+    out = resolved[codes] if len(resolved) else np.full(len(codes), None, dtype=object)
+    out[codes < 0] = None
+    if isinstance(values, pd.Series):
+        return pd.Series(out, index=values.index, name=values.name)
+    if isinstance(values, pd.Index):
+        return pd.Index(out, name=values.name)
+    return out
+
+
+# ✅ 국가명 (모르는 코드는 코드 그대로)
+def names(values):
+    return _resolve(values, "name", "code")
+
+
+# ✅ ISO3 (지도용, 모르는 코드는 None)
+def iso3(values):
+    return _resolve(values, "iso3", None)
+
+
+def regions(values):
+    return _resolve(values, "region", UNKNOWN_REGION)
@@ -0,0 +1,282 @@
+import os
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+from utils import schema, hll, pushdown
+from utils.preprocess import week_of_day, month_of_day
+
+# ✅ 일별 집계 큐브: day × status × country × category
+# 데이터 버전당 한 번 만들어 모든 탭이 공유 → 렌더 비용이 거래 수가 아니라 일 수에 비례
+DIMENSIONS = {
+    "day": "day",
+    "status": "spend.status",
+    "country": "spend.merchantCountry",
+    "category": "spend.merchantCategory",
+}
+USER_COLUMN = "spend.userId"
+
+# ✅ 고유 유저 수 계산 방식: "exact" (유저 코드 nunique) / "hll" (HyperLogLog 스케치 병합, utils/hll.py 오차 참고)
+DISTINCT_MODE = os.getenv("DASHBOARD_DISTINCT_MODE", "exact")
+# 스케치를 저장하는 그레인 (day × status × 차원 하나) — 셀당 행 수는 최대 2^p
+SKETCH_GRAINS = [
+    ["day", "status"],
+    ["day", "status", "country"],
+    ["day", "status", "category"],
+]
+
+# 큐브를 만드는 데 필요한 원본 컬럼
+COLUMNS = schema.register("cube", [
+    "spend.amount",
+    "spend.status",
+    "spend.authorizedAt",
+    "spend.merchantCountry",
+    "spend.merchantCategory",
+    "spend.userId"
+])
+
+
+def with_periods(frame):
+    frame["week"] = week_of_day(frame["day"]).astype("int32")
+    frame["month"] = month_of_day(frame["day"]).astype("int32")
+    return frame
+
+
+class DailyCube:
+    """facts : 셀별 지출(센트) / 음수 지출 / 거래 수
+    users : 셀별 (유저 코드, 거래 수) — 정확한 고유 유저 수를 어떤 기간/그룹으로도 다시 집계 가능
+    hourly: day × status × hour 지출 / 거래 수
+    sketches: 그레인별 HyperLogLog 희소 스케치 (reg, rank) — DISTINCT_MODE="hll" 일 때만 생성"""
+
+    server = False
+
+    def __init__(self, facts, users, hourly, sketches=None):
+        self.facts = facts
+        self.users = users
+        self.hourly = hourly
+        self.sketches = sketches
+
+    @property
+    def approximate(self):
+        return self.sketches is not None
+
+    @staticmethod
+    def _filter(frame, statuses=None, days=None, where=None):
+        mask = np.ones(len(frame), dtype=bool)
+        if statuses is not None:
+            mask &= frame["status"].isin(statuses).to_numpy()
+        if days is not None:
+            lo, hi = days
+            mask &= ((frame["day"] >= lo) & (frame["day"] <= hi)).to_numpy()
+        for col, value in (where or {}).items():
+            mask &= (frame[col] == value).to_numpy()
+        return frame[mask]
+
+    # ✅ 합계 지표 (by=None 이면 전체 합계 Series)
+    def totals(self, by=None, statuses=None, days=None, where=None, source="facts"):
+        frame = self._filter(getattr(self, source), statuses, days, where)
+        measures = [c for c in ("spend_cents", "neg_spend_cents", "tx_count") if c in frame.columns]
+        if by is None:
+            out = frame[measures].sum()
+            out["spend_usd"] = out["spend_cents"] / 100
+            return out
+        out = frame.groupby(by, observed=True, sort=True)[measures].sum()
+        out["spend_usd"] = out["spend_cents"] / 100
+        if "neg_spend_cents" in out.columns:
+            out["neg_spend_usd"] = out["neg_spend_cents"] / 100
+        return out
+
+    # 화면 표시용 안내 (정확한 값이면 None)
+    def distinct_note(self):
+        if not self.approximate:
+            return None
+        return f"ℹ️ Unique users are HyperLogLog estimates (±{hll.relative_error() * 100:.1f}% standard error)"
+
+    # 요청한 그룹 / 필터 컬럼을 모두 가진 가장 작은 스케치 (없으면 None → 정확한 계산)
+    def _sketch_for(self, by, where):
+        if not self.approximate:
+            return None
+        needed = ([] if by is None else [by] if isinstance(by, str) else list(by)) + list(where or {})
+        for sketch in self.sketches:
+            if all(c in sketch.columns for c in needed):
+                return sketch
+        return None
+
+    # ✅ 고유 유저 수 (by=None 이면 정수)
+    # exact=None 이면 스케치가 있을 때 HLL 추정치, exact=True 면 항상 정확한 값
+    def unique_users(self, by=None, statuses=None, days=None, where=None, exact=None):
+        if exact is None:
+            exact = not self.approximate
+        sketch = None if exact else self._sketch_for(by, where)
+        if sketch is not None:
+            return hll.estimate(self._filter(sketch, statuses, days, where), by)
+
+        frame = self._filter(self.users, statuses, days, where)
+        if by is None:
+            return int(frame["user"].nunique())
+        return frame.groupby(by, observed=True, sort=True)["user"].nunique()
+
+    # ✅ 유저 × 기간별 거래 수
+    def user_activity(self, by, statuses=None, days=None, where=None):
+        frame = self._filter(self.users, statuses, days, where)
+        return frame.groupby(["user"] + list(by), observed=True, sort=False)["tx_count"].sum()
+
+    # ✅ 한 주의 활성 유저 수 / 그 중 min_tx건 이상 거래한 유저 수
+    def week_activity(self, week, min_tx=2):
+        weekly_tx = self.user_activity(by=["week"], where={"week": week})
+        return len(weekly_tx), int((weekly_tx >= min_tx).sum())
+
+
+PERIODS = ["day", "week", "month"]
+
+
+class ServerCube(DailyCube):
+    """Postgres 집계 RPC에서 받은 큐브 (pushdown 모드).
+    facts / hourly는 DailyCube와 같은 모양이라 합계 지표는 그대로 재집계하고,
+    고유 유저 수 / 주간 활동은 유저 단위 행이 없으므로 요청한 그레인별로 RPC를 한 번씩 호출해 보관.
+    RPC로 답할 수 없는 질의(where 필터, 여러 기간 / 차원 조합, 유저별 활동)는 fallback()이 주는
+    원본 거래 기반 DailyCube로 계산."""
+
+    server = True
+
+    def __init__(self, facts, hourly, new_users, fallback=None):
+        super().__init__(facts, None, hourly)
+        self.daily_new_users = new_users     # day → 신규 유저 수
+        self.fallback = fallback             # () -> DailyCube (처음 필요할 때 원본 거래를 받아 만듦)
+        self.rows_fetched = len(facts) + len(hourly) + len(new_users)    # 서버에서 받은 집계 행 수
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, key, fetch):
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+        value = fetch()
+        with self._lock:
+            if key not in self._results:
+                self._results[key] = value
+                self.rows_fetched += len(value) if isinstance(value, pd.DataFrame) else 1
+            return self._results[key]
+
+    def _client(self):
+        if self.fallback is None:
+            raise ValueError("this query needs raw transactions, but the server cube has no fallback")
+        return self.fallback()
+
+    def unique_users(self, by=None, statuses=None, days=None, where=None, exact=None):
+        keys = [] if by is None else [by] if isinstance(by, str) else list(by)
+        periods = [k for k in keys if k in PERIODS]
+        dims = [k for k in keys if k not in PERIODS]
+        if len(periods) > 1 or len(dims) > 1 or where:
+            return self._client().unique_users(by, statuses, days, where, exact)
+
+        grain = periods[0] if periods else "all"
+        dimension = dims[0] if dims else None
+        statuses = None if statuses is None else sorted(statuses)
+        days = None if days is None else (int(days[0]), int(days[1]))
+        frame = self._remember(
+            ("unique_users", grain, None if statuses is None else tuple(statuses), dimension, days),
+            lambda: pushdown.unique_users(grain, statuses, dimension, days),
+        )
+        if not keys:
+            return int(frame["users"].sum())
+
+        # 차원 값이 없는 그룹은 DailyCube와 같이 제외 (groupby dropna)
+        frame = frame.rename(columns={"period": grain, "dimension": dimension})
+        if dimension is not None:
+            frame = frame[frame[dimension].notna()]
+        return frame.set_index(keys)["users"].astype("int64").sort_index().rename("user")
+
+    def user_activity(self, by, statuses=None, days=None, where=None):
+        return self._client().user_activity(by, statuses, days, where)
+
+    def week_activity(self, week, min_tx=2):
+        return self._remember(("week_activity", int(week), min_tx), lambda: pushdown.week_activity(week, min_tx))
+
+    # ✅ 기간별 신규 유저 수 (grain: "day" / "week" / "month")
+    def new_users(self, grain):
+        daily = self.daily_new_users
+        if grain == "day":
+            return daily
+        keys = week_of_day(daily.index) if grain == "week" else month_of_day(daily.index)
+        return daily.groupby(np.asarray(keys, dtype="int32")).sum().rename_axis(grain)
+
+
+# ✅ 큐브의 상태별 거래 수가 원본과 같은지 확인 (그룹핑에서 빠진 행이 있으면 경고만 — 화면은 계속 제공)
+def check_counts(df, frame, name="facts"):
+    expected = df["spend.status"].value_counts(dropna=False)
+    actual = frame.groupby("status", observed=True, dropna=False)["tx_count"].sum()
+    diff = expected.sub(actual, fill_value=0)
+    if diff.any():
+        warnings.warn(f"cube {name} tx_count does not match transactions per status: {diff[diff != 0].to_dict()}")
+        return False
+    return True
+
+
+def build(df):
+    dims = [DIMENSIONS[k] for k in DIMENSIONS if DIMENSIONS[k] in df.columns]
+    rename = {v: k for k, v in DIMENSIONS.items()}
+
+    base = df[dims].copy()
+    base["spend_cents"] = df["spend.amount"].to_numpy()
+    base["neg_spend_cents"] = np.minimum(base["spend_cents"].to_numpy(), 0)
+
+    # dropna=False: 국가 / 카테고리가 비어 있는 거래도 셀로 남김 (SQL GROUP BY처럼 null 그룹 유지)
+    facts = base.groupby(dims, observed=True, sort=True, dropna=False).agg(
+        spend_cents=("spend_cents", "sum"),
+        neg_spend_cents=("neg_spend_cents", "sum"),
+        tx_count=("spend_cents", "size"),
+    ).reset_index().rename(columns=rename)
+
+    # 유저는 카테고리 코드(int32)로 저장
+    base["user"] = df[USER_COLUMN].cat.codes.astype("int32").to_numpy()
+    users = base.groupby(dims + ["user"], observed=True, sort=False, dropna=False).agg(
+        tx_count=("spend_cents", "size"),
+    ).reset_index().rename(columns=rename)
+    users = users[users["user"] >= 0]
+
+    hourly = pd.DataFrame({
+        "day": df["day"].to_numpy(),
+        "status": df["spend.status"].to_numpy(),
+        "hour": df["hour_utc"].to_numpy(),
+        "spend_cents": base["spend_cents"].to_numpy(),
+    }).groupby(["day", "status", "hour"], observed=True, sort=True, dropna=False).agg(
+        spend_cents=("spend_cents", "sum"),
+        tx_count=("spend_cents", "size"),
+    ).reset_index()
+
+    check_counts(df, facts, "facts")
+    check_counts(df, hourly, "hourly")
+
+    # 유저 해시는 카테고리(고유 유저) 단위로 한 번만 계산
+    sketches = None
+    if DISTINCT_MODE == "hll":
+        reg, rank = hll.registers(hll.hash_values(df[USER_COLUMN].cat.categories))
+        codes = users["user"].to_numpy()
+        cells = users.assign(reg=reg[codes], rank=rank[codes])
+        sketches = [
+            with_periods(hll.sketch(cells, grain))
+            for grain in SKETCH_GRAINS if all(k in cells.columns for k in grain)
+        ]
+
+    return DailyCube(with_periods(facts), with_periods(users), with_periods(hourly), sketches)
+
+
+# ✅ 서버 집계 RPC → ServerCube (원본 거래는 fallback이 필요할 때만)
+def build_server(fallback=None):
+    facts = pushdown.daily_facts()
+    hourly = pushdown.hourly_facts()
+    for frame in (facts, hourly):
+        frame["day"] = frame["day"].astype("int32")
+        for col in ("status", "country", "category"):
+            if col in frame.columns:
+                frame[col] = frame[col].astype("category")
+    hourly["hour"] = hourly["hour"].astype("int8")
+    return ServerCube(with_periods(facts), with_periods(hourly), pushdown.new_users(), fallback)
+
+
+def get(bundle):
+    if pushdown.ENABLED:
+        fallback = lambda: bundle.derived("client_cube", lambda b: build(b.df))
+        return bundle.derived("cube", lambda b: build_server(fallback))
+    return bundle.derived("cube", lambda b: build(b.df))
@@ -0,0 +1,70 @@
+import os
+import numpy as np
+
+# ✅ 시계열 차트 다운샘플링
+# 히스토리가 길어져도 차트에 그리는 점/막대 수를 고정 → 차트 생성 및 전송 비용 일정
+POINT_BUDGET = int(os.getenv("DASHBOARD_POINT_BUDGET", "400"))   # 선 차트 최대 점 수
+BAR_BUDGET = int(os.getenv("DASHBOARD_BAR_BUDGET", "90"))        # 막대 차트 최대 막대 수
+
+
+# ✅ Largest-Triangle-Three-Buckets: 모양을 유지하는 n_out개 점의 인덱스
+def lttb(y, n_out, x=None):
+    y = np.asarray(y, dtype="float64")
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype="float64") if x is None else np.asarray(x, dtype="float64")
+
+    # 첫 점 / 끝 점은 고정, 나머지는 n_out - 2개 버킷
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 다음 버킷의 평균점
+        nlo, nhi = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+
+        # 이전 선택점 - 후보 - 다음 버킷 평균점이 만드는 삼각형 넓이가 최대인 점
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+# ✅ 최소/최대 envelope: n_buckets개 구간별 (시작 인덱스, 최소값, 최대값)
+def minmax_envelope(y, n_buckets):
+    y = np.asarray(y, dtype="float64")
+    n = len(y)
+    starts = np.unique(np.linspace(0, n, min(n_buckets, n), endpoint=False).astype(int))
+    return starts, np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)
+
+
+# ✅ 막대 차트 집계 단위: 일 수가 예산을 넘으면 주 → 월 단위로 rollup
+def grain_for(n_days, budget=BAR_BUDGET):
+    if n_days <= budget:
+        return "day"
+    if n_days / 7 <= budget:
+        return "week"
+    return "month"
+
+
+# ✅ 선 차트: 예산을 넘으면 LTTB 점만 그리고 원본의 최소/최대 범위를 옅게 표시
+def plot_series(ax, x, y, budget=POINT_BUDGET, **kwargs):
+    x = np.asarray(x)
+    y = np.asarray(y, dtype="float64")
+    if len(y) <= budget:
+        return ax.plot(x, y, **kwargs)
+
+    idx = lttb(y, budget)
+    lines = ax.plot(x[idx], y[idx], **{**kwargs, "marker": None})
+    starts, mins, maxs = minmax_envelope(y, budget)
+    ax.fill_between(x[starts], mins, maxs, step="post", alpha=0.15, color=lines[0].get_color(), linewidth=0)
+    return lines
@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import pandas as pd
+
+# ✅ HyperLogLog 고유 유저 스케치
+# 셀(day × 차원)마다 (레지스터, 최대 rank)만 희소하게 저장 → 레지스터별 max로 어떤 기간 / 그룹으로도 병합 가능
+# 병합 비용은 거래 수가 아니라 셀 수 × min(셀의 유저 수, 2^p)에 비례
+#
+# 오차: 상대 표준오차 ≈ 1.04 / sqrt(2^p)
+#   p = 12 (기본) → 4096 레지스터 · 약 1.6% (95% 구간 약 ±3.3%)
+#   p = 14        → 16384 레지스터 · 약 0.8%
+# 작은 값(추정치 ≤ 2.5 · 2^p)은 linear counting으로 보정 (64비트 해시라 큰 값 보정은 불필요)
+PRECISION = int(os.getenv("DASHBOARD_HLL_PRECISION", "12"))
+
+
+def relative_error(p=PRECISION):
+    return 1.04 / np.sqrt(2 ** p)
+
+
+# ✅ 유저 id 문자열 → 64비트 해시 (고유값 단위로 한 번, 버전 / 프로세스가 달라도 같은 값)
+def hash_values(values):
+    return pd.util.hash_array(np.asarray(pd.Index(values).astype(str), dtype=object))
+
+
+# ✅ 해시 → (레지스터 번호, rank = 나머지 비트의 leading zero 수 + 1)
+def registers(hashes, p=PRECISION):
+    h = np.asarray(hashes, dtype="uint64")
+    reg = (h >> np.uint64(64 - p)).astype("int32")
+    rest = h & np.uint64((1 << (64 - p)) - 1)
+    bit_length = np.frexp(rest.astype("float64"))[1]
+    rank = ((64 - p) - bit_length + 1).astype("int8")
+    return reg, rank
+
+
+# ✅ (키 컬럼들 + reg, rank) 행 → 키 × 레지스터별 최대 rank (희소 스케치)
+def sketch(frame, keys):
+    return frame.groupby(list(keys) + ["reg"], observed=True, sort=False)["rank"].max().reset_index()
+
+
+# ✅ 희소 스케치 병합 + 추정 (by=None 이면 정수)
+def estimate(frame, by=None, p=PRECISION):
+    m = 2 ** p
+    alpha = 0.7213 / (1 + 1.079 / m)
+    by = [] if by is None else ([by] if isinstance(by, str) else list(by))
+
+    merged = frame.groupby(by + ["reg"], observed=True, sort=False)["rank"].max()
+    inverse = pd.Series(np.exp2(-merged.to_numpy(dtype="float64")), index=merged.index)
+    if by:
+        level = by if len(by) > 1 else by[0]
+        harmonic = inverse.groupby(level=level, observed=True, sort=True).sum()
+        filled = inverse.groupby(level=level, observed=True, sort=True).size()
+    else:
+        harmonic = pd.Series([inverse.sum()])
+        filled = pd.Series([len(inverse)])
+
+    zeros = m - filled.to_numpy()
+    raw = alpha * m * m / (harmonic.to_numpy() + zeros)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    linear = m * np.log(m / np.where(zeros > 0, zeros, 1))
+    out = np.rint(np.where(small, linear, raw)).astype("int64")
+    if not by:
+        return int(out[0]) if len(merged) else 0
+    return pd.Series(out, index=harmonic.index, name="user")
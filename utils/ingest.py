@@ -0,0 +1,116 @@
+import csv
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from utils.preprocess import CATEGORY_COLUMNS
+
+# ✅ 페이지 단위 Arrow 수집
+# 받은 페이지(CSV 본문 또는 JSON dict 리스트)를 바로 타입이 정해진 Arrow 테이블로 바꾸고 원본은 버림
+# → 최종 df로 바꿀 때까지 메모리에는 컬럼형 버퍼만 남음 (dict 리스트 + DataFrame 이중 보관 없음)
+
+# 숫자로 받을 컬럼 (문자열 "100" / 정수 100 모두 float64로 통일)
+NUMERIC_COLUMNS = ["spend.amount"]
+
+# CSV 파서 스레드 (코어가 하나뿐이면 이득 없이 스레드 풀만 생기므로 끔)
+CSV_THREADS = pa.cpu_count() > 1
+
+
+def _as_number(column):
+    if pa.types.is_integer(column.type) or pa.types.is_floating(column.type) or pa.types.is_null(column.type):
+        return pc.cast(column, pa.float64())
+    try:
+        return pc.cast(column, pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # 숫자가 아닌 값은 null (preprocess에서 0 처리)
+        return pa.array(pd.to_numeric(column.to_pandas(), errors="coerce"), pa.float64())
+
+
+def _as_string(column):
+    return column if pa.types.is_string(column.type) else pc.cast(column, pa.string())
+
+
+def _column(rows, name):
+    values = [r.get(name) for r in rows]
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def conform(table, columns=None):
+    """컬럼 순서 / 타입 통일: 숫자 컬럼은 float64, 반복값이 많은 컬럼은 dictionary 인코딩."""
+    arrays, names = [], columns or table.column_names
+    for name in names:
+        column = table[name] if name in table.column_names else pa.nulls(table.num_rows, pa.string())
+        if name in NUMERIC_COLUMNS:
+            column = _as_number(column)
+        elif name in CATEGORY_COLUMNS and not pa.types.is_dictionary(column.type):
+            column = pc.dictionary_encode(_as_string(column))
+        arrays.append(column)
+    return pa.table(arrays, names=names)
+
+
+def page_to_table(rows, columns=None):
+    """JSON 페이지 한 개 → Arrow 테이블."""
+    try:
+        table = pa.Table.from_pylist(rows)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # 타입이 섞인 컬럼이 있으면 컬럼별로 변환하고, 섞인 컬럼만 문자열로 받음
+        table = pa.table({name: _column(rows, name) for name in columns or list(rows[0])})
+    return conform(table, columns)
+
+
+def csv_to_table(data, columns=None):
+    """PostgREST text/csv 응답 → Arrow 테이블 (멀티스레드 네이티브 파서).
+    타입 추론 없이 헤더 기준으로 고정: 숫자 컬럼 float64, 카테고리 컬럼 dictionary, 나머지는 문자열
+    (워터마크 / id는 서버가 준 문자열 그대로 keyset 커서에 다시 쓰기 위해 문자열 유지)."""
+    header = data.split(b"\n", 1)[0].strip()
+    if not header:
+        return pa.table({name: pa.array([], pa.string()) for name in columns or []})
+    names = next(csv.reader([header.decode("utf-8")]))
+
+    types = {name: pa.string() for name in names}
+    types.update({name: pa.float64() for name in NUMERIC_COLUMNS if name in types})
+    types.update({name: pa.dictionary(pa.int32(), pa.string()) for name in CATEGORY_COLUMNS if name in types})
+    table = pacsv.read_csv(
+        pa.py_buffer(data),
+        read_options=pacsv.ReadOptions(use_threads=CSV_THREADS),
+        convert_options=pacsv.ConvertOptions(
+            column_types=types,
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,    # NULL은 따옴표 없는 빈 값, 빈 문자열은 ""
+        ),
+    )
+    return conform(table, columns)
+
+
+def concat(tables):
+    # 페이지마다 null 전용 컬럼 등 타입이 조금씩 다를 수 있으므로 승격 허용
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+
+    # CSV / JSON 페이지가 섞여 타입이 맞지 않는 컬럼(예: id 정수 vs 문자열)은 문자열로 통일
+    mixed = {
+        name for name in tables[0].column_names
+        if len({str(t.schema.field(name).type) for t in tables if name in t.column_names}) > 1
+    }
+    return pa.concat_tables([_strings(t, mixed) for t in tables], promote_options="permissive")
+
+
+def _strings(table, names):
+    for name in names:
+        if name in table.column_names:
+            column = table[name]
+            if pa.types.is_dictionary(column.type):
+                column = pc.cast(column, pa.string())
+            table = table.set_column(table.column_names.index(name), name, _as_string(column))
+    return table
+
+
+def to_frame(table):
+    """Arrow 테이블 → DataFrame. 변환하면서 Arrow 버퍼를 해제해 두 벌을 동시에 들고 있지 않음.
+    (호출한 쪽은 table을 더 이상 사용하면 안 됨)"""
+    return table.to_pandas(self_destruct=True, split_blocks=True)
@@ -0,0 +1,52 @@
+import os
+import asyncio
+from utils import users, cube, pushdown
+from utils.supabase import load_data
+
+# ✅ 비동기 데이터 로더
+# transactions(샤드별 keyset 페이징)와 users(id keyset 페이징)는 서로 독립적이므로
+# 한 이벤트 루프에서 동시에 받아 콜드 스타트 시간을 "합"이 아니라 "가장 긴 하나"로 줄임
+# 실제 HTTP 호출은 공유 풀(utils.wire)을 쓰는 동기 함수이므로 작업 스레드에서 실행하고,
+# 페이지를 받는 작업(트랜잭션 샤드 / 유저 페이징)은 LOAD_CONCURRENCY개까지만 동시에 돌림
+LOAD_CONCURRENCY = int(os.getenv("DASHBOARD_LOAD_CONCURRENCY", "6"))
+
+
+async def _limited(semaphore, fn, *args):
+    async with semaphore:
+        return await asyncio.to_thread(fn, *args)
+
+
+async def load_all(previous=None, concurrency=LOAD_CONCURRENCY):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    # load_data의 작업 스레드에서 호출됨 → 샤드들을 이 루프에 올려 같은 동시성 제한 아래에서 실행
+    # 실패한 샤드가 있어도 나머지가 끝날 때까지 기다린 뒤 첫 예외를 올림 (체크포인트가 일관되게 남도록)
+    def map_shards(fn, items):
+        futures = [asyncio.run_coroutine_threadsafe(_limited(semaphore, fn, item), loop) for item in items]
+        results, error = [], None
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    # pushdown 모드: 원본 거래 대신 서버 집계 큐브만 (원본 / 유저 차원은 드릴다운 화면이 열릴 때)
+    if pushdown.ENABLED:
+        tasks = {"cube": _limited(semaphore, cube.build_server)}
+    else:
+        tasks = {"transactions": asyncio.to_thread(load_data, map_shards=map_shards)}
+        # 유저 차원은 전체를 다시 받을 때만 미리 받음 (그 외에는 렌더링 시 새 유저만 증분 조회)
+        if users.refresh_due(previous.peek("users") if previous is not None else None):
+            tasks["users"] = _limited(semaphore, users.load_all)
+
+    frames = await asyncio.gather(*tasks.values())
+    return dict(zip(tasks, frames))
+
+
+# ✅ {"transactions": df, "users": 유저 차원(받았을 때만)} / pushdown 모드면 {"cube": ServerCube}
+def load_frames(previous=None):
+    return asyncio.run(load_all(previous))
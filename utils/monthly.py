@@ -0,0 +1,110 @@
+import pandas as pd
+from utils import cube, user_index, topk, pushdown
+
+# ✅ 월별 리포트 인덱스 (데이터 버전당 한 번 생성 → 월 전환은 조회만)
+STATUSES = ["completed", "pending"]
+TOP_N = 10
+
+
+class MonthlyIndex:
+    def __init__(self, kpis, daily, top_merchants, top_categories, countries, first_month):
+        self.kpis = kpis                      # month → total_spend, tx_count, unique_users, new_users
+        self.daily = daily                    # (month, day) → spend, txs
+        self.top_merchants = top_merchants    # (month, rank) → 가맹점 Top N
+        self.top_categories = top_categories  # (month, rank) → 카테고리 Top N
+        self.countries = countries            # (month, country) → spend_usd
+        self.first_month = first_month        # user → 첫 거래 월 (pushdown 모드에서는 None)
+
+    def months(self):
+        return sorted(self.kpis.index.tolist(), reverse=True)
+
+    def kpi(self, month):
+        if month is None or month not in self.kpis.index:
+            return {"total_spend": 0, "tx_count": 0, "unique_users": 0, "new_users": 0}
+        row = self.kpis.loc[month]
+        return {
+            "total_spend": float(row["total_spend"]),
+            "tx_count": int(row["tx_count"]),
+            "unique_users": int(row["unique_users"]),
+            "new_users": int(row["new_users"]),
+        }
+
+    # ✅ 임의의 두 달 사이 변화율 (%) — 비교 월 값이 0이면 None
+    def delta(self, month, other):
+        current, base = self.kpi(month), self.kpi(other)
+        return {
+            k: (current[k] - base[k]) / base[k] * 100 if base[k] else None
+            for k in current
+        }
+
+    def _rows(self, frame, month):
+        if month not in frame.index.get_level_values("month"):
+            return frame.iloc[0:0].reset_index(level="month", drop=True)
+        return frame.xs(month, level="month")
+
+    def daily_for(self, month):
+        return self._rows(self.daily, month)
+
+    def merchants_for(self, month):
+        return self._rows(self.top_merchants, month).reset_index(drop=True)
+
+    def categories_for(self, month):
+        return self._rows(self.top_categories, month).reset_index(drop=True)
+
+    def countries_for(self, month):
+        return self._rows(self.countries, month)["spend_usd"]
+
+
+# ✅ 월별 그룹에서 total_spend 기준 상위 N개 (월별 부분 선택, 전체 정렬 없음)
+def top_per_month(table, key):
+    table = topk.top_per_group(table, "month", "total_spend", TOP_N)
+    return table.set_index(["month", "rank"])[[key, "total_spend", "tx_count", "user_count"]]
+
+
+def build(bundle):
+    c = cube.get(bundle)
+
+    # KPI: 큐브에서 월 단위로 한 번에
+    totals = c.totals(by="month", statuses=STATUSES)
+    kpis = pd.DataFrame({
+        "total_spend": totals["spend_usd"],
+        "tx_count": totals["tx_count"].astype("int64"),
+        "unique_users": c.unique_users(by="month", statuses=STATUSES),
+        "new_users": user_index.new_users(bundle, "month"),
+    }).fillna(0)
+    kpis["new_users"] = kpis["new_users"].astype("int64")
+
+    daily = c.totals(by=["month", "day"], statuses=STATUSES)[["spend_usd", "tx_count"]] \
+        .rename(columns={"spend_usd": "spend", "tx_count": "txs"})
+
+    # 가맹점: (월, 가맹점) 한 번의 그룹 집계로 모든 달의 지출 / 건수 / 고유 유저
+    # (pushdown 모드에서는 서버가 월별 상위 N개까지 골라서 보냄)
+    if c.server:
+        merchants = pushdown.monthly_merchants().drop(columns="rank") \
+            .rename(columns={"merchant": "spend.merchantName", "spend_cents": "total_spend"})
+    else:
+        merchants = topk.grouped(
+            bundle.df_total, ["month", "spend.merchantName"],
+            sums={"total_spend": "spend.amount"}, distinct={"user_count": "spend.userId"}
+        ).reset_index()
+    merchants["total_spend"] = merchants["total_spend"] / 100
+
+    categories = c.totals(by=["month", "category"], statuses=STATUSES)[["spend_usd", "tx_count"]] \
+        .rename(columns={"spend_usd": "total_spend"})
+    categories["user_count"] = c.unique_users(by=["month", "category"], statuses=STATUSES)
+    categories = categories.reset_index().rename(columns={"category": "spend.merchantCategory"})
+
+    countries = c.totals(by=["month", "country"], statuses=STATUSES)[["spend_usd"]]
+
+    return MonthlyIndex(
+        kpis=kpis,
+        daily=daily,
+        top_merchants=top_per_month(merchants, "spend.merchantName"),
+        top_categories=top_per_month(categories, "spend.merchantCategory"),
+        countries=countries,
+        first_month=None if c.server else user_index.get(bundle)["first_month"],
+    )
+
+
+def get(bundle):
+    return bundle.derived("monthly", build)
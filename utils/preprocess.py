@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+# ✅ 카테고리형으로 저장할 컬럼 (반복되는 문자열 → 정수 코드 + 사전)
+CATEGORY_COLUMNS = [
+    "spend.status",
+    "spend.merchantCountry",
+    "spend.merchantName",
+    "spend.merchantCategory",
+    "spend.userId",
+    "spend.userEmail",
+]
+
+
+def to_category(s, lower=False):
+    # 고유값 단위로만 문자열 처리 (행 단위 파이썬 호출 없음)
+    codes, uniques = pd.factorize(s)
+    labels = pd.Index(uniques).astype(str)
+    if lower:
+        labels = labels.str.strip().str.lower()
+    categories = labels.unique()
+    new_codes = np.where(codes >= 0, categories.get_indexer(labels)[codes], -1)
+    return pd.Categorical.from_codes(new_codes, categories=categories)
+
+
+# ✅ 정수 기간 키 (UTC 기준)
+# day  : 1970-01-01 이후 일 수
+# week : 월요일 시작 주 번호 (1970-01-01은 목요일 → +3)
+# month: year * 12 + (month - 1)
+def day_keys(ts):
+    naive = ts.dt.tz_convert(None) if ts.dt.tz is not None else ts
+    return naive.values.astype("datetime64[D]").astype("int64").astype("int32")
+
+
+def week_of_day(day):
+    return (np.asarray(day, dtype="int64") + 3) // 7
+
+
+def month_of_ts(ts):
+    return (ts.dt.year * 12 + ts.dt.month - 1).astype("int32")
+
+
+def month_of_day(day):
+    months = np.asarray(day, dtype="int64").astype("datetime64[D]").astype("datetime64[M]").astype("int64")
+    return months + 1970 * 12
+
+
+def day_of_date(date):
+    return int((pd.Timestamp(date) - pd.Timestamp("1970-01-01")).days)
+
+
+# ✅ 키 → 화면 표시용 라벨
+def day_to_date(keys):
+    days = np.asarray(keys, dtype="int64").astype("datetime64[D]")
+    return pd.Index(pd.to_datetime(days).date, name="date")
+
+
+def week_label(keys):
+    start = np.asarray(keys, dtype="int64") * 7 - 3
+    first = pd.to_datetime(start.astype("datetime64[D]")).strftime("%Y-%m-%d")
+    last = pd.to_datetime((start + 6).astype("datetime64[D]")).strftime("%Y-%m-%d")
+    return pd.Index(first + "/" + last, name="week")
+
+
+def month_label(keys):
+    keys = np.asarray(keys, dtype="int64")
+    return pd.Index([f"{k // 12:04d}-{k % 12 + 1:02d}" for k in keys], name="month")
+
+
+def month_key(ts):
+    return int(ts.year * 12 + ts.month - 1)
+
+
+def preprocess(df):
+    """원본 트랜잭션 df → 분석용 압축 df (벡터화된 변환만 사용)."""
+    out = pd.DataFrame(index=df.index)
+
+    # ✅ 시각: tz-aware UTC 타임스탬프 한 컬럼만 유지 (파싱은 여기서 한 번)
+    # JSON("2025-04-15T10:00:00+00:00")과 CSV("2025-04-15 10:00:00+00") 표기를 모두 받도록 ISO8601로 고정
+    ts = pd.to_datetime(df["spend.authorizedAt"], errors="coerce", utc=True, format="ISO8601")
+    valid = ts.notna().to_numpy()
+
+    for col in df.columns:
+        if col in ("spend.authorizedAt", "spend.amount") or col in CATEGORY_COLUMNS:
+            continue
+        out[col] = df[col]
+
+    # ✅ 금액: 정수 센트 + float32 USD
+    cents = pd.to_numeric(df["spend.amount"], errors="coerce").fillna(0).round()
+    out["spend.amount"] = cents.astype("int64")
+    out["spend.amount_usd"] = (out["spend.amount"] / 100).astype("float32")
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            out[col] = to_category(df[col], lower=(col == "spend.status"))
+
+    out["spend.authorizedAt"] = ts
+
+    # 시각을 알 수 없는 행은 어떤 차트에도 놓을 수 없으므로 제외
+    out = out[valid].reset_index(drop=True)
+    ts = out["spend.authorizedAt"]
+
+    # ✅ 정수 기간 키
+    out["day"] = day_keys(ts)
+    out["week"] = week_of_day(out["day"]).astype("int32")
+    out["month"] = month_of_ts(ts)
+    out["hour_utc"] = ts.dt.hour.astype("int8")
+
+    return out
+
+
+# ✅ 컬럼별 메모리 사용량 (MB)
+def memory_report(df):
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "memory_mb": usage / 1024 ** 2,
+    })
+    report.index.name = "column"
+    return report.sort_values("memory_mb", ascending=False)
+
+
+def period_labels(keys, grain):
+    if grain == "week":
+        return week_label(keys)
+    if grain == "month":
+        return month_label(keys)
+    return day_to_date(keys)
@@ -0,0 +1,66 @@
+import os
+import json
+import pandas as pd
+from utils import wire
+
+# ✅ 집계 pushdown (DASHBOARD_AGGREGATE_MODE=server)
+# overview / analytics / time_analysis / monthly_report / country의 합계 · 건수 · 고유 유저 수를
+# Postgres 뷰 / RPC(supabase/migrations/*_dashboard_aggregates.sql)에서 계산하고 집계된 행만 받음
+# → 전송량이 거래 수가 아니라 일 수 × 차원 수에 비례. 원본 거래는 드릴다운 화면(merchants / retention / risk)이
+#   처음 열리거나 서버 집계로 답할 수 없는 질의(utils/cube.py ServerCube)가 올 때만 수집
+ENABLED = os.getenv("DASHBOARD_AGGREGATE_MODE", "client") == "server"
+
+# 집계마다 결과 전체를 JSON 배열 한 개로 돌려주는 RPC — 요청 한 번 = 서버 집계 한 번
+# (뷰를 limit/offset으로 페이징하면 페이지마다 전체 거래 집계를 다시 실행함)
+FACTS_RPC = "dashboard_daily_facts_json"
+HOURLY_RPC = "dashboard_hourly_facts_json"
+NEW_USERS_RPC = "dashboard_new_users_json"
+MERCHANTS_RPC = "dashboard_monthly_merchants_json"
+UNIQUE_USERS_RPC = "dashboard_unique_users"
+WEEK_ACTIVITY_RPC = "dashboard_week_activity"
+
+
+# ✅ GET /rpc/{name}?params → 파싱된 JSON
+def call(name, params=None):
+    return json.loads(wire.get(f"rpc/{name}", list(params or []), accept="application/json"))
+
+
+def rows(name, columns, params=None):
+    return pd.DataFrame(call(name, params), columns=columns)
+
+
+def daily_facts():
+    return rows(FACTS_RPC, ["day", "status", "country", "category", "spend_cents", "neg_spend_cents", "tx_count"])
+
+
+def hourly_facts():
+    return rows(HOURLY_RPC, ["day", "status", "hour", "spend_cents", "tx_count"])
+
+
+# ✅ 일별 신규 유저 수 (완료 + 대기 거래 기준 첫 거래일 — utils/user_index.py와 같은 정의)
+def new_users():
+    frame = rows(NEW_USERS_RPC, ["day", "new_users"])
+    return frame.set_index("day")["new_users"].astype("int64")
+
+
+# ✅ 월별 지출 상위 가맹점 (서버에서 월별 순위까지 매겨 상위 N개만)
+def monthly_merchants():
+    return rows(MERCHANTS_RPC, ["month", "merchant", "spend_cents", "tx_count", "user_count", "rank"])
+
+
+# ✅ 고유 유저 수: grain("all" / "day" / "week" / "month") × 차원 하나(선택) × 일 키 구간(선택, 양끝 포함)
+def unique_users(grain="all", statuses=None, dimension=None, days=None):
+    params = [("p_grain", grain)]
+    if statuses is not None:
+        params.append(("p_statuses", "{" + ",".join(statuses) + "}"))
+    if dimension is not None:
+        params.append(("p_dimension", dimension))
+    if days is not None:
+        params += [("p_from_day", str(int(days[0]))), ("p_to_day", str(int(days[1])))]
+    return rows(UNIQUE_USERS_RPC, ["period", "dimension", "users"], params)
+
+
+# ✅ 한 주의 활성 유저 수 / 그 중 min_tx건 이상 거래한 유저 수
+def week_activity(week, min_tx=2):
+    result = call(WEEK_ACTIVITY_RPC, [("p_week", str(int(week))), ("p_min_tx", str(min_tx))])
+    return int(result["users"]), int(result["recurring_users"])
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from utils.preprocess import week_of_day, month_of_day, period_labels
+
+# ✅ 코호트 리텐션 엔진
+# 정수 유저 코드 + 기간 오프셋을 하나의 int64 키로 묶고 sort + unique 한 번으로
+# cohort × offset 고유 유저 행렬을 만든다.
+DEFAULT_HORIZON = {"day": 30, "week": 12, "month": 12}
+
+
+def to_period(day, grain):
+    if grain == "week":
+        return week_of_day(day)
+    if grain == "month":
+        return month_of_day(day)
+    return np.asarray(day, dtype="int64")
+
+
+def cohort_matrix(users, days, first_days, grain="day", start_day=None, horizon=None):
+    """users: 유저 코드(int), days: 거래일 키, first_days: 해당 유저의 첫 거래일 키 (행별로 정렬된 배열).
+    반환: index = 코호트 라벨, columns = 오프셋(0..horizon), 값 = 고유 유저 수"""
+    horizon = DEFAULT_HORIZON[grain] if horizon is None else int(horizon)
+    users = np.asarray(users, dtype="int64")
+    days = np.asarray(days, dtype="int64")
+    first_days = np.asarray(first_days, dtype="float64")
+
+    valid = ~np.isnan(first_days) & (users >= 0)
+    if start_day is not None:
+        valid &= first_days >= start_day
+    users, days, first_days = users[valid], days[valid], first_days[valid].astype("int64")
+
+    cohort = to_period(first_days, grain)
+    offset = to_period(days, grain) - cohort
+    keep = (offset >= 0) & (offset <= horizon)
+    users, cohort, offset = users[keep], cohort[keep], offset[keep]
+    if len(users) == 0:
+        return pd.DataFrame(columns=range(horizon + 1), dtype="int64")
+
+    # (코호트, 오프셋, 유저) → int64 키 하나로 묶어 중복 제거
+    cmin = cohort.min()
+    n_cohorts = int(cohort.max() - cmin + 1)
+    n_users = int(users.max() + 1)
+    cell = (cohort - cmin) * (horizon + 1) + offset
+    keys = np.unique(cell * n_users + users)
+
+    counts = np.bincount(keys // n_users, minlength=n_cohorts * (horizon + 1))
+    matrix = counts.reshape(n_cohorts, horizon + 1)
+
+    table = pd.DataFrame(matrix, index=np.arange(cmin, cmin + n_cohorts), columns=range(horizon + 1))
+    table = table[table[0] > 0]
+    table.index = period_labels(table.index, grain).astype(str)
+    return table
+
+
+def retention_pct(table):
+    return table.divide(table[0], axis=0) * 100
@@ -0,0 +1,585 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from utils import sync
+from utils.risk_rules import Rule, CompiledRules
+
+# ✅ 리스크 / 어뷰징 탐지 (유저별 파이썬 루프 없이 정수 코드 배열 연산만 사용)
+USER_COLUMN = "spend.userId"
+CANCEL_STATUS = "reversed"
+FAIL_STATUS = "declined"
+
+CANCEL_RATE = 0.3    # 취소율 기준
+FAIL_RATE = 0.2      # 실패율 기준
+MIN_STREAK = 2       # 연속 취소 기준
+MIN_REPEAT = 4       # 하루 동일 금액 반복 기준
+
+# 속도 기준: (윈도우 분, 최대 거래 수, 최대 금액 USD) — 둘 중 하나라도 넘으면 버스트
+VELOCITY_WINDOWS = [
+    (10, 5, 1_000),
+    (60, 10, 5_000),
+    (24 * 60, 30, 20_000),
+]
+
+# (유저 코드, |금액 cents|) → int64 키 (금액은 2^40 cents ≈ 110억 달러 미만)
+AMOUNT_BITS = 40
+
+
+# ✅ 유저 단위 규칙 (summary 컬럼 비교식) — 규칙 추가는 여기 한 줄
+RULES = [
+    Rule("high_cancel_rate", "cancel_rate", ">", CANCEL_RATE, weight=2, description="Reversed share of transactions"),
+    Rule("high_fail_rate", "fail_rate", ">", FAIL_RATE, weight=2, description="Declined share of transactions"),
+    Rule("cancel_streak", "max_cancel_streak", ">=", MIN_STREAK, description="Consecutive reversals"),
+    Rule("mirror_amounts", "mirror_tx", ">", 0, description="Same amount charged and refunded"),
+    Rule("same_amount_repeat", "max_daily_repeat", ">=", MIN_REPEAT, description="Same amount repeated in one day"),
+] + [
+    rule
+    for minutes, max_tx, max_usd in VELOCITY_WINDOWS
+    for rule in (
+        Rule(f"velocity_tx_{minutes}m", f"velocity_tx_{minutes}m", ">", max_tx,
+             description=f"Transactions within {minutes} minutes"),
+        Rule(f"velocity_usd_{minutes}m", f"velocity_usd_{minutes}m", ">", max_usd,
+             description=f"Spend (USD) within {minutes} minutes"),
+    )
+]
+COMPILED_RULES = CompiledRules(RULES)
+
+
+class RiskReport:
+    def __init__(self, summary, scores, hits, streaks, mirrors, repeats, bursts, total_users):
+        self.summary = summary            # user → tx/취소/실패 건수, 비율, 금액, 연속 취소, 속도 등 규칙 지표
+        self.scores = scores              # user → risk_score, rules_fired, reasons (규칙이 발동한 유저만)
+        self.hits = hits                  # (user, rule) 발동 내역 — 지표 값 / 기준 / weight
+        self.streaks = streaks            # 연속 취소 ≥ MIN_STREAK 인 거래 행
+        self.mirrors = mirrors            # 같은 유저의 +금액 / −금액 짝이 있는 거래 행
+        self.repeats = repeats            # 같은 유저 · 금액 · 일자 ≥ MIN_REPEAT 인 거래 행
+        self.bursts = bursts              # 속도 기준을 넘은 롤링 윈도우에 속한 거래 행
+        self.total_users = total_users
+
+    # 특정 규칙들이 발동한 유저의 summary
+    def users_for(self, prefix):
+        users = self.hits.loc[self.hits["rule"].str.startswith(prefix), USER_COLUMN].unique()
+        return self.summary[self.summary.index.isin(users)]
+
+    def velocity_users(self):
+        return self.users_for("velocity_")
+
+    def suspicious(self):
+        return self.scores
+
+
+def _user_codes(df):
+    users = df[USER_COLUMN]
+    return users.cat.codes.to_numpy().astype("int64"), users.cat.categories.astype(str)
+
+
+# ✅ 상태별 건수 / 금액: (유저 코드 × 상태 수 + 상태 코드) 한 번의 bincount
+def status_summary(df):
+    codes, user_ids = _user_codes(df)
+    status = df["spend.status"]
+    statuses = list(status.cat.categories)
+    k = len(statuses) + 1                          # 마지막 칸은 상태 없음
+    status_codes = status.cat.codes.to_numpy().astype("int64")
+    status_codes[status_codes < 0] = k - 1
+
+    valid = codes >= 0
+    cell = codes[valid] * k + status_codes[valid]
+    size = len(user_ids) * k
+    counts = np.bincount(cell, minlength=size).reshape(-1, k)
+    cents = np.bincount(cell, weights=df["spend.amount"].to_numpy()[valid], minlength=size).reshape(-1, k)
+
+    def column(table, name):
+        return table[:, statuses.index(name)] if name in statuses else np.zeros(len(user_ids))
+
+    total = counts.sum(axis=1)
+    summary = pd.DataFrame({
+        "tx_count": total,
+        "cancel_count": column(counts, CANCEL_STATUS).astype("int64"),
+        "fail_count": column(counts, FAIL_STATUS).astype("int64"),
+        "cancel_amount_usd": column(cents, CANCEL_STATUS) / 100,
+        "fail_amount_usd": column(cents, FAIL_STATUS) / 100,
+    }, index=pd.Index(user_ids, name=USER_COLUMN))
+    summary = summary[total > 0]
+    summary.insert(1, "cancel_rate", summary["cancel_count"] / summary["tx_count"])
+    summary.insert(2, "fail_rate", summary["fail_count"] / summary["tx_count"])
+    return summary
+
+
+# ✅ (유저, 시각) 정렬 순서 (유저 없는 행 제외) + 초 단위 시각
+def _user_time_order(df):
+    codes, user_ids = _user_codes(df)
+    ts = df["spend.authorizedAt"].dt.tz_convert(None).to_numpy().astype("datetime64[s]").astype("int64")
+    rows = np.flatnonzero(codes >= 0)
+    order = rows[np.lexsort((ts[rows], codes[rows]))]
+    return codes, user_ids, ts, order
+
+
+# ✅ 연속 취소: (유저, 시각) 정렬 후 run-length encoding → 런 안에서의 위치가 곧 streak
+# 반환: 행별 streak (df 순서), 유저별 최대 streak, 유저별 현재(마지막 거래까지) streak
+# seed: 유저 코드별 이어 붙일 연속 취소 수 (증분 갱신 시 df가 이전 상태 뒤에 붙는 새 거래일 때)
+def cancel_streaks(df, seed=None):
+    codes, user_ids, _, order = _user_time_order(df)
+    is_cancel = (df["spend.status"] == CANCEL_STATUS).to_numpy()
+    u, c = codes[order], is_cancel[order]
+    n = len(order)
+
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = (u[1:] != u[:-1]) | (c[1:] != c[:-1])
+    run_start = np.flatnonzero(new_run)
+    run_id = np.cumsum(new_run) - 1
+    streak = np.where(c, np.arange(n) - run_start[run_id] + 1, 0)
+
+    if seed is not None and n:
+        # 유저의 첫 행에서 시작하는 취소 런은 이전 상태의 현재 streak에 이어짐
+        user_start = np.ones(n, dtype=bool)
+        user_start[1:] = u[1:] != u[:-1]
+        first_run = user_start[run_start[run_id]]
+        streak = np.where(c & first_run, streak + seed[u], streak)
+
+    by_user = pd.Series(streak).groupby(u)
+    per_user = pd.DataFrame({"max_cancel_streak": by_user.max(), "current_cancel_streak": by_user.last()})
+    per_user.index = user_ids[per_user.index]
+
+    row_streak = np.zeros(len(df), dtype="int64")
+    row_streak[order] = streak
+    return row_streak, per_user
+
+
+# ✅ 미러 거래: +금액 키 집합과 −금액 키 집합의 해시 조인 (금액 0은 제외)
+def mirror_mask(df):
+    codes, _ = _user_codes(df)
+    cents = df["spend.amount"].to_numpy()
+    key = (codes << AMOUNT_BITS) | np.abs(cents)
+    valid = (codes >= 0) & (cents != 0)
+
+    positive = pd.unique(key[valid & (cents > 0)])
+    negative = pd.unique(key[valid & (cents < 0)])
+    matched = positive[pd.Index(positive).isin(negative)]
+
+    return valid & pd.Index(key).isin(matched)
+
+
+# ✅ 같은 유저 · 금액 · 일자 반복 횟수: 한 번의 groupby size를 행에 펼침
+def repeat_sizes(df):
+    sizes = df.groupby([USER_COLUMN, "spend.amount", "day"], observed=True, sort=False)["spend.amount"] \
+        .transform("size")
+    return sizes.to_numpy()
+
+
+# ✅ 속도(velocity): 유저별 M분 롤링 윈도우 안의 거래 수 / 금액
+# (유저 코드, 시각)을 하나의 정렬된 int64 키로 만들고 searchsorted로 각 거래의 윈도우 시작을 찾음
+# → 유저별 루프 없이 윈도우 크기마다 searchsorted 한 번 + 누적합 차이
+# 반환: 행별 버스트 포함 여부 (df 순서), 유저별 윈도우별 최대 거래 수 / 금액
+def velocity(df, windows=VELOCITY_WINDOWS):
+    codes, user_ids, ts, order = _user_time_order(df)
+    u, t = codes[order], ts[order]
+    n = len(order)
+    if n == 0:
+        return np.zeros(len(df), dtype=bool), pd.DataFrame(index=pd.Index([], name=USER_COLUMN))
+
+    # 지출 금액만 합산 (환불 등 음수 금액이 버스트를 상쇄하지 않도록)
+    cents = np.clip(df["spend.amount"].to_numpy()[order], 0, None)
+    cum_cents = np.concatenate([[0], np.cumsum(cents)])
+
+    longest = max(minutes for minutes, _, _ in windows) * 60
+    rel = t - t.min() + longest                    # 윈도우 시작이 앞 유저 구간으로 넘어가지 않도록 여유
+    key = u * (int(rel.max()) + 1) + rel
+    end = np.arange(n)
+
+    in_burst = np.zeros(n + 1, dtype="int64")
+    per_user = {}
+    for minutes, max_tx, max_usd in windows:
+        start = np.searchsorted(key, key - minutes * 60, side="left")
+        tx = end - start + 1
+        usd = (cum_cents[end + 1] - cum_cents[start]) / 100
+
+        # 기준을 넘은 윈도우의 [start, end] 구간을 차분 배열로 표시
+        over = (tx > max_tx) | (usd > max_usd)
+        in_burst += np.bincount(start[over], minlength=n + 1)
+        in_burst -= np.bincount(end[over] + 1, minlength=n + 1)
+
+        by_user = pd.DataFrame({"tx": tx, "usd": usd}).groupby(u).max()
+        per_user[f"velocity_tx_{minutes}m"] = by_user["tx"]
+        per_user[f"velocity_usd_{minutes}m"] = by_user["usd"]
+
+    per_user = pd.DataFrame(per_user)
+    per_user.index = pd.Index(user_ids[per_user.index], name=USER_COLUMN)
+
+    row_burst = np.zeros(len(df), dtype=bool)
+    row_burst[order] = np.cumsum(in_burst[:-1]) > 0
+    return row_burst, per_user
+
+
+# ✅ 유저별 리스크 상태
+# summary: user → 상태별 건수 / 금액 / 최대 · 현재 연속 취소 / 윈도우별 최대 속도 / 미러 · 반복 (규칙 지표)
+# flags  : 탐지된 거래 id → user, cancel_streak, mirror, repeat, velocity
+# streak : 행별 연속 취소 (df 순서 — 탐지되지 않은 행도 원장에 보관해 나중에 탐지될 때 사용)
+def detect(df):
+    summary = status_summary(df)
+    streak, per_user = cancel_streaks(df)
+    summary = summary.join(per_user).fillna({"max_cancel_streak": 0, "current_cancel_streak": 0})
+    summary[["max_cancel_streak", "current_cancel_streak"]] = \
+        summary[["max_cancel_streak", "current_cancel_streak"]].astype("int64")
+
+    burst, peaks = velocity(df)
+    summary = summary.join(peaks)
+
+    # 미러 거래 수 / 하루 동일 금액 최대 반복 (유저 코드 기준 bincount · groupby 한 번)
+    codes, user_ids = _user_codes(df)
+    mirror, sizes = mirror_mask(df), repeat_sizes(df)
+    valid = codes >= 0
+    per_user = pd.DataFrame({
+        "mirror_tx": np.bincount(codes[mirror & valid], minlength=len(user_ids)),
+        "max_daily_repeat": pd.Series(sizes[valid]).groupby(codes[valid]).max()
+                              .reindex(range(len(user_ids)), fill_value=0).to_numpy(),
+    }, index=pd.Index(user_ids, name=USER_COLUMN))
+    summary = summary.join(per_user)
+
+    repeat = sizes >= MIN_REPEAT
+    hit = (streak >= MIN_STREAK) | mirror | repeat | burst
+    flags = pd.DataFrame({
+        USER_COLUMN: df.loc[hit, USER_COLUMN].astype(str).to_numpy(),
+        "cancel_streak": streak[hit],
+        "mirror": mirror[hit],
+        "repeat": repeat[hit],
+        "velocity": burst[hit],
+    }, index=pd.Index(df.loc[hit, sync.KEY_COLUMN].astype(str).to_numpy(), name=sync.KEY_COLUMN))
+    return summary, flags, streak
+
+
+class RiskState:
+    """증분 갱신이 가능한 유저별 리스크 상태.
+    summary / flags 는 detect()와 같은 모양이고, 나머지는 upsert 때 바뀐 행의 이전 기여분을 빼기 위한 카운터."""
+
+    FRAMES = ["summary", "flags", "rows", "amounts", "mirrors"]
+
+    def __init__(self, summary, flags, rows, amounts, mirrors, synced_at=None):
+        self.summary = summary    # user → 규칙 지표
+        self.flags = flags        # 탐지된 거래 id → user, cancel_streak, mirror, repeat, velocity
+        self.rows = rows          # 거래 id → user, status, cents, ts(초), day, cancel_streak — 이전 기여분 원장
+        self.amounts = amounts    # (user, cents, day) → 거래 수 (하루 동일 금액 반복)
+        self.mirrors = mirrors    # (user, |cents|) → +금액 / −금액 거래 수 (미러 후보)
+        self.synced_at = synced_at    # 이 상태를 만든 스냅샷의 동기화 시각 (변경분은 이 스냅샷 기준일 때만 적용)
+
+
+# ✅ 원장: 카운터에 들어간 행의 값 + 행별 연속 취소 (유저 / 상태는 카테고리, 유저 없는 행은 카운터에서 제외)
+def _ledger(df, streak=None):
+    users = df[USER_COLUMN]
+    ts = df["spend.authorizedAt"].dt.tz_convert(None).to_numpy().astype("datetime64[s]").astype("int64")
+    return pd.DataFrame({
+        "user": users.cat.rename_categories(users.cat.categories.astype(str)).array,
+        "status": df["spend.status"].array,
+        "cents": df["spend.amount"].to_numpy().astype("int64"),
+        "ts": ts,
+        "day": df["day"].to_numpy().astype("int64"),
+        "cancel_streak": np.zeros(len(df), dtype="int64") if streak is None else streak,
+    }, index=pd.Index(df[sync.KEY_COLUMN].astype(str).to_numpy(), name=sync.KEY_COLUMN))
+
+
+# 원장 행 → 키별 카운터 (유저 레벨은 문자열 Index로 — 버전마다 카테고리가 달라도 정렬 가능하도록)
+def _counts(rows, keys, values):
+    rows = rows[rows["user"].notna()]
+    frame = pd.DataFrame(values(rows), index=rows.index)
+    out = frame.groupby([rows[k] for k in keys], observed=True, sort=False).sum()
+    if isinstance(out.index, pd.MultiIndex):
+        out.index = out.index.set_levels(out.index.levels[0].astype(str), level=0)
+    else:
+        out.index = out.index.astype(str)
+    return out
+
+
+def _status_counts(rows):
+    return _counts(rows, ["user"], lambda r: {
+        "tx_count": np.ones(len(r), dtype="int64"),
+        "cancel_count": (r["status"] == CANCEL_STATUS).to_numpy().astype("int64"),
+        "fail_count": (r["status"] == FAIL_STATUS).to_numpy().astype("int64"),
+        "cancel_cents": np.where(r["status"] == CANCEL_STATUS, r["cents"], 0),
+        "fail_cents": np.where(r["status"] == FAIL_STATUS, r["cents"], 0),
+    })
+
+
+def _amount_counts(rows):
+    return _counts(rows, ["user", "cents", "day"], lambda r: {"tx": np.ones(len(r), dtype="int64")})
+
+
+def _mirror_counts(rows):
+    rows = rows[rows["cents"] != 0].assign(abs_cents=lambda r: r["cents"].abs())
+    return _counts(rows, ["user", "abs_cents"], lambda r: {
+        "positive": (r["cents"] > 0).to_numpy().astype("int64"),
+        "negative": (r["cents"] < 0).to_numpy().astype("int64"),
+    })
+
+
+# 카운터에 (새 행 기여분 − 이전 행 기여분)을 더하고 0이 된 키는 제거
+def _apply(counter, new, old):
+    change = new.sub(old, fill_value=0)
+    if change.empty:
+        return counter
+    updated = counter.reindex(change.index, fill_value=0) + change
+    updated = updated[(updated != 0).any(axis=1)].astype("int64")
+    return pd.concat([counter.drop(change.index, errors="ignore"), updated])
+
+
+# ✅ 카운터에서 유저별 미러 거래 수 / 하루 동일 금액 최대 반복
+def _mirror_tx(mirrors, users):
+    frame = mirrors[_member(mirrors.index.get_level_values(0), users)]
+    matched = (frame["positive"] > 0) & (frame["negative"] > 0)
+    return (frame["positive"] + frame["negative"])[matched].groupby(level=0).sum() \
+        .reindex(users, fill_value=0)
+
+
+def _max_daily_repeat(amounts, users):
+    frame = amounts[_member(amounts.index.get_level_values(0), users)]
+    return frame["tx"].groupby(level=0).max().reindex(users, fill_value=0)
+
+
+# 행별 미러 / 반복 여부 (카운터 조회만)
+def _key_flags(amounts, mirrors, rows):
+    rows = rows[rows["user"].notna()]
+    users = rows["user"].astype(str).to_numpy()
+    repeat = amounts["tx"].reindex(pd.MultiIndex.from_arrays(
+        [users, rows["cents"].to_numpy(), rows["day"].to_numpy()])).fillna(0).to_numpy() >= MIN_REPEAT
+    pairs = mirrors.reindex(pd.MultiIndex.from_arrays(
+        [users, np.abs(rows["cents"].to_numpy())]), fill_value=0)
+    mirror = (rows["cents"].to_numpy() != 0) & (pairs["positive"].to_numpy() > 0) & (pairs["negative"].to_numpy() > 0)
+    return pd.DataFrame({"mirror": mirror, "repeat": repeat}, index=rows.index)
+
+
+# 문자열 멤버십은 해시 조회로 (np.isin은 정렬, pyarrow 문자열 isin은 원소별 파이썬 루프)
+# (이미 고유한 Index면 그 Index의 해시 테이블을 그대로 재사용)
+def _member(values, items):
+    if not (isinstance(items, pd.Index) and items.is_unique):
+        items = pd.Index(items).unique()
+    return items.get_indexer(values) >= 0
+
+
+def init_state(df):
+    summary, flags, streak = detect(df)
+    rows = _ledger(df, streak)
+    return RiskState(summary, flags, rows, _amount_counts(rows), _mirror_counts(rows), df.attrs.get("synced_at"))
+
+
+# ✅ 증분 갱신
+# 1) 변경분 중 원장과 값이 같은 행(룩백으로 다시 받은 행)은 무시
+# 2) 상태별 건수 / 금액, (유저, 금액, 일자) 반복, (유저, |금액|) 미러 후보는 카운터 —
+#    upsert된 행은 이전 기여분을 빼고 새 값을 더함
+# 3) 순서에 의존하는 연속 취소 / 속도는 유저의 이전 거래 뒤에 붙는 새 거래면 현재 streak과
+#    가장 긴 윈도우 안의 최근 거래만으로 이어 계산하고, 과거 행이 바뀐 유저만 전체 행으로 다시 계산
+def update(state, df, delta_ids):
+    delta = df[_member(df[sync.KEY_COLUMN].astype(str), delta_ids)]
+    new = _ledger(delta)
+    positions = state.rows.index.get_indexer(new.index)
+    known = positions >= 0
+    old = state.rows.iloc[positions[known]]
+    same = np.ones(len(old), dtype=bool)
+    for col in ("user", "status", "cents", "ts"):
+        a, b = old[col].astype(object).to_numpy(), new.loc[known, col].astype(object).to_numpy()
+        same &= (a == b) | (pd.isna(a) & pd.isna(b))
+    changed = np.ones(len(new), dtype=bool)
+    changed[np.flatnonzero(known)[same]] = False
+    new, old, positions = new[changed], old[~same], positions[changed]
+    if new.empty:
+        return RiskState(*(getattr(state, name) for name in RiskState.FRAMES), df.attrs.get("synced_at"))
+
+    # 카운터 / 원장 (바뀐 행은 원장에서 위치로 빼고 새 값을 붙임)
+    keep = np.ones(len(state.rows), dtype=bool)
+    keep[positions[positions >= 0]] = False
+    rows = pd.concat([state.rows[keep], new])
+    for col in ("user", "status"):
+        rows[col] = rows[col].astype("category")
+    amounts = _apply(state.amounts, _amount_counts(new), _amount_counts(old))
+    mirrors = _apply(state.mirrors, _mirror_counts(new), _mirror_counts(old))
+
+    touched = pd.Index(pd.concat([new["user"], old["user"]]).dropna().astype(str).unique(), name=USER_COLUMN)
+    summary = state.summary.reindex(touched)
+    counts = summary[["tx_count", "cancel_count", "fail_count"]].fillna(0)
+    counts["cancel_cents"] = (summary["cancel_amount_usd"].fillna(0) * 100).round()
+    counts["fail_cents"] = (summary["fail_amount_usd"].fillna(0) * 100).round()
+    counts = counts.add(_status_counts(new).reindex(touched, fill_value=0)) \
+        .sub(_status_counts(old).reindex(touched, fill_value=0))
+    summary["tx_count"] = counts["tx_count"].astype("int64")
+    summary["cancel_count"] = counts["cancel_count"].astype("int64")
+    summary["fail_count"] = counts["fail_count"].astype("int64")
+    summary["cancel_rate"] = summary["cancel_count"] / summary["tx_count"]
+    summary["fail_rate"] = summary["fail_count"] / summary["tx_count"]
+    summary["cancel_amount_usd"] = counts["cancel_cents"] / 100
+    summary["fail_amount_usd"] = counts["fail_cents"] / 100
+
+    summary["mirror_tx"] = _mirror_tx(mirrors, touched)
+    summary["max_daily_repeat"] = _max_daily_repeat(amounts, touched)
+
+    # 이어 붙이기: 바뀐 행이 모두 새 거래이고 유저의 이전 마지막 거래보다 뒤
+    previous = state.rows[state.rows["user"].isin(touched)]
+    last_ts = previous.groupby(previous["user"].astype(str))["ts"].max().reindex(touched)
+    first_new = new.groupby(new["user"].astype(str))["ts"].min().reindex(touched)
+    appended = (first_new > last_ts.fillna(np.iinfo("int64").min)).to_numpy() \
+        & ~_member(touched, old["user"].dropna().astype(str))
+    append_users, recompute_users = touched[appended], touched[~appended]
+
+    user_rows = df[df[USER_COLUMN].isin(touched)]
+    user_rows = user_rows.assign(**{USER_COLUMN: user_rows[USER_COLUMN].cat.remove_unused_categories()})
+    ledger = _ledger(user_rows)
+    user_ids = user_rows[USER_COLUMN].astype(str).to_numpy()
+    ids = user_rows[sync.KEY_COLUMN].astype(str).to_numpy()
+    # 연속 취소는 원장에서 (탐지되지 않았던 행이 미러 / 반복 등으로 새로 탐지될 수 있음)
+    at = rows.index.get_indexer(ids)
+    marks = state.flags.reindex(pd.Index(ids, name=sync.KEY_COLUMN))
+    marks[USER_COLUMN] = user_ids
+    marks["cancel_streak"] = rows["cancel_streak"].to_numpy()[at]
+    marks = marks.fillna({"mirror": False, "repeat": False, "velocity": False})
+    marks[["mirror", "repeat", "velocity"]] = marks[["mirror", "repeat", "velocity"]].astype(bool)
+    keys = _key_flags(amounts, mirrors, ledger)
+    marks["mirror"], marks["repeat"] = keys["mirror"].to_numpy(), keys["repeat"].to_numpy()
+
+    longest = max(minutes for minutes, _, _ in VELOCITY_WINDOWS) * 60
+    peak_columns = [c for c in summary.columns if c.startswith("velocity_")]
+
+    # 다시 계산: 해당 유저의 전체 행
+    recompute = _member(user_ids, recompute_users)
+    if recompute.any():
+        frame = user_rows[recompute]
+        streak, per_user = cancel_streaks(frame)
+        burst, peaks = velocity(frame)
+        marks.loc[recompute, "cancel_streak"] = streak
+        marks.loc[recompute, "velocity"] = burst
+        summary.loc[recompute_users, ["max_cancel_streak", "current_cancel_streak"]] = \
+            per_user.reindex(recompute_users).fillna(0).to_numpy()
+        summary.loc[recompute_users, peak_columns] = peaks.reindex(recompute_users)[peak_columns].to_numpy()
+
+    # 이어 붙이기: 새 거래는 현재 streak에서 이어 세고, 속도는 가장 긴 윈도우 안의 최근 거래만
+    if len(append_users):
+        is_new = _member(ids, new.index) & _member(user_ids, append_users)
+        frame = user_rows[is_new]
+        _, names = _user_codes(frame)
+        seed = state.summary["current_cancel_streak"].reindex(names).fillna(0).to_numpy().astype("int64")
+        streak, per_user = cancel_streaks(frame, seed=seed)
+        marks.loc[is_new, "cancel_streak"] = streak
+        per_user = per_user.reindex(append_users)
+        summary.loc[append_users, "max_cancel_streak"] = np.fmax(
+            summary.loc[append_users, "max_cancel_streak"].to_numpy(dtype="float64"),
+            per_user["max_cancel_streak"].to_numpy(dtype="float64"))
+        summary.loc[append_users, "current_cancel_streak"] = per_user["current_cancel_streak"].to_numpy()
+
+        since = first_new.reindex(user_ids).to_numpy() - longest
+        tail = _member(user_ids, append_users) & (ledger["ts"].to_numpy() >= since)
+        burst, peaks = velocity(user_rows[tail])
+        marks.loc[tail, "velocity"] = marks.loc[tail, "velocity"].to_numpy() | burst
+        summary.loc[append_users, peak_columns] = np.fmax(
+            summary.loc[append_users, peak_columns].to_numpy(dtype="float64"),
+            peaks.reindex(append_users)[peak_columns].to_numpy(dtype="float64"))
+
+    streaks = rows["cancel_streak"].to_numpy().copy()
+    streaks[at] = marks["cancel_streak"].to_numpy()
+    rows["cancel_streak"] = streaks
+
+    summary = summary[summary["tx_count"] > 0]
+    int_columns = ["max_cancel_streak", "current_cancel_streak", "mirror_tx", "max_daily_repeat"] \
+        + [c for c in peak_columns if c.startswith("velocity_tx_")]
+    summary[int_columns] = summary[int_columns].astype("int64")
+    summary = pd.concat([state.summary[~_member(state.summary.index, touched)], summary[state.summary.columns]])
+
+    hit = (marks["cancel_streak"] >= MIN_STREAK) | marks["mirror"] | marks["repeat"] | marks["velocity"]
+    flags = pd.concat([state.flags[~_member(state.flags[USER_COLUMN], touched)], marks[hit.to_numpy()]])
+    return RiskState(summary, flags, rows, amounts, mirrors, df.attrs.get("synced_at"))
+
+
+# ✅ 프로세스 간 상태 저장 / 복원 (동기화 스냅샷 옆에 Parquet + 메타데이터 JSON)
+STATE_PATHS = {name: os.path.join(sync.CACHE_DIR, f"risk_{name}.parquet") for name in RiskState.FRAMES}
+META_PATH = os.path.join(sync.CACHE_DIR, "risk.meta.json")
+STATE_VERSION = 4    # 상태 프레임 / 컬럼이 바뀌면 올림
+
+
+def save_state(state, synced_at):
+    os.makedirs(sync.CACHE_DIR, exist_ok=True)
+    for name, path in STATE_PATHS.items():
+        tmp_path = path + ".tmp"
+        getattr(state, name).to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    tmp_meta = META_PATH + ".tmp"
+    with open(tmp_meta, "w") as f:
+        json.dump({
+            "synced_at": synced_at,
+            "version": STATE_VERSION,
+            "velocity_windows": VELOCITY_WINDOWS,
+            "users": len(state.summary),
+            "flags": len(state.flags),
+        }, f)
+    os.replace(tmp_meta, META_PATH)
+
+
+def load_state(synced_at):
+    # 저장된 상태가 같은 스냅샷에서 만들어진 경우에만 사용
+    if not all(os.path.exists(p) for p in [*STATE_PATHS.values(), META_PATH]):
+        return None
+    try:
+        with open(META_PATH) as f:
+            meta = json.load(f)
+        # 상태 형식이나 속도 윈도우 설정이 바뀌었으면 컬럼이 맞지 않으므로 다시 계산
+        if meta.get("synced_at") != synced_at or meta.get("version") != STATE_VERSION \
+                or meta.get("velocity_windows") != [list(w) for w in VELOCITY_WINDOWS]:
+            return None
+        return RiskState(**{name: pd.read_parquet(path) for name, path in STATE_PATHS.items()}, synced_at=synced_at)
+    except Exception:
+        return None
+
+
+# 변경분은 base_synced_at 스냅샷 기준이므로 그 스냅샷에서 만든 상태에만 이어 붙임
+# (이전 버전 상태가 다른 스냅샷 기준이면 — 스냅샷을 쓴 뒤 로드가 실패했거나 다른 프로세스가 동기화한 경우 —
+#  디스크에 저장된 상태를 찾고, 없으면 전체 계산)
+def build_state(bundle):
+    df = bundle.df
+    base = df.attrs.get("base_synced_at")
+    state = None
+    if bundle.delta_ids is not None and base:
+        state = bundle.previous("risk_state")
+        if state is None or state.synced_at != base:
+            state = load_state(base)
+
+    if state is not None:
+        state = update(state, df, bundle.delta_ids)
+    else:
+        state = init_state(df)
+
+    if df.attrs.get("synced_at"):
+        save_state(state, df.attrs["synced_at"])
+    return state
+
+
+def get_state(bundle):
+    return bundle.derived("risk_state", build_state)
+
+
+# ✅ 화면용 리포트: 상태의 거래 id를 현재 df 행에 붙임
+def report(state, df):
+    summary, flags = state.summary, state.flags
+    ids = df[sync.KEY_COLUMN].astype(str)
+    hit = ids.isin(flags.index).to_numpy()
+    marks = flags.reindex(ids[hit].to_numpy())
+    flagged = df[hit].assign(
+        cancel_streak=marks["cancel_streak"].to_numpy(),
+        mirror=marks["mirror"].to_numpy(),
+        repeat=marks["repeat"].to_numpy(),
+        velocity=marks["velocity"].to_numpy(),
+    )
+    scores, hits = COMPILED_RULES.evaluate(summary)
+    return RiskReport(
+        summary=summary,
+        scores=scores,
+        hits=hits,
+        streaks=flagged.loc[flagged["cancel_streak"] >= MIN_STREAK,
+                            [USER_COLUMN, "spend.authorizedAt", "spend.status", "cancel_streak"]],
+        mirrors=flagged[flagged["mirror"]],
+        repeats=flagged[flagged["repeat"]],
+        bursts=flagged[flagged["velocity"]],
+        total_users=len(summary),
+    )
+
+
+def build(bundle):
+    return report(get_state(bundle), bundle.df)
+
+
+def get(bundle):
+    return bundle.derived("risk", build)
@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+# ✅ 선언형 유저 단위 리스크 규칙
+# 규칙은 유저별 집계 테이블(risk summary)의 컬럼 하나에 대한 비교식이고,
+# 모든 규칙을 (유저 × 규칙) 행렬 비교 한 번으로 평가 → 규칙 추가 비용은 유저 수 × 1 컬럼
+
+OPS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+}
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    metric: str            # 유저별 집계 컬럼 이름
+    op: str                # OPS 키
+    threshold: float
+    weight: float = 1.0    # 점수 = 발동한 규칙 weight 합
+    description: str = ""
+
+
+class CompiledRules:
+    def __init__(self, rules):
+        rules = list(rules)
+        names = [r.name for r in rules]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate rule names: {names}")
+        unknown = [r.op for r in rules if r.op not in OPS]
+        if unknown:
+            raise ValueError(f"Unknown rule operators: {unknown}")
+
+        self.rules = rules
+        self.metrics = list(dict.fromkeys(r.metric for r in rules))   # 규칙들이 읽는 컬럼 (중복 제거)
+        self.columns = np.array([self.metrics.index(r.metric) for r in rules], dtype="int64")
+        self.thresholds = np.array([r.threshold for r in rules], dtype="float64")
+        self.weights = np.array([r.weight for r in rules], dtype="float64")
+        self.by_op = {op: np.array([i for i, r in enumerate(rules) if r.op == op], dtype="int64")
+                      for op in OPS if any(r.op == op for r in rules)}
+
+    def check(self, columns):
+        missing = [m for m in self.metrics if m not in columns]
+        if missing:
+            raise KeyError(f"Risk rules reference unknown metrics: {missing}")
+
+    # ✅ summary(user → 지표) → (점수 테이블, 발동 내역)
+    # 점수 테이블: user → risk_score, rules_fired, reasons (발동한 유저만)
+    # 발동 내역  : user, rule, metric, value, op, threshold, weight (한 행 = 한 번의 발동)
+    def evaluate(self, summary):
+        self.check(summary.columns)
+        values = summary[self.metrics].to_numpy(dtype="float64")[:, self.columns]
+        fired = np.zeros(values.shape, dtype=bool)
+        for op, idx in self.by_op.items():
+            fired[:, idx] = OPS[op](values[:, idx], self.thresholds[idx])
+
+        rows, cols = np.nonzero(fired)
+        hits = pd.DataFrame({
+            summary.index.name or "user": summary.index.to_numpy()[rows],
+            "rule": np.array([r.name for r in self.rules], dtype=object)[cols],
+            "metric": np.array([r.metric for r in self.rules], dtype=object)[cols],
+            "value": values[rows, cols],
+            "op": np.array([r.op for r in self.rules], dtype=object)[cols],
+            "threshold": self.thresholds[cols],
+            "weight": self.weights[cols],
+        })
+
+        user_col = hits.columns[0]
+        reason = hits["rule"] + " (" + hits["metric"] + "=" + hits["value"].map("{:.4g}".format) + " " \
+            + hits["op"] + " " + hits["threshold"].map("{:.4g}".format) + ")"
+        grouped = reason.groupby(hits[user_col], sort=False)
+        flagged = fired.any(axis=1)
+        table = pd.DataFrame({
+            "risk_score": fired[flagged].astype("float64") @ self.weights,
+            "rules_fired": fired[flagged].sum(axis=1),
+        }, index=summary.index[flagged])
+        table["reasons"] = grouped.agg("; ".join).reindex(table.index)
+        return table.sort_values("risk_score", ascending=False), hits
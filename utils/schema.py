@@ -0,0 +1,43 @@
+from utils import sync
+
+# ✅ 트랜잭션 컬럼 스키마 등록소
+# 각 컴포넌트가 필요한 원본 컬럼을 register()로 선언하면
+# load_data가 그 합집합으로 select 프로젝션을 만든다.
+
+# load_data 전처리 / 동기화 / keyset 페이징에 항상 필요한 컬럼
+# (upsert 키 / 워터마크는 utils/sync.py 설정을 따름 — SYNC_WATERMARK_COLUMN=updatedAt 등)
+REQUIRED_COLUMNS = list(dict.fromkeys([
+    sync.KEY_COLUMN, sync.WATERMARK_COLUMN, "spend.authorizedAt", "spend.status", "spend.amount",
+]))
+
+_registry = {}
+
+
+def register(component, columns):
+    _registry[component] = list(columns)
+    return list(columns)
+
+
+def registered():
+    return dict(_registry)
+
+
+# ✅ 등록된 컬럼의 합집합 (등록된 컴포넌트가 없으면 None → select("*"))
+def projection():
+    if not _registry:
+        return None
+    columns = list(REQUIRED_COLUMNS)
+    for cols in _registry.values():
+        columns.extend(cols)
+    return list(dict.fromkeys(columns))
+
+
+# ✅ 점(.)이 들어간 컬럼명은 PostgREST 필터/정렬/select에서 따옴표로 감싸야 함
+def quote_column(name):
+    return f'"{name}"' if "." in name else name
+
+
+def select_clause(columns):
+    if not columns:
+        return "*"
+    return ",".join(quote_column(c) for c in columns)
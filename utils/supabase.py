@@ -1,50 +1,240 @@
 import os
+import time
+import threading
+import warnings
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from supabase import create_client
-
-# ✅ Supabase에서 페이징으로 모든 트랜잭션 수집
-def fetch_all_rows(batch_size=5000, max_pages=50):
-    SUPABASE_URL = os.getenv("SUPABASE_URL")
-    SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-    all_data = []
-    offset = 0
-
-    for _ in range(max_pages):
-        res = (
-            supabase.table("transactions")
-            .select("*")
-            .range(offset, offset + batch_size - 1)
-            .execute()
+from supabase import create_client, ClientOptions
+from utils import sync, schema, ingest, wire
+from utils.schema import quote_column
+from utils.preprocess import preprocess
+
+_client = None
+_client_lock = threading.Lock()
+
+# ✅ 프로세스 전역 supabase 클라이언트 (공유 HTTP 풀 사용: keep-alive · gzip · 재시도 · 지표)
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                SUPABASE_URL = os.getenv("SUPABASE_URL")
+                SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+                _client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=wire.client()))
+    return _client
+
+# ✅ 병렬 샤드 수 (시간 구간을 나눠 동시에 수집)
+FETCH_SHARDS = int(os.getenv("SUPABASE_FETCH_SHARDS", "4"))
+FETCH_WORKERS = int(os.getenv("SUPABASE_FETCH_WORKERS", "4"))
+
+def base_query(supabase, columns="*", since=None, until=None, **select_kwargs):
+    wm = quote_column(sync.WATERMARK_COLUMN)
+    query = supabase.table("transactions").select(columns, **select_kwargs)
+    # 워터마크가 없는 행은 keyset 커서를 만들 수 없으므로 제외
+    query = query.not_.is_(wm, "null")
+    if since is not None:
+        query = query.gte(wm, since.isoformat())
+    if until is not None:
+        query = query.lt(wm, until.isoformat())
+    return query
+
+# ✅ 정확한 행 수 (count=exact)
+def fetch_count(since=None):
+    res = base_query(get_client(), sync.KEY_COLUMN, since=since, count="exact").limit(1).execute()
+    return res.count or 0
+
+# ✅ 데이터 버전 = (최대 워터마크, 정확한 행 수) — 요청 한 번으로 확인
+def fetch_version():
+    wm = quote_column(sync.WATERMARK_COLUMN)
+    res = base_query(get_client(), wm, count="exact").order(wm, desc=True).limit(1).execute()
+    watermark = res.data[0][sync.WATERMARK_COLUMN] if res.data else None
+    return (watermark, res.count or 0)
+
+# ✅ 워터마크 최소/최대값 (샤드 구간 계산용)
+def fetch_bounds(since=None):
+    supabase = get_client()
+    wm = quote_column(sync.WATERMARK_COLUMN)
+    bounds = []
+    for desc in (False, True):
+        res = base_query(supabase, wm, since=since).order(wm, desc=desc).limit(1).execute()
+        if not res.data:
+            return None, None
+        bounds.append(pd.Timestamp(res.data[0][sync.WATERMARK_COLUMN]))
+    return bounds[0], bounds[1]
+
+# ✅ keyset(seek) 페이징: (워터마크, id) 다음 행부터 batch_size개
+def fetch_page(supabase, after=None, batch_size=5000, since=None, until=None, columns="*"):
+    wm = quote_column(sync.WATERMARK_COLUMN)
+    key = sync.KEY_COLUMN
+    query = base_query(supabase, columns, since=since, until=until)
+    if after is not None:
+        ts, last_id = after
+        query = query.or_(f'{wm}.gt."{ts}",and({wm}.eq."{ts}",{key}.gt."{last_id}")')
+    res = query.order(wm).order(key).limit(batch_size).execute()
+    return res.data
+
+# ✅ fetch_page와 같은 조건의 PostgREST 쿼리 파라미터 (CSV 전송용 — supabase 클라이언트를 거치지 않음)
+def page_params(after=None, batch_size=5000, since=None, until=None, columns="*"):
+    wm = quote_column(sync.WATERMARK_COLUMN)
+    key = sync.KEY_COLUMN
+    params = [("select", columns), (wm, "not.is.null")]
+    if since is not None:
+        params.append((wm, f"gte.{since.isoformat()}"))
+    if until is not None:
+        params.append((wm, f"lt.{until.isoformat()}"))
+    if after is not None:
+        ts, last_id = after
+        params.append(("or", f'({wm}.gt."{ts}",and({wm}.eq."{ts}",{key}.gt."{last_id}"))'))
+    params += [("order", f"{wm}.asc,{key}.asc"), ("limit", str(batch_size))]
+    return params
+
+# ✅ 페이지 한 개 → Arrow 테이블
+# 기본은 text/csv 응답을 Arrow CSV 파서로 바로 읽고, CSV를 못 쓰면 JSON(supabase 클라이언트)으로 대체
+# (재시도를 다 쓴 네트워크 / 서버 오류는 포맷 문제가 아니므로 그대로 올려 체크포인트에서 재개)
+def fetch_page_table(supabase, after=None, batch_size=5000, since=None, until=None, columns="*", names=None):
+    if wire.csv_enabled():
+        try:
+            data = wire.get("transactions", page_params(after, batch_size, since, until, columns))
+            return ingest.csv_to_table(data, names)
+        except Exception as e:
+            if wire.transient(e):
+                raise
+            wire.disable_csv(e)
+    batch = fetch_page(supabase, after, batch_size, since=since, until=until, columns=columns)
+    if not batch:
+        return None
+    return ingest.page_to_table(batch, names)
+
+# ✅ 샤드 진행 상태 (완료된 페이지들 + 다음 keyset 커서)
+class ShardProgress:
+    def __init__(self, since=None, until=None):
+        self.since = since
+        self.until = until
+        self.tables = []
+        self.after = None
+        self.done = False
+
+# ✅ 한 샤드(시간 구간) 전체를 keyset 페이징으로 수집
+# 페이지는 받자마자 Arrow 테이블로 바꿔 progress에 쌓고 다음 커서는 테이블의 마지막 행에서 읽음
+# → 중간에 실패해도 progress에는 마지막으로 완료된 페이지까지 남음
+def fetch_shard(since=None, until=None, batch_size=5000, columns="*", names=None, progress=None):
+    progress = progress or ShardProgress(since, until)
+    supabase = get_client()
+    while not progress.done:
+        table = fetch_page_table(
+            supabase, progress.after, batch_size,
+            since=progress.since, until=progress.until, columns=columns, names=names,
         )
-        batch = res.data
-        if not batch:
+        if table is None or table.num_rows == 0:
+            progress.done = True
             break
-        all_data.extend(batch)
-        offset += batch_size
+        progress.after = (table[sync.WATERMARK_COLUMN][-1].as_py(), table[sync.KEY_COLUMN][-1].as_py())
+        progress.tables.append(table)
+        if table.num_rows < batch_size:
+            progress.done = True
+    return progress.tables
 
-    df = pd.DataFrame(all_data)
+# ✅ 워터마크 구간을 shards개로 나눔 (마지막 구간은 상한 없음)
+def shard_ranges(since, lo, hi, shards):
+    if shards <= 1 or lo is None or hi is None or lo >= hi:
+        return [(since, None)]
+    edges = pd.date_range(lo, hi, periods=shards + 1)
+    ranges = []
+    for i in range(shards):
+        start = since if i == 0 else edges[i]
+        end = edges[i + 1] if i < shards - 1 else None
+        ranges.append((start, end))
+    return ranges
 
-    # ❗ authorizedAt 기준으로 Pandas 내부 정렬
-    if "spend.authorizedAt" in df.columns:
-        df["spend.authorizedAt"] = pd.to_datetime(df["spend.authorizedAt"], errors="coerce")
-        df = df.sort_values("spend.authorizedAt")
+# ✅ 수집 체크포인트: (since, select, batch_size) → 샤드별 진행 상태
+# 재시도를 다 써도 실패하면 예외를 올리되 진행 상태는 남겨 두고, 다음 호출은 샤드 구간을 다시 계산하지 않고
+# 각 샤드의 마지막으로 완료된 페이지 다음부터 이어서 받음 (성공하면 삭제)
+# 재시도 구간(CHECKPOINT_TTL초)이 지난 체크포인트는 버림 — 완료로 표시된 샤드 안의 상태 변경을 놓치지 않도록
+CHECKPOINT_TTL = float(os.getenv("SUPABASE_CHECKPOINT_TTL", "600"))
+_checkpoints = {}    # key → (만든 시각, 샤드별 진행 상태)
+_checkpoint_locks = {}
+_checkpoint_lock = threading.Lock()
 
-    return df
+
+# ✅ 체크포인트 전부 삭제 (강제 새로고침은 처음부터 다시 받음)
+def discard_checkpoints():
+    with _checkpoint_lock:
+        _checkpoints.clear()
+
+# ✅ Supabase에서 모든 트랜잭션 수집 (since: 워터마크 이후만)
+# 정확한 행 수를 먼저 읽고, 구간별 샤드를 스레드 풀에서 동시에 keyset 페이징한 뒤 순서대로 병합
+# columns: 가져올 컬럼 목록 (None이면 전체)
+# map_shards: (fn, 샤드 목록) → 결과 목록. 기본은 스레드 풀 (비동기 로더는 자기 이벤트 루프 / 동시성 제한으로 대체)
+def fetch_all_rows(batch_size=5000, since=None, shards=None, max_workers=None, columns=None, map_shards=None):
+    shards = FETCH_SHARDS if shards is None else shards
+    max_workers = FETCH_WORKERS if max_workers is None else max_workers
+    select = schema.select_clause(columns)
+    key = (since, select, batch_size)
+
+    with _checkpoint_lock:
+        lock = _checkpoint_locks.setdefault(key, threading.Lock())
+    with lock:
+        total = fetch_count(since)
+        created_at, progress = _checkpoints.get(key, (None, None))
+        if progress is not None and time.monotonic() - created_at > CHECKPOINT_TTL:
+            warnings.warn("transactions: discarding an expired fetch checkpoint")
+            progress = None
+        if progress is None:
+            ranges = [(since, None)]
+            if shards > 1 and total > batch_size:
+                lo, hi = fetch_bounds(since)
+                ranges = shard_ranges(since, lo, hi, shards)
+            progress = [ShardProgress(start, end) for start, end in ranges]
+            _checkpoints[key] = (time.monotonic(), progress)
+        else:
+            pages = sum(len(p.tables) for p in progress)
+            warnings.warn(f"transactions: resuming interrupted fetch after {pages:,} completed pages")
+
+        pending = [p for p in progress if not p.done]
+        run = partial(fetch_shard, batch_size=batch_size, columns=select, names=columns)
+        if pending and map_shards is not None:
+            map_shards(lambda p: run(progress=p), pending)
+        elif pending:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+                list(pool.map(lambda p: run(progress=p), pending))
+        _checkpoints.pop(key, None)
+
+    tables = [t for p in progress for t in p.tables]
+    del progress
+    if not tables:
+        return pd.DataFrame(columns=columns or [])
+
+    # 샤드 병합 결과는 이미 (워터마크, id) 순으로 정렬되어 있음 — 시각 파싱은 preprocess에서 한 번만
+    table = ingest.concat(tables)
+    del tables
+    if table.num_rows < total:
+        warnings.warn(f"transactions: fetched {table.num_rows:,} of {total:,} rows")
+    return ingest.to_frame(table)
 
 # ✅ 전체 수집 + 전처리
-def load_data():
-    df = fetch_all_rows()
+# incremental=True 이면 로컬 Parquet 스냅샷 + 워터마크 이후 변경분만 가져옴
+# (기본값은 DASHBOARD_SYNC_MODE 환경변수: "incremental" / "full")
+def load_data(incremental=None, map_shards=None):
+    if incremental is None:
+        incremental = os.getenv("DASHBOARD_SYNC_MODE", "full") == "incremental"
+
+    # 컴포넌트들이 등록한 컬럼만 가져옴
+    columns = schema.projection()
 
-    # 전처리
-    df["spend.status"] = df["spend.status"].astype(str).str.lower()
-    df["spend.amount_usd"] = df["spend.amount"].apply(lambda x: int(x) / 100 if x else 0)
+    delta = None
+    if incremental:
+        df, delta = sync.sync_transactions(partial(fetch_all_rows, columns=columns, map_shards=map_shards), columns=columns)
+    else:
+        df = fetch_all_rows(columns=columns, map_shards=map_shards)
+    synced = dict(df.attrs)
 
-    df["spend.authorizedAt"] = pd.to_datetime(df["spend.authorizedAt"], errors="coerce")
-    df["date_utc"] = df["spend.authorizedAt"].dt.date
-    df["date"] = df["spend.authorizedAt"].dt.date     # ✅ analytics.py 호환용
-    df["hour_utc"] = df["spend.authorizedAt"].dt.hour
-    df["week"] = pd.to_datetime(df["date_utc"]).dt.to_period("W").astype(str)
+    # 전처리 (벡터화 + 카테고리형 + 정수 기간 키)
+    df = preprocess(df)
 
+    # 증분 동기화면 변경분 id와 스냅샷 시각을 남겨 파생 인덱스들이 바뀐 부분만 갱신하도록 함
+    if delta is not None:
+        df.attrs["delta_ids"] = delta[sync.KEY_COLUMN].astype(str).tolist()
+        df.attrs["base_synced_at"] = synced.get("base_synced_at")
+        df.attrs["synced_at"] = synced.get("synced_at")
     return df
@@ -0,0 +1,122 @@
+import os
+import json
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+
+# ✅ 로컬 스냅샷 위치 (Parquet + 메타데이터 JSON)
+CACHE_DIR = os.getenv("DASHBOARD_CACHE_DIR", ".cache")
+SNAPSHOT_PATH = os.path.join(CACHE_DIR, "transactions.parquet")
+META_PATH = os.path.join(CACHE_DIR, "transactions.meta.json")
+
+# ✅ upsert 키 / 워터마크 컬럼
+KEY_COLUMN = "id"
+WATERMARK_COLUMN = os.getenv("SYNC_WATERMARK_COLUMN", "spend.authorizedAt")
+
+# authorizedAt 기준일 때는 pending → completed/reversed 변경을 잡기 위해 최근 N일을 다시 가져옴
+# (updatedAt 같은 컬럼을 쓰면 0으로 두면 됨)
+LOOKBACK_DAYS = int(os.getenv(
+    "SYNC_LOOKBACK_DAYS",
+    "7" if WATERMARK_COLUMN == "spend.authorizedAt" else "0"
+))
+
+
+def read_snapshot():
+    if not (os.path.exists(SNAPSHOT_PATH) and os.path.exists(META_PATH)):
+        return None, None
+    try:
+        df = pd.read_parquet(SNAPSHOT_PATH)
+        with open(META_PATH) as f:
+            meta = json.load(f)
+    except Exception:
+        # 깨진 스냅샷은 무시하고 전체 동기화
+        return None, None
+    if KEY_COLUMN in df.columns and not pd.api.types.is_string_dtype(df[KEY_COLUMN]):
+        # 키를 문자열로 통일하기 전에 쓴 스냅샷 (JSON 수집의 정수 id)
+        df[KEY_COLUMN] = df[KEY_COLUMN].astype("string")
+    return df, meta
+
+
+def write_snapshot(df, meta):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # ✅ 임시 파일에 쓰고 교체 (읽는 도중 깨진 파일을 보지 않도록)
+    tmp_path = SNAPSHOT_PATH + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, SNAPSHOT_PATH)
+
+    tmp_meta = META_PATH + ".tmp"
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, META_PATH)
+
+
+def normalize(df):
+    # ✅ Parquet에 쓸 수 있도록 타입 정리
+    df = df.copy()
+    if WATERMARK_COLUMN in df.columns:
+        df[WATERMARK_COLUMN] = pd.to_datetime(df[WATERMARK_COLUMN], errors="coerce", utc=True, format="ISO8601")
+    for col in df.select_dtypes(include="object").columns:
+        df[col] = df[col].astype("string")
+    # ✅ upsert 키는 항상 문자열 (CSV 수집은 문자열, JSON 수집은 정수 id — 실행 중 CSV → JSON으로 바뀌어도
+    # 스냅샷과 변경분의 키가 같은 값으로 비교되도록)
+    if KEY_COLUMN in df.columns and not pd.api.types.is_string_dtype(df[KEY_COLUMN]):
+        df[KEY_COLUMN] = df[KEY_COLUMN].astype("string")
+    return df
+
+
+def upsert(snapshot, delta, key=KEY_COLUMN):
+    # ✅ 같은 id의 기존 행은 새 행으로 교체 (pending → completed / reversed)
+    if snapshot is None or snapshot.empty:
+        merged = delta
+    elif delta.empty:
+        return snapshot
+    else:
+        kept = snapshot[~snapshot[key].isin(delta[key])]
+        merged = pd.concat([kept, delta], ignore_index=True)
+
+    merged = merged.drop_duplicates(subset=key, keep="last")
+    if WATERMARK_COLUMN in merged.columns:
+        merged = merged.sort_values(WATERMARK_COLUMN, kind="stable")
+    return merged.reset_index(drop=True)
+
+
+def covers(meta, columns):
+    # 스냅샷이 요청한 컬럼을 모두 가지고 있는지 (None = 전체 컬럼)
+    stored = meta.get("columns")
+    if stored is None:
+        return True
+    return columns is not None and set(columns) <= set(stored)
+
+
+def sync_transactions(fetch, full=False, columns=None):
+    """로컬 스냅샷을 워터마크 이후 변경분으로 갱신하고 (전체 df, 변경분 df)를 반환."""
+    snapshot, meta = (None, None) if full else read_snapshot()
+
+    # 워터마크 컬럼이 바뀌었거나 필요한 컬럼이 없으면 기존 스냅샷은 쓸 수 없음
+    if meta and (meta.get("watermark_column") != WATERMARK_COLUMN or not covers(meta, columns)):
+        snapshot = None
+
+    if snapshot is None or not meta.get("watermark"):
+        delta = normalize(fetch(since=None))
+        df = upsert(None, delta)
+    else:
+        watermark = pd.Timestamp(meta["watermark"])
+        since = watermark - timedelta(days=LOOKBACK_DAYS)
+        delta = normalize(fetch(since=since))
+        # 스냅샷과 변경분의 타입이 다를 수 있으므로 병합 후 한 번 더 정리
+        df = normalize(upsert(snapshot, delta))
+
+    watermark = df[WATERMARK_COLUMN].max() if not df.empty else None
+    synced_at = datetime.now(timezone.utc).isoformat()
+    write_snapshot(df, {
+        "watermark": watermark.isoformat() if pd.notna(watermark) else None,
+        "watermark_column": WATERMARK_COLUMN,
+        "columns": columns,
+        "rows": len(df),
+        "synced_at": synced_at,
+    })
+
+    # 파생 상태(리스크 등)가 어느 스냅샷에서 이어지는지 알 수 있도록 기록
+    df.attrs["base_synced_at"] = meta.get("synced_at") if snapshot is not None else None
+    df.attrs["synced_at"] = synced_at
+    return df, delta
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+# ✅ 그룹 집계 + Top-K 엔진
+# grouped()     : 키(여러 컬럼 가능)별 건수 / 합계 / 고유 수를 한 번의 그룹 코드 계산으로 함께 집계
+# top()         : 전체 정렬 없이 argpartition으로 상위 K개만 골라 그 K개만 정렬
+# top_per_group(): 그룹별 상위 K개 (예: 유저별 Top 2 국가) — 그룹별 argmax를 K번 반복
+
+
+def grouped(df, keys, sums=None, distinct=None, count="tx_count"):
+    """keys별 {count: 건수, sums 이름: 합계, distinct 이름: 고유 수} 테이블 (건수 0인 키는 제외)."""
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    sums, distinct = sums or {}, distinct or {}
+
+    # 키 컬럼별 정수 코드 → 하나의 int64 그룹 키로 묶고 다시 0..n-1로 압축
+    factors = [pd.factorize(df[k]) for k in keys]
+    valid = np.logical_and.reduce([codes >= 0 for codes, _ in factors])
+    packed = np.zeros(int(valid.sum()), dtype="int64")
+    for codes, levels in factors:
+        packed = packed * len(levels) + codes[valid]
+    groups, group_keys = pd.factorize(packed)
+    n = len(group_keys)
+
+    out = {count: np.bincount(groups, minlength=n)}
+    for name, column in sums.items():
+        out[name] = np.bincount(groups, weights=df[column].to_numpy()[valid], minlength=n)
+    for name, column in distinct.items():
+        # (그룹, 값) 쌍의 고유 집합 → 그룹별 개수
+        codes = pd.factorize(df[column])[0][valid]
+        ok = codes >= 0
+        width = int(codes.max()) + 1 if ok.any() else 1
+        pairs = pd.unique(groups[ok].astype("int64") * width + codes[ok])
+        out[name] = np.bincount(pairs // width, minlength=n)
+
+    # 그룹 키 → 원래 키 값
+    arrays, rest = [], np.asarray(group_keys, dtype="int64")
+    for (_, levels), key in reversed(list(zip(factors, keys))):
+        arrays.append(pd.Index(levels).take(rest % len(levels)).rename(key))
+        rest = rest // len(levels)
+    arrays.reverse()
+    index = arrays[0] if len(arrays) == 1 else pd.MultiIndex.from_arrays(arrays)
+    return pd.DataFrame(out, index=index)
+
+
+def top_positions(values, k):
+    """값이 큰 순서대로 상위 k개 위치 (argpartition + k개만 정렬)."""
+    values = np.asarray(values)
+    n = len(values)
+    if k <= 0 or n == 0:
+        return np.array([], dtype="int64")
+    if k < n:
+        candidates = np.argpartition(-values, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+def top(frame, column, k):
+    return frame.iloc[top_positions(frame[column].to_numpy(), k)]
+
+
+def top_positions_per_group(groups, values, k):
+    """그룹별 상위 k개 위치와 순위(1부터). 그룹 순서대로, 그룹 안에서는 값 내림차순."""
+    groups = np.asarray(groups)
+    values = np.asarray(values, dtype="float64")
+    if k <= 0 or len(groups) == 0:
+        return np.array([], dtype="int64"), np.array([], dtype="int64")
+
+    order = np.argsort(groups, kind="stable")
+    g = groups[order]
+    # NaN은 뽑지 않음 (-inf로 두지 않으면 reduceat 최댓값이 NaN이 되어 그룹 전체가 빠짐)
+    remaining = values[order]
+    remaining = np.where(np.isnan(remaining), -np.inf, remaining)
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(g)]))
+
+    picked, ranks = [], []
+    for rank in range(1, k + 1):
+        best = np.maximum.reduceat(remaining, starts)
+        hit = np.flatnonzero((remaining == best[segment]) & (remaining > -np.inf))
+        if len(hit) == 0:
+            break
+        # 동점이면 그룹 안에서 앞선 행 하나만
+        first = hit[np.r_[True, segment[hit][1:] != segment[hit][:-1]]]
+        picked.append(first)
+        ranks.append(np.full(len(first), rank))
+        remaining[first] = -np.inf
+
+    if not picked:
+        return np.array([], dtype="int64"), np.array([], dtype="int64")
+    picked, ranks = np.concatenate(picked), np.concatenate(ranks)
+    arrange = np.lexsort((ranks, segment[picked]))
+    return order[picked[arrange]], ranks[arrange]
+
+
+def top_per_group(frame, group, column, k, rank="rank"):
+    """frame에서 group 컬럼(또는 인덱스 레벨)별 column 상위 k개 행 + 순위 컬럼."""
+    keys = frame[group] if group in frame.columns else frame.index.get_level_values(group)
+    positions, ranks = top_positions_per_group(pd.factorize(keys, sort=True)[0], frame[column].to_numpy(), k)
+    return frame.iloc[positions].assign(**{rank: ranks})
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from utils import sync, cube, pushdown
+from utils.preprocess import day_keys, week_of_day, month_of_ts
+
+# ✅ 유저 차원 인덱스 (spend.userId 기준)
+# 첫/마지막 활동 시각, 첫 일/주/월 키, 누적 거래 수 / 지출 → 신규 유저 / 코호트 지표는 조회만
+USER_COLUMN = "spend.userId"
+STATUSES = ["completed", "pending"]
+
+
+def _aggregate(df):
+    active = df[df["spend.status"].isin(STATUSES)]
+    index = active.groupby(USER_COLUMN, observed=True).agg(
+        first_ts=("spend.authorizedAt", "min"),
+        last_ts=("spend.authorizedAt", "max"),
+        tx_count=("spend.amount", "size"),
+        spend_cents=("spend.amount", "sum"),
+    )
+    index["first_day"] = day_keys(index["first_ts"])
+    index["first_week"] = week_of_day(index["first_day"]).astype("int32")
+    index["first_month"] = month_of_ts(index["first_ts"])
+
+    # 리텐션 코호트는 완료 거래 기준
+    completed = df[df["spend.status"] == "completed"]
+    index["first_completed_day"] = completed.groupby(USER_COLUMN, observed=True)["day"].min()
+
+    # 버전마다 카테고리 순서가 달라지므로 유저 id 문자열로 인덱싱
+    index.index = index.index.astype(str)
+    index.index.name = USER_COLUMN
+    return index
+
+
+def build_full(df):
+    return _aggregate(df)
+
+
+# ✅ 증분 갱신: 변경된 행이 속한 유저만 다시 집계하고 나머지는 그대로 유지
+# (upsert로 상태가 바뀐 행도 올바르게 반영하기 위해 해당 유저의 행 전체를 다시 봄)
+def update(index, df, delta_ids):
+    changed = df[sync.KEY_COLUMN].isin(delta_ids)
+    touched = df.loc[changed, USER_COLUMN].dropna().astype(str).unique()
+    if len(touched) == 0:
+        return index.copy(deep=False)
+
+    rows = df[df[USER_COLUMN].isin(touched)]
+    fresh = _aggregate(rows)
+    kept = index[~index.index.isin(touched)]
+    return pd.concat([kept, fresh])
+
+
+# 변경분은 base_synced_at 스냅샷 기준이므로 같은 스냅샷에서 만든 이전 인덱스에만 이어 붙임
+# (스냅샷을 쓴 뒤 로드가 실패했거나 다른 프로세스가 동기화했으면 전체 계산)
+def build(bundle):
+    df = bundle.df
+    previous = bundle.previous("user_index")
+    base = df.attrs.get("base_synced_at")
+    if previous is not None and bundle.delta_ids is not None and base \
+            and previous.attrs.get("synced_at") == base:
+        index = update(previous, df, bundle.delta_ids)
+    else:
+        index = build_full(df)
+    index.attrs["synced_at"] = df.attrs.get("synced_at")
+    return index
+
+
+def get(bundle):
+    return bundle.derived("user_index", build)
+
+
+# ✅ 기간별 신규 유저 수 (grain: "day" / "week" / "month") — pushdown 모드면 서버 집계에서 (원본 거래 불필요)
+def new_users(bundle, grain):
+    if pushdown.ENABLED:
+        return cube.get(bundle).new_users(grain)
+    return get(bundle)[f"first_{grain}"].value_counts()
+
+
+# ✅ 행별 유저 → 인덱스 값 (카테고리 코드로 조회하므로 고유 유저 수만큼만 매핑)
+def lookup(index, column, users):
+    values = index[column].reindex(users.cat.categories.astype(str)).to_numpy()
+    codes = users.cat.codes.to_numpy()
+    out = values[codes]
+    if (codes < 0).any():
+        out = np.where(codes >= 0, out, np.nan)
+    return out
@@ -0,0 +1,95 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from utils import countries
+from utils.supabase import get_client
+
+# ✅ 유저 차원 (users 테이블: id → 국가)
+# 필요한 필드만 select (address JSON에서 countryCode만 서버에서 추출), id keyset 페이징,
+# 데이터 버전마다 트랜잭션에 새로 나타난 유저만 추가로 조회
+
+USERS_TABLE = "users"
+USERS_SELECT = "id, country_code:address->>countryCode"
+BATCH_SIZE = int(os.getenv("USERS_BATCH_SIZE", "1000"))
+ID_CHUNK = 200    # in_() 한 번에 넣는 id 수 (URL 길이 제한)
+# 주소 변경을 반영하기 위해 이 주기마다 전체를 다시 가져옴 (초)
+FULL_REFRESH_SECONDS = int(os.getenv("USERS_FULL_REFRESH_SECONDS", str(24 * 3600)))
+
+USER_COLUMN = "spend.userId"
+
+
+def to_frame(rows):
+    dim = pd.DataFrame(rows, columns=["id", "country_code"])
+    dim["id"] = dim["id"].astype(str)
+    return dim.drop_duplicates("id", keep="last").set_index("id")
+
+
+# ✅ 전체 유저: id 기준 keyset 페이징 (서버 행 수 제한에 잘리지 않음)
+def fetch_all_users(batch_size=BATCH_SIZE):
+    supabase = get_client()
+    rows, last_id = [], None
+    while True:
+        query = supabase.table(USERS_TABLE).select(USERS_SELECT).order("id")
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.limit(batch_size).execute().data
+        rows.extend(page)
+        if len(page) < batch_size:
+            break
+        last_id = page[-1]["id"]
+    return to_frame(rows)
+
+
+# ✅ 지정한 유저만 (증분 갱신용)
+def fetch_users(ids):
+    supabase = get_client()
+    rows = []
+    for i in range(0, len(ids), ID_CHUNK):
+        chunk = list(ids[i:i + ID_CHUNK])
+        rows.extend(supabase.table(USERS_TABLE).select(USERS_SELECT).in_("id", chunk).execute().data)
+    # users 테이블에 없는 id도 기록해 두어 다음 버전에서 다시 조회하지 않음
+    return to_frame(rows).reindex(pd.Index(ids, name="id").astype(str))
+
+
+# ✅ 전체 다시 가져올 때가 됐는지 (주소 변경 반영 주기)
+def refresh_due(previous):
+    return previous is None or time.time() - previous.attrs.get("fetched_at", 0) >= FULL_REFRESH_SECONDS
+
+
+def finish(dim, fetched_at):
+    # 국가명은 고유 코드 단위로 변환해서 카테고리형으로 보관
+    dim = dim.assign(user_country=countries.names(dim["country_code"]).astype("category"))
+    dim.attrs["fetched_at"] = fetched_at
+    return dim
+
+
+# ✅ 전체 유저 차원 (트랜잭션과 무관하므로 로더가 트랜잭션 수집과 동시에 가져올 수 있음)
+def load_all():
+    return finish(fetch_all_users(), time.time())
+
+
+def build(bundle):
+    previous = bundle.previous("users")
+    if refresh_due(previous):
+        return load_all()
+
+    ids = bundle.df[USER_COLUMN].cat.categories.astype(str)
+    missing = ids[~ids.isin(previous.index)]
+    dim = previous[["country_code"]]
+    if len(missing):
+        dim = pd.concat([dim, fetch_users(missing)])
+    return finish(dim, previous.attrs["fetched_at"])
+
+
+def get(bundle):
+    return bundle.derived("users", build)
+
+
+# ✅ 행별 유저 → 유저 국가 (카테고리 코드로 조회 → 고유 유저 수만큼만 매핑, 결과도 카테고리형)
+def country_of(dim, users):
+    per_user = dim["user_country"].reindex(users.cat.categories.astype(str))
+    user_codes = per_user.cat.codes.to_numpy()
+    codes = users.cat.codes.to_numpy()
+    row_codes = np.where(codes >= 0, user_codes[codes], -1)
+    return pd.Categorical.from_codes(row_codes, categories=per_user.cat.categories)
@@ -0,0 +1,185 @@
+import os
+import time
+import random
+import threading
+import warnings
+from collections import deque
+import httpx
+import numpy as np
+
+# ✅ 공유 HTTP 전송 계층 (supabase 클라이언트와 CSV 직접 호출이 같은 연결 풀 사용)
+# - keep-alive 연결 풀: 요청마다 TCP/TLS 연결을 새로 맺지 않음
+# - gzip 응답 (httpx가 자동 해제)
+# - 일시적 오류(연결 끊김 / 타임아웃 / 429 / 5xx)는 지수 백오프로 제한된 횟수만 재시도 (GET/HEAD만)
+# - 요청별 지연 시간 / 전송 바이트 기록 → stats()
+#
+# POSTGREST_URL: 로컬 PostgREST 등 다른 엔드포인트 (예: http://localhost:3000)
+#                없으면 {SUPABASE_URL}/rest/v1
+WIRE_FORMAT = os.getenv("SUPABASE_WIRE_FORMAT", "csv")     # "csv" / "json"
+TIMEOUT = float(os.getenv("POSTGREST_TIMEOUT", "60"))
+POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "16"))
+MAX_RETRIES = int(os.getenv("SUPABASE_MAX_RETRIES", "4"))
+BACKOFF_SECONDS = float(os.getenv("SUPABASE_BACKOFF_SECONDS", "0.5"))
+BACKOFF_MAX_SECONDS = 8.0
+RETRY_STATUS = {408, 429, 500, 502, 503, 504, 520, 522, 524}
+RETRY_METHODS = {"GET", "HEAD"}
+METRICS_WINDOW = 2000     # 최근 요청 몇 개까지 기록을 유지할지
+
+_client = None
+_client_lock = threading.Lock()
+_csv_failed = None
+
+
+# ✅ 요청별 지표 (최근 METRICS_WINDOW개 + 누적 합계)
+class Metrics:
+    def __init__(self, window=METRICS_WINDOW):
+        self.recent = deque(maxlen=window)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, method, path, status, seconds, nbytes, attempt):
+        with self._lock:
+            self.recent.append({
+                "method": method, "path": path, "status": status,
+                "seconds": seconds, "bytes": nbytes, "attempt": attempt,
+            })
+            self.requests += 1
+            self.bytes += nbytes
+            if attempt > 0:
+                self.retries += 1
+            if status is None or status >= 400:
+                self.failures += 1
+
+    def stats(self):
+        with self._lock:
+            recent = list(self.recent)
+            totals = {"requests": self.requests, "retries": self.retries,
+                      "failures": self.failures, "bytes": self.bytes}
+        seconds = np.array([r["seconds"] for r in recent]) if recent else np.zeros(1)
+        nbytes = sum(r["bytes"] for r in recent)
+        return {
+            **totals,
+            "p50_ms": float(np.percentile(seconds, 50) * 1000),
+            "p95_ms": float(np.percentile(seconds, 95) * 1000),
+            "mb_per_s": nbytes / 1024 ** 2 / max(float(seconds.sum()), 1e-9),
+        }
+
+    def reset(self):
+        with self._lock:
+            self.recent.clear()
+            self.requests = self.retries = self.failures = self.bytes = 0
+
+
+metrics = Metrics()
+
+
+def backoff(attempt, retry_after=None):
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    # 지수 백오프 + 지터 (동시에 실패한 샤드들이 같은 순간에 다시 몰리지 않도록)
+    return min(BACKOFF_SECONDS * 2 ** attempt, BACKOFF_MAX_SECONDS) * random.uniform(0.5, 1.0)
+
+
+# ✅ 재시도 + 지표 기록을 하는 httpx 전송 계층
+# 본문까지 다 받은 뒤에 돌려주므로 본문 수신 중 끊긴 경우도 재시도 대상
+class RetryTransport(httpx.BaseTransport):
+    def __init__(self, retries=MAX_RETRIES, pool_size=POOL_SIZE):
+        self.retries = retries
+        self.inner = httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    def handle_request(self, request):
+        retryable = request.method in RETRY_METHODS
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.inner.handle_request(request)
+                body = b"".join(response.stream)    # 압축된 원본 바이트 (해제는 클라이언트가)
+                response.close()
+            except httpx.TransportError:
+                metrics.record(request.method, request.url.path, None, time.perf_counter() - start, 0, attempt)
+                if not retryable or attempt >= self.retries:
+                    raise
+                time.sleep(backoff(attempt))
+                attempt += 1
+                continue
+
+            metrics.record(request.method, request.url.path, response.status_code,
+                           time.perf_counter() - start, len(body), attempt)
+            if retryable and response.status_code in RETRY_STATUS and attempt < self.retries:
+                time.sleep(backoff(attempt, response.headers.get("Retry-After")))
+                attempt += 1
+                continue
+            return httpx.Response(
+                response.status_code, headers=response.headers, content=body,
+                extensions=response.extensions,
+            )
+
+    def close(self):
+        self.inner.close()
+
+
+# ✅ 프로세스 전역 HTTP 클라이언트 (스레드 안전, 모든 샤드 / 세션이 공유)
+def client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    transport=RetryTransport(),
+                    timeout=TIMEOUT,
+                    headers={"Accept-Encoding": "gzip"},
+                    follow_redirects=True,
+                )
+    return _client
+
+
+def stats():
+    return metrics.stats()
+
+
+def transient(error):
+    """재시도를 다 쓰고도 실패한 일시적 오류인지 (포맷 문제가 아니라 네트워크 / 서버 문제)."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in RETRY_STATUS
+
+
+def rest_url():
+    url = os.getenv("POSTGREST_URL") or f"{os.getenv('SUPABASE_URL', '').rstrip('/')}/rest/v1"
+    return url.rstrip("/")
+
+
+def headers(accept):
+    key = os.getenv("SUPABASE_KEY")
+    out = {"Accept": accept}
+    if key:
+        out["apikey"] = key
+        out["Authorization"] = f"Bearer {key}"
+    return out
+
+
+def csv_enabled():
+    return WIRE_FORMAT == "csv" and _csv_failed is None
+
+
+def disable_csv(error):
+    global _csv_failed
+    if _csv_failed is None:
+        warnings.warn(f"PostgREST CSV transport failed, falling back to JSON: {error}")
+    _csv_failed = error
+
+
+# ✅ GET /{table}?params → 응답 본문 bytes (params는 같은 키를 여러 번 쓸 수 있도록 (키, 값) 리스트)
+def get(table, params, accept="text/csv"):
+    res = client().get(f"{rest_url()}/{table}", params=params, headers=headers(accept))
+    res.raise_for_status()
+    return res.content